@@ -0,0 +1,128 @@
+from statistics import NormalDist
+from typing import List, NamedTuple, Tuple
+
+import Utility.DBConnector as Connector
+
+METHODS = ('SYSTEM', 'BERNOULLI')
+
+
+class Estimate(NamedTuple):
+    """ an aggregate estimated from a sample, with its confidence interval and the number of rows it saw """
+    value: float
+    low: float
+    high: float
+    sampled: int
+
+
+# the sampled fact table joined to what the aggregate needs. {sample} is the FROM item of the sampled table,
+# {unit} the sampling unit of a row and {condition} the extra filter of the sample
+_RATINGS = """
+        SELECT {unit} AS unit, SUM(R.Rating) AS y, COUNT(*) AS n
+        FROM {sample}
+        WHERE {condition} AND NOT EXISTS (
+            SELECT 1 FROM Movie M WHERE M.Deleted AND M.Name = R.MovieName AND M.Year = R.MovieYear)
+        GROUP BY unit
+        """
+_CASTS = """
+        SELECT M.Genre AS genre, {unit} AS unit, SUM(A.Age) AS y, COUNT(*) AS n
+        FROM {sample}
+        INNER JOIN LiveActor AS A ON A.ID = C.ActorID
+        INNER JOIN LiveMovie AS M ON M.Name = C.MovieName AND M.Year = C.MovieYear
+        WHERE {condition}
+        GROUP BY M.Genre, unit
+        """
+_PRODUCTIONS = """
+        SELECT P.StudioID AS studioid, P.MovieYear AS movieyear, {unit} AS unit, SUM(P.Revenue) AS y, COUNT(*) AS n
+        FROM {sample}
+        WHERE {condition} AND NOT EXISTS (
+            SELECT 1 FROM Movie M WHERE M.Deleted AND M.Name = P.MovieName AND M.Year = P.MovieYear)
+        GROUP BY P.StudioID, P.MovieYear, unit
+        """
+# per group sums over the sampling units, y is the sum of the aggregated value of a unit and n its row count
+_MOMENTS = """
+        SELECT {groups}SUM(y) AS y, SUM(n) AS n, SUM(CAST(y AS DECIMAL) * y) AS yy,
+               SUM(CAST(y AS DECIMAL) * n) AS yn, SUM(CAST(n AS DECIMAL) * n) AS nn
+        FROM ({units}) AS units
+        {grouping}
+        """
+
+
+def approximateAverageRating(percent: float, method: str = 'SYSTEM', confidence: float = 0.95,
+                             seed: int = None) -> Estimate:
+    """ the average of all ratings, over every movie, from a percent sample of Ratings.
+    SYSTEM reads whole pages and is the fastest, BERNOULLI reads every page but its rows are independent,
+    so at the same rate its interval is narrower. an interval over very few sampled pages is not reliable """
+    rows = _sample('approximateAverageRating', _RATINGS, 'Ratings AS R', 'R', [], '', percent, method, seed)
+    if not rows or not rows[0]['n']:
+        return Estimate(0.0, 0.0, 0.0, 0)
+    return _mean(rows[0], percent / 100, _z(confidence))
+
+
+def approximateAverageAgeByGenre(percent: float, method: str = 'SYSTEM', confidence: float = 0.95,
+                                 seed: int = None) -> List[Tuple[str, Estimate]]:
+    """ averageAgeByGenre from a percent sample of Casts. a genre none of the sampled casts play in is missing """
+    rows = _sample('approximateAverageAgeByGenre', _CASTS, 'Casts AS C', 'C', ['genre'], 'ORDER BY genre ASC',
+                   percent, method, seed)
+    z = _z(confidence)
+    return [(row['genre'], _mean(row, percent / 100, z)) for row in rows]
+
+
+def approximateStudioRevenueByYear(percent: float, method: str = 'SYSTEM', confidence: float = 0.95,
+                                   seed: int = None) -> List[Tuple[int, int, Estimate]]:
+    """ studioRevenueByYear from a percent sample of Productions, the revenues scaled up by the sampling rate.
+    a (studio, year) without sampled productions is missing """
+    rows = _sample('approximateStudioRevenueByYear', _PRODUCTIONS, 'Productions AS P', 'P',
+                   ['studioid', 'movieyear'], 'ORDER BY studioid DESC, movieyear DESC', percent, method, seed)
+    z = _z(confidence)
+    return [(row['studioid'], row['movieyear'], _total(row, percent / 100, z)) for row in rows]
+
+
+def _sample(tag: str, units: str, table: str, alias: str, groups: List[str], order: str, percent: float,
+            method: str, seed: int) -> list:
+    method = method.upper()
+    if method not in METHODS:
+        raise ValueError('sampling method must be one of ' + ', '.join(METHODS))
+    if not 0 < percent <= 100:
+        raise ValueError('percent must be in (0, 100]')
+    if Connector.DBConnector.backend() == Connector.PRIMARY:
+        sample = '%s TABLESAMPLE %s (%r)' % (table, method, float(percent))
+        if seed is not None:
+            sample += ' REPEATABLE (%d)' % int(seed)
+        # SYSTEM picks whole pages, so a page is the unit its variance is estimated over
+        unit = '(%s.ctid::text::point)[0]' % alias if method == 'SYSTEM' else alias + '.ctid'
+        condition = 'TRUE'
+    else:
+        # SQLite has no TABLESAMPLE, every row is kept with the given probability (SYSTEM included) and unseeded
+        sample, unit = table, alias + '.rowid'
+        condition = 'abs(random() %% 1000000) < %d' % round(percent * 10000)
+    query = _MOMENTS.format(groups=''.join(group + ', ' for group in groups),
+                            units=units.format(sample=sample, unit=unit, condition=condition),
+                            grouping=('GROUP BY ' + ', '.join(groups) + ' ' + order) if groups else '')
+    conn = Connector.DBConnector(readOnly=True)
+    try:
+        _, result = conn.execute(Connector.tagQuery(query, tag))
+    finally:
+        conn.close()
+    return [dict(zip(result.cols_header, row)) for row in result.rows]
+
+
+def _z(confidence: float) -> float:
+    return NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+# every unit (row or page) is in the sample independently with probability p, the Horvitz-Thompson
+# estimators below scale the sample by 1 / p and estimate their variance from the same units
+def _total(row: dict, p: float, z: float) -> Estimate:
+    total = float(row['y']) / p
+    error = z * ((1 - p) / p ** 2 * float(row['yy'])) ** 0.5
+    # revenues are never negative
+    return Estimate(total, max(0.0, total - error), total + error, int(row['n']))
+
+
+def _mean(row: dict, p: float, z: float) -> Estimate:
+    # a ratio of two estimated totals, its variance by linearization
+    y, n = float(row['y']), float(row['n'])
+    mean = y / n
+    residuals = max(0.0, float(row['yy']) - 2 * mean * float(row['yn']) + mean ** 2 * float(row['nn']))
+    error = z * ((1 - p) / p ** 2 * residuals) ** 0.5 / (n / p)
+    return Estimate(mean, mean - error, mean + error, int(row['n']))
@@ -0,0 +1,125 @@
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+import Solution
+import ApproximateAnalytics
+from Benchmark.DataGenerator import DataGenerator, ScaleFactor, loadDataset
+
+'''
+    Speedup against accuracy of the ApproximateAnalytics functions. for every scale the dataset is loaded once,
+    the exact function is timed, then every (method, rate) runs repeats times with different seeds.
+    relative error is averaged over the groups a sample saw, coverage is the share of those groups whose
+    interval holds the exact value and missing the share of exact groups no sampled row belonged to.
+    usage: python -m Benchmark.Approximation --scales 0.1 0.5 1 --rates 1 5 10
+'''
+
+
+def exactAverageRating() -> list:
+    # the average over every rating, Solution.averageRating only averages one movie
+    _, _, rows = Solution.execute_query_select("SELECT AVG(Rating) AS avg FROM LiveRatings")
+    return [((), float(rows[0]['avg'] or 0))]
+
+
+def _keyed(rows: list) -> list:
+    # (group key, value) pairs, the value is the last column
+    return [(tuple(row[:-1]), float(row[-1])) for row in rows]
+
+
+def _functions() -> List[tuple]:
+    """ (name, exact, approximate) where both return (group key, value) pairs, approximate ones with an Estimate """
+    return [
+        ('averageRating', exactAverageRating,
+         lambda *args: [((), ApproximateAnalytics.approximateAverageRating(*args))]),
+        ('averageAgeByGenre', lambda: _keyed(Solution.averageAgeByGenre()),
+         lambda *args: [((genre,), estimate) for genre, estimate
+                        in ApproximateAnalytics.approximateAverageAgeByGenre(*args)]),
+        ('studioRevenueByYear', lambda: _keyed(Solution.studioRevenueByYear()),
+         lambda *args: [((studio, year), estimate) for studio, year, estimate
+                        in ApproximateAnalytics.approximateStudioRevenueByYear(*args)]),
+    ]
+
+
+def _timed(function: Callable):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def accuracy(exact: list, estimates: list) -> dict:
+    """ error and interval coverage of one approximate result against the exact one """
+    truth = dict(exact)
+    seen = [(truth[key], estimate) for key, estimate in estimates if key in truth and estimate.sampled]
+    errors = [abs(estimate.value - value) / abs(value) for value, estimate in seen if value]
+    return {'relative_error': statistics.mean(errors) if errors else 0.0,
+            'coverage': sum(estimate.low <= value <= estimate.high for value, estimate in seen) / len(seen)
+            if seen else 0.0,
+            'missing': 1 - len(seen) / len(truth) if truth else 0.0}
+
+
+def measure(rates: List[float], methods: List[str], repeats: int, confidence: float) -> List[dict]:
+    rows = []
+    for name, exact_function, approximate in _functions():
+        exact_times = []
+        for _ in range(repeats):
+            elapsed, exact = _timed(exact_function)
+            exact_times.append(elapsed)
+        exact_ms = 1000 * statistics.median(exact_times)
+        for method in methods:
+            for rate in rates:
+                times, measures = [], []
+                for seed in range(repeats):
+                    elapsed, estimates = _timed(lambda: approximate(rate, method, confidence, seed))
+                    times.append(elapsed)
+                    measures.append(accuracy(exact, estimates))
+                approximate_ms = 1000 * statistics.median(times)
+                rows.append({'function': name, 'method': method, 'percent': rate, 'exact_ms': exact_ms,
+                             'approximate_ms': approximate_ms,
+                             'speedup': exact_ms / approximate_ms if approximate_ms > 0 else 0.0,
+                             'relative_error': statistics.mean(m['relative_error'] for m in measures),
+                             'coverage': statistics.mean(m['coverage'] for m in measures),
+                             'missing': statistics.mean(m['missing'] for m in measures)})
+    return rows
+
+
+def printReport(report: List[dict]) -> None:
+    print('%6s %-20s %-9s %7s %10s %10s %8s %9s %9s %8s' % ('scale', 'function', 'method', 'percent', 'exact ms',
+                                                            'approx ms', 'speedup', 'rel err %', 'covered %',
+                                                            'missing %'))
+    for row in report:
+        print('%6g %-20s %-9s %7g %10.2f %10.2f %8.1f %9.3f %9.1f %8.1f' % (
+            row['scale'], row['function'], row['method'], row['percent'], row['exact_ms'], row['approximate_ms'],
+            row['speedup'], 100 * row['relative_error'], 100 * row['coverage'], 100 * row['missing']))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Speedup and accuracy of the sampled analytics per data size')
+    parser.add_argument('--scales', type=float, nargs='+', default=[0.1, 0.5, 1.0])
+    parser.add_argument('--rates', type=float, nargs='+', default=[1, 5, 10, 25], help='sampling percents')
+    parser.add_argument('--methods', nargs='+', choices=ApproximateAnalytics.METHODS,
+                        default=list(ApproximateAnalytics.METHODS))
+    parser.add_argument('--repeats', type=int, default=5, help='runs per rate, each with its own seed')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--seed', type=int, default=0, help='dataset seed')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args(argv)
+
+    report = []
+    for factor in args.scales:
+        start = time.perf_counter()
+        loaded = loadDataset(DataGenerator(ScaleFactor.scaled(factor), args.seed))
+        print('scale %g: loaded %s in %.1fs' % (factor, loaded, time.perf_counter() - start))
+        for row in measure(args.rates, args.methods, args.repeats, args.confidence):
+            report.append(dict(row, scale=factor))
+    printReport(report)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import io
+import random
+from typing import Iterator, Tuple
+
+import Solution
+import Utility.DBConnector as Connector
+
+GENRES = ['Horror', 'Comedy', 'Action', 'Drama']
+FIRST_YEAR = 1985
+YEARS = 40
+
+_ADJECTIVES = ['Silent', 'Dark', 'Last', 'Golden', 'Broken', 'Hidden', 'Crimson', 'Lost', 'Wild', 'Frozen',
+               'Electric', 'Burning', 'Secret', 'Final', 'Midnight', 'Iron']
+_NOUNS = ['River', 'Empire', 'Storm', 'Garden', 'Mission', 'Horizon', 'Shadow', 'Kingdom', 'Promise', 'Voyage',
+          'Protocol', 'Harbor', 'Signal', 'Legacy', 'Frontier', 'Machine']
+_FIRST_NAMES = ['Tom', 'Leonardo', 'Meryl', 'Jackie', 'Natalie', 'Denzel', 'Cate', 'Keanu', 'Viola', 'Morgan',
+                'Emma', 'Samuel', 'Julia', 'Brad', 'Nicole', 'Hugh']
+_LAST_NAMES = ['Cruise', 'DiCaprio', 'Streep', 'Chan', 'Portman', 'Washington', 'Blanchett', 'Reeves', 'Davis',
+               'Freeman', 'Stone', 'Jackson', 'Roberts', 'Pitt', 'Kidman', 'Jackman']
+
+
+class ScaleFactor:
+    """ sizes of a synthetic dataset. entity counts grow with the scale factor, the per-movie fan-outs do not """
+
+    def __init__(self, critics=1000, actors=5000, movies=10000, studios=100, ratings_per_movie=20, cast_size=10,
+                 roles_per_actor=2, produced_ratio=0.8):
+        self.critics = critics
+        self.actors = actors
+        self.movies = movies
+        self.studios = studios
+        self.ratings_per_movie = min(ratings_per_movie, critics)
+        self.cast_size = min(cast_size, actors)
+        self.roles_per_actor = roles_per_actor
+        self.produced_ratio = produced_ratio
+
+    @staticmethod
+    def scaled(factor: float, **overrides) -> 'ScaleFactor':
+        base = ScaleFactor()
+        sizes = dict(critics=max(1, int(base.critics * factor)),
+                     actors=max(1, int(base.actors * factor)),
+                     movies=max(1, int(base.movies * factor)),
+                     studios=max(1, int(base.studios * factor)),
+                     ratings_per_movie=base.ratings_per_movie,
+                     cast_size=base.cast_size,
+                     roles_per_actor=base.roles_per_actor,
+                     produced_ratio=base.produced_ratio)
+        sizes.update(overrides)
+        return ScaleFactor(**sizes)
+
+    def toDict(self) -> dict:
+        return dict(self.__dict__)
+
+
+# keys are a pure function of the index, so benchmarks can sample existing entities without asking the database
+def movieKey(index: int) -> Tuple[str, int]:
+    name = _ADJECTIVES[index % len(_ADJECTIVES)] + ' ' + _NOUNS[(index // len(_ADJECTIVES)) % len(_NOUNS)] + \
+           ' ' + str(index)
+    return name, FIRST_YEAR + index % YEARS
+
+
+def actorName(actor_id: int) -> str:
+    return _FIRST_NAMES[actor_id % len(_FIRST_NAMES)] + ' ' + _LAST_NAMES[(actor_id // 7) % len(_LAST_NAMES)] + \
+           ' ' + str(actor_id)
+
+
+class DataGenerator:
+    """ deterministic dataset: the same seed and scale always produce the same rows """
+
+    def __init__(self, scale: ScaleFactor, seed: int = 0):
+        self.scale = scale
+        self.seed = seed
+
+    def _rng(self, table: str) -> random.Random:
+        # one stream per table so that changing one fan-out does not reshuffle the other tables
+        return random.Random(str(self.seed) + ':' + table)
+
+    def critics(self) -> Iterator[tuple]:
+        for critic_id in range(1, self.scale.critics + 1):
+            yield critic_id, 'Critic ' + str(critic_id)
+
+    def actors(self) -> Iterator[tuple]:
+        rng = self._rng('actor')
+        for actor_id in range(1, self.scale.actors + 1):
+            yield actor_id, actorName(actor_id), rng.randint(8, 90), rng.randint(120, 210)
+
+    def movies(self) -> Iterator[tuple]:
+        rng = self._rng('movie')
+        for index in range(self.scale.movies):
+            name, year = movieKey(index)
+            yield name, year, rng.choice(GENRES)
+
+    def studios(self) -> Iterator[tuple]:
+        for studio_id in range(1, self.scale.studios + 1):
+            yield studio_id, 'Studio ' + str(studio_id)
+
+    def ratings(self) -> Iterator[tuple]:
+        rng = self._rng('ratings')
+        critic_ids = range(1, self.scale.critics + 1)
+        for index in range(self.scale.movies):
+            name, year = movieKey(index)
+            for critic_id in rng.sample(critic_ids, self.scale.ratings_per_movie):
+                yield name, year, critic_id, rng.randint(1, 5)
+
+    def casts(self) -> Iterator[tuple]:
+        rng = self._rng('casts')
+        actor_ids = range(1, self.scale.actors + 1)
+        for index in range(self.scale.movies):
+            name, year = movieKey(index)
+            for actor_id in rng.sample(actor_ids, self.scale.cast_size):
+                yield name, year, actor_id, rng.randint(1000, 1000000)
+
+    def roles(self) -> Iterator[tuple]:
+        # replays the casts stream so every role points at a cast row
+        for name, year, actor_id, _ in self.casts():
+            for role in range(self.scale.roles_per_actor):
+                yield name, year, actor_id, 'Role ' + str(role)
+
+    def productions(self) -> Iterator[tuple]:
+        rng = self._rng('productions')
+        for index in range(self.scale.movies):
+            if rng.random() >= self.scale.produced_ratio:
+                continue
+            name, year = movieKey(index)
+            budget = rng.randint(0, 10000000)
+            yield rng.randint(1, self.scale.studios), name, year, budget, rng.randint(0, 3 * budget)
+
+    # table name, column list and row source, in foreign key order
+    def tables(self):
+        return [('Critic', '(ID, Name)', self.critics),
+                ('Actor', '(ID, Name, Age, Height)', self.actors),
+                ('Movie', '(Name, Year, Genre)', self.movies),
+                ('Studio', '(ID, Name)', self.studios),
+                ('Ratings', '(MovieName, MovieYear, CriticID, Rating)', self.ratings),
+                ('Casts', '(MovieName, MovieYear, ActorID, Salary)', self.casts),
+                ('Roles', '(MovieName, MovieYear, ActorID, Role)', self.roles),
+                ('Productions', '(StudioID, MovieName, MovieYear, Budget, Revenue)', self.productions)]
+
+
+class _RowStream(io.TextIOBase):
+    """ file-like view over a row iterator, so COPY can stream rows without materializing the table """
+
+    def __init__(self, rows: Iterator[tuple]):
+        self._rows = rows
+        self._buffer = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += '\t'.join(str(value) for value in row) + '\n'
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def loadDataset(generator: DataGenerator, recreate: bool = True) -> dict:
+    """ bulk loads the generated rows with COPY, returns the number of rows loaded per table """
+    if recreate:
+        Solution.dropTables()
+        Solution.createTables()
+    loaded = {}
+    conn = Connector.DBConnector()
+    try:
+        for table, columns, rows in generator.tables():
+            conn.cursor.copy_expert('COPY ' + table + ' ' + columns + ' FROM STDIN', _RowStream(rows()))
+            loaded[table] = conn.cursor.rowcount
+        conn.commit()
+        # only the loaded tables, a database wide ANALYZE waits on (and deadlocks with) other schemas
+        conn.execute(''.join('ANALYZE ' + table + ';' for table in loaded))
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return loaded
@@ -0,0 +1,254 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+import Solution
+from Business.Actor import Actor
+from Business.Critic import Critic
+from Business.Movie import Movie
+from Business.Studio import Studio
+from Utility.ReturnValue import ReturnValue
+from Utility.Profiler import profiling
+from Utility.SingleFlight import coalescing
+from Benchmark.DataGenerator import DataGenerator, ScaleFactor, loadDataset, movieKey
+from Benchmark.Runner import summarize
+
+DEFAULT_MIX = {'profile': 50, 'rating': 25, 'cast': 10, 'analytics': 15}
+
+
+def operations(scale: ScaleFactor) -> Dict[str, Callable[[random.Random], Tuple[str, Callable, tuple]]]:
+    """ operation kinds of the mix. each one draws a concrete Solution call: (function name, function, args) """
+
+    def movie(rng):
+        return movieKey(rng.randrange(scale.movies))
+
+    def profile(rng):
+        choice = rng.randrange(3)
+        if choice == 0:
+            return 'getMovieProfile', Solution.getMovieProfile, movie(rng)
+        if choice == 1:
+            return 'getActorProfile', Solution.getActorProfile, (rng.randint(1, scale.actors),)
+        return 'getCriticProfile', Solution.getCriticProfile, (rng.randint(1, scale.critics),)
+
+    def rating(rng):
+        # inserts collide on the Ratings UNIQUE constraint with the generated rows and with other clients,
+        # the removals keep the table from filling up
+        args = movie(rng) + (rng.randint(1, scale.critics),)
+        if rng.random() < 0.5:
+            return 'criticRatedMovie', Solution.criticRatedMovie, args + (rng.randint(1, 5),)
+        return 'criticDidntRateMovie', Solution.criticDidntRateMovie, args
+
+    def cast(rng):
+        args = movie(rng) + (rng.randint(1, scale.actors),)
+        if rng.random() < 0.5:
+            return 'actorPlayedInMovie', Solution.actorPlayedInMovie, args + (rng.randint(1000, 100000), ['Extra'])
+        return 'actorDidntPlayInMovie', Solution.actorDidntPlayInMovie, args
+
+    def analytics(rng):
+        choice = rng.randrange(4)
+        if choice == 0:
+            return 'averageActorRating', Solution.averageActorRating, (rng.randint(1, scale.actors),)
+        if choice == 1:
+            return 'averageRating', Solution.averageRating, movie(rng)
+        if choice == 2:
+            return 'getFanCritics', Solution.getFanCritics, ()
+        return 'studioRevenueByYear', Solution.studioRevenueByYear, ()
+
+    return {'profile': profile, 'rating': rating, 'cast': cast, 'analytics': analytics}
+
+
+# outcome of a read that returned the error sentinel of its function: a bad business object (badMovie() ...),
+# 0 or []. Solution returns it for a failed query as well as for a missing row or an empty result
+EMPTY = 'EMPTY'
+
+
+def outcomeOf(result) -> str:
+    # writes report a ReturnValue, reads with data count as OK
+    if isinstance(result, ReturnValue):
+        return result.name
+    if isinstance(result, (Movie, Actor, Critic, Studio)):
+        return EMPTY if result == type(result)() else ReturnValue.OK.name
+    if result == 0 or result == []:
+        return EMPTY
+    return ReturnValue.OK.name
+
+
+def runClient(client_id: int, scale: ScaleFactor, mix: Dict[str, int], duration: float, rate: float,
+              seed: int, started: float) -> List[tuple]:
+    """ issues calls until duration elapses, returns (offset, function, latency, outcome) records.
+    with a rate the calls follow a fixed schedule and latency counts from the scheduled start, so a stalled
+    call is not hidden by the calls it delayed """
+    rng = random.Random(str(seed) + ':client:' + str(client_id))
+    kinds = operations(scale)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    interval = 1.0 / rate if rate else 0.0
+    records = []
+    scheduled = started
+    delay = started - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+    while True:
+        now = time.perf_counter()
+        if now - started >= duration:
+            break
+        if interval:
+            if scheduled > now:
+                time.sleep(scheduled - now)
+            start = scheduled
+            scheduled += interval
+        else:
+            start = now
+        name, function, args = kinds[rng.choices(names, weights)[0]](rng)
+        try:
+            outcome = outcomeOf(function(*args))
+        except Exception as e:
+            outcome = 'EXCEPTION:' + type(e).__name__
+        end = time.perf_counter()
+        records.append((start - started, name, end - start, outcome))
+    return records
+
+
+def _runProcessClient(arguments):
+    client_id, scale_dict, mix, duration, rate, seed, delay = arguments
+    # perf_counter is not shared between processes, each process anchors its own clock
+    return runClient(client_id, ScaleFactor(**scale_dict), mix, duration, rate, seed, time.perf_counter() + delay)
+
+
+def runLoad(scale: ScaleFactor, clients: int = 8, mix: Dict[str, int] = None, duration: float = 10.0,
+            rate: float = 0.0, seed: int = 0, processes: bool = False) -> List[tuple]:
+    """ drives clients concurrent callers for duration seconds. rate is the target of all clients together
+    in calls per second, 0 means as fast as possible """
+    mix = mix or DEFAULT_MIX
+    client_rate = rate / clients if rate else 0.0
+    if processes:
+        arguments = [(client_id, scale.toDict(), mix, duration, client_rate, seed, 0.5) for client_id in range(clients)]
+        with multiprocessing.Pool(clients) as pool:
+            return [record for records in pool.map(_runProcessClient, arguments) for record in records]
+
+    results = [None] * clients
+    started = time.perf_counter() + 0.1
+
+    def client(client_id):
+        results[client_id] = runClient(client_id, scale, mix, duration, client_rate, seed, started)
+
+    threads = [threading.Thread(target=client, args=(client_id,)) for client_id in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [record for records in results for record in records]
+
+
+def buildReport(records: List[tuple], duration: float, window: float = 1.0) -> dict:
+    """ totals, outcome breakdown and latency percentiles per function, overall and per time window """
+    outcomes = defaultdict(lambda: defaultdict(int))
+    latencies = defaultdict(list)
+    windows = defaultdict(lambda: defaultdict(list))
+    for offset, name, latency, outcome in records:
+        outcomes[name][outcome] += 1
+        latencies[name].append(latency)
+        windows[int(offset // window)][name].append(latency)
+
+    functions = {}
+    for name in sorted(latencies):
+        functions[name] = summarize(latencies[name])
+        functions[name]['outcomes'] = dict(outcomes[name])
+    timeline = []
+    for index in sorted(windows):
+        calls = sum(len(values) for values in windows[index].values())
+        timeline.append({'start_s': index * window,
+                         'throughput_per_s': calls / window,
+                         'functions': {name: summarize(values) for name, values in sorted(windows[index].items())}})
+    totals = defaultdict(int)
+    for counts in outcomes.values():
+        for outcome, count in counts.items():
+            totals[outcome] += count
+    return {'calls': len(records),
+            'duration_s': duration,
+            'throughput_per_s': len(records) / duration if duration else 0.0,
+            'outcomes': dict(totals),
+            'functions': functions,
+            'timeline': timeline}
+
+
+def printReport(report: dict) -> None:
+    print('calls %d in %.1fs, %.1f calls/s, outcomes %s' % (report['calls'], report['duration_s'],
+                                                          report['throughput_per_s'], report['outcomes']))
+    print('%-24s %8s %10s %10s %10s  %s' % ('function', 'calls', 'p50 ms', 'p95 ms', 'p99 ms', 'outcomes'))
+    for name, result in report['functions'].items():
+        print('%-24s %8d %10.3f %10.3f %10.3f  %s' % (name, result['samples'], result['p50_ms'], result['p95_ms'],
+                                                     result['p99_ms'], result['outcomes']))
+    print('%-8s %10s %10s' % ('second', 'calls/s', 'worst p99'))
+    for window in report['timeline']:
+        worst = max(result['p99_ms'] for result in window['functions'].values())
+        print('%-8.0f %10.1f %10.3f' % (window['start_s'], window['throughput_per_s'], worst))
+
+
+def parseMix(text: str) -> Dict[str, int]:
+    # "profile=50,rating=25"
+    mix = {}
+    for part in text.split(','):
+        name, weight = part.split('=')
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Concurrent mixed workload against the Solution API')
+    parser.add_argument('--scale', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--processes', action='store_true', help='run clients as processes instead of threads')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--rate', type=float, default=0.0, help='target calls per second over all clients')
+    parser.add_argument('--mix', type=parseMix, default=DEFAULT_MIX,
+                        help='weights per operation kind, e.g. profile=50,rating=25,cast=10,analytics=15')
+    parser.add_argument('--window', type=float, default=1.0, help='seconds per timeline window')
+    parser.add_argument('--skip-load', action='store_true', help='reuse the dataset already in the database')
+    parser.add_argument('--output', help='write the report as JSON')
+    parser.add_argument('--profile', help='profile the Solution calls, writes pstats to PROFILE and a report to '
+                                          'PROFILE.txt (thread clients only)')
+    parser.add_argument('--profile-sample', type=int, default=100,
+                        help='trace the allocations of every n-th call per function, 0 disables tracing')
+    parser.add_argument('--coalesce', action='store_true',
+                        help='identical concurrent reads share one query, reports how many did (thread clients only)')
+    args = parser.parse_args(argv)
+
+    if args.profile and args.processes:
+        parser.error('--profile only sees the calls of this process, drop --processes')
+    if args.coalesce and args.processes:
+        parser.error('--coalesce only shares the calls of one process, drop --processes')
+    unknown = set(args.mix) - set(DEFAULT_MIX)
+    if unknown:
+        parser.error('unknown operation kinds ' + ', '.join(sorted(unknown)))
+    scale = ScaleFactor.scaled(args.scale)
+    if not args.skip_load:
+        loadDataset(DataGenerator(scale, args.seed))
+
+    with contextlib.ExitStack() as stack:
+        if args.profile:
+            stack.enter_context(profiling(args.profile, Solution, args.profile_sample))
+        # outside the profiler, so only the queries that ran are profiled
+        flights = stack.enter_context(coalescing(Solution)) if args.coalesce else None
+        records = runLoad(scale, args.clients, args.mix, args.duration, args.rate, args.seed, args.processes)
+    report = buildReport(records, args.duration, args.window)
+    printReport(report)
+    if flights is not None:
+        report['single_flight'] = flights.summary()
+        print(flights.report())
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
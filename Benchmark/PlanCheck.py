@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Dict, List
+
+import Utility.DBConnector as Connector
+from Utility.DBConnector import splitStatements
+from Benchmark.DataGenerator import DataGenerator, ScaleFactor, loadDataset
+from Benchmark.Runner import defaultCases
+
+'''
+    EXPLAIN snapshots of every statement the Solution functions issue against a seeded dataset.
+    record:  python -m Benchmark.PlanCheck --record
+    check:   python -m Benchmark.PlanCheck        (exit code 1 on a plan regression)
+'''
+
+DEFAULT_SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plan_snapshot.json')
+INDEX_ACCESS = {'Index Scan', 'Index Only Scan', 'Bitmap Index Scan', 'Bitmap Heap Scan'}
+# plan node properties kept in a snapshot, costs and row estimates are only kept for the whole statement
+_NODE_KEYS = ['Node Type', 'Relation Name', 'Index Name', 'Join Type', 'Strategy', 'Operation']
+
+
+def captureStatements(scale: ScaleFactor, seed: int = 0) -> Dict[str, List[str]]:
+    """ runs each Solution function once through the benchmark cases and records the SQL it sent """
+    captured = {}
+    current = []
+    Connector.DBConnector.addQueryListener(current.append)
+    try:
+        for case in defaultCases(scale, analytics_samples=1):
+            del current[:]
+            rng = random.Random(str(seed) + ':' + case.name)
+            case.function(*case.make_args(rng))
+            captured[case.name] = [statement for text in current for statement in splitStatements(text)]
+    finally:
+        Connector.DBConnector.removeQueryListener(current.append)
+    return captured
+
+
+def normalizePlan(node: dict) -> dict:
+    normalized = {key: node[key] for key in _NODE_KEYS if key in node}
+    children = [normalizePlan(child) for child in node.get('Plans', [])]
+    if children:
+        normalized['Plans'] = children
+    return normalized
+
+
+def explain(statement: str) -> dict:
+    conn = Connector.DBConnector()
+    try:
+        _, result = conn.execute("EXPLAIN (FORMAT JSON) " + statement)
+        plan = result.rows[0][0][0]['Plan']
+    finally:
+        conn.rollback()
+        conn.close()
+    return {'statement': statement,
+            'total_cost': plan['Total Cost'],
+            'plan_rows': plan['Plan Rows'],
+            'plan': normalizePlan(plan)}
+
+
+def capturePlans(scale: ScaleFactor, seed: int = 0) -> dict:
+    plans = {}
+    for name, statements in captureStatements(scale, seed).items():
+        plans[name] = [explain(statement) for statement in statements]
+    return {'scale': scale.toDict(), 'seed': seed, 'plans': plans}
+
+
+def accessMethods(plan: dict, methods=None) -> Dict[str, set]:
+    """ relation name -> node types reading it """
+    methods = methods if methods is not None else {}
+    if 'Relation Name' in plan:
+        methods.setdefault(plan['Relation Name'].lower(), set()).add(plan['Node Type'])
+    for child in plan.get('Plans', []):
+        accessMethods(child, methods)
+    return methods
+
+
+def comparePlans(snapshot: dict, current: dict, cost_threshold: float = 0.5) -> Dict[str, List[str]]:
+    """ regressions per function: a relation read through an index in the snapshot that is now
+    sequentially scanned, an estimated cost that grew past cost_threshold, or a changed statement count """
+    regressions = {}
+    for name, statements in current['plans'].items():
+        before = snapshot['plans'].get(name)
+        if before is None:
+            continue
+        problems = []
+        if len(before) != len(statements):
+            problems.append('issues %d statements instead of %d' % (len(statements), len(before)))
+        for index, (old, new) in enumerate(zip(before, statements)):
+            old_methods, new_methods = accessMethods(old['plan']), accessMethods(new['plan'])
+            for relation, methods in new_methods.items():
+                if 'Seq Scan' in methods and old_methods.get(relation, set()) & INDEX_ACCESS \
+                        and 'Seq Scan' not in old_methods[relation]:
+                    problems.append('statement %d: %s is sequentially scanned, was %s' %
+                                    (index, relation, ', '.join(sorted(old_methods[relation]))))
+            if old['total_cost'] > 0 and new['total_cost'] > old['total_cost'] * (1 + cost_threshold):
+                problems.append('statement %d: estimated cost %.1f, was %.1f' %
+                                (index, new['total_cost'], old['total_cost']))
+        if problems:
+            regressions[name] = problems
+    return regressions
+
+
+def loadSnapshot(path: str = DEFAULT_SNAPSHOT) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Record or check EXPLAIN plans of every Solution query')
+    parser.add_argument('--record', action='store_true', help='overwrite the snapshot with the current plans')
+    parser.add_argument('--snapshot', default=DEFAULT_SNAPSHOT)
+    parser.add_argument('--scale', type=float, default=0.05, help='used when recording, checks reuse the '
+                                                                  'scale and seed of the snapshot')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cost-threshold', type=float, default=0.5)
+    parser.add_argument('--skip-load', action='store_true', help='reuse the dataset already in the database')
+    args = parser.parse_args(argv)
+
+    if args.record:
+        scale, seed, snapshot = ScaleFactor.scaled(args.scale), args.seed, None
+    else:
+        snapshot = loadSnapshot(args.snapshot)
+        scale, seed = ScaleFactor(**snapshot['scale']), snapshot['seed']
+    if not args.skip_load:
+        loadDataset(DataGenerator(scale, seed))
+    current = capturePlans(scale, seed)
+
+    if args.record:
+        with open(args.snapshot, 'w') as file:
+            json.dump(current, file, indent=1, sort_keys=True)
+        print('recorded %d functions in %s' % (len(current['plans']), args.snapshot))
+        return 0
+    regressions = comparePlans(snapshot, current, args.cost_threshold)
+    for name, problems in regressions.items():
+        for problem in problems:
+            print('PLAN REGRESSION %s: %s' % (name, problem))
+    if regressions:
+        return 1
+    print('no plan regressions in %d functions' % len(current['plans']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import argparse
+import json
+import re
+import sys
+from collections import defaultdict
+from typing import List
+
+import Utility.DBConnector as Connector
+from Benchmark.DataGenerator import DataGenerator, ScaleFactor, loadDataset
+from Benchmark.Runner import defaultCases, runBenchmarks
+from Benchmark.LoadGenerator import runLoad
+
+'''
+    Server-side statistics per Solution function, read from pg_stat_statements around a workload.
+    Every statement a Solution API function sends carries a /* solution:<function> */ tag (see DBConnector.tagQuery)
+    which maps the normalized statements back to the function that issued them.
+    needs shared_preload_libraries = 'pg_stat_statements' in postgresql.conf and a role allowed to reset it.
+    usage: python -m Benchmark.QueryStats --workload benchmark --scale 0.1
+'''
+
+UNTAGGED = '(untagged)'
+_TAG = re.compile(r'/\* solution:(\w+) \*/')
+
+# pg_stat_statements renamed total_time to total_exec_time in PostgreSQL 13
+_COLUMNS_13 = """calls, total_exec_time + total_plan_time AS total_time, total_plan_time AS plan_time, rows,
+                 shared_blks_hit, shared_blks_read"""
+_COLUMNS_OLD = """calls, total_time, 0 AS plan_time, rows, shared_blks_hit, shared_blks_read"""
+
+
+def _statements_query(columns: str) -> str:
+    return "SELECT query, " + columns + """ FROM pg_stat_statements
+            WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())"""
+
+
+def resetStatistics() -> None:
+    conn = Connector.DBConnector()
+    try:
+        conn.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements")
+        conn.execute("SELECT pg_stat_statements_reset()")
+    finally:
+        conn.close()
+
+
+def readStatements() -> List[dict]:
+    conn = Connector.DBConnector()
+    try:
+        try:
+            _, result = conn.execute(_statements_query(_COLUMNS_13))
+        except Exception:
+            conn.rollback()
+            _, result = conn.execute(_statements_query(_COLUMNS_OLD))
+    finally:
+        conn.close()
+    return [dict(zip(result.cols_header, row)) for row in result.rows]
+
+
+def functionOf(query: str) -> str:
+    match = _TAG.search(query)
+    return match.group(1) if match else UNTAGGED
+
+
+def aggregateByFunction(statements: List[dict], include_untagged: bool = False) -> List[dict]:
+    """ per function totals, ranked by total time. times in milliseconds """
+    totals = defaultdict(lambda: defaultdict(float))
+    for statement in statements:
+        function = functionOf(statement['query'])
+        if function == UNTAGGED and not include_untagged:
+            continue
+        for key in ('calls', 'total_time', 'plan_time', 'rows', 'shared_blks_hit', 'shared_blks_read'):
+            totals[function][key] += float(statement[key] or 0)
+        totals[function]['statements'] += 1
+    report = []
+    for function, values in totals.items():
+        row = {'function': function}
+        row.update(values)
+        row['mean_time'] = values['total_time'] / values['calls'] if values['calls'] else 0.0
+        hits_and_reads = values['shared_blks_hit'] + values['shared_blks_read']
+        row['hit_ratio'] = values['shared_blks_hit'] / hits_and_reads if hits_and_reads else 1.0
+        report.append(row)
+    report.sort(key=lambda row: row['total_time'], reverse=True)
+    return report
+
+
+def printReport(report: List[dict]) -> None:
+    print('%-24s %10s %12s %10s %10s %12s %12s %7s %12s' % ('function', 'calls', 'total ms', 'mean ms', 'plan ms',
+                                                           'blks hit', 'blks read', 'hit %', 'rows'))
+    for row in report:
+        print('%-24s %10d %12.1f %10.3f %10.1f %12d %12d %7.1f %12d' % (
+            row['function'], row['calls'], row['total_time'], row['mean_time'], row['plan_time'],
+            row['shared_blks_hit'], row['shared_blks_read'], 100 * row['hit_ratio'], row['rows']))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='pg_stat_statements report per Solution function')
+    parser.add_argument('--workload', choices=['benchmark', 'load', 'none'], default='benchmark',
+                        help='none only reads the statistics gathered so far')
+    parser.add_argument('--scale', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--samples', type=int, default=100, help='benchmark samples per function')
+    parser.add_argument('--clients', type=int, default=8, help='load clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='load seconds')
+    parser.add_argument('--skip-load', action='store_true', help='reuse the dataset already in the database')
+    parser.add_argument('--untagged', action='store_true', help='also list statements without a function tag')
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args(argv)
+
+    scale = ScaleFactor.scaled(args.scale)
+    if args.workload != 'none':
+        if not args.skip_load:
+            loadDataset(DataGenerator(scale, args.seed))
+        resetStatistics()
+        if args.workload == 'benchmark':
+            runBenchmarks(scale, args.samples, args.seed, defaultCases(scale))
+        else:
+            runLoad(scale, args.clients, duration=args.duration, seed=args.seed)
+
+    report = aggregateByFunction(readStatements(), args.untagged)
+    printReport(report)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
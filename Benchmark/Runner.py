@@ -0,0 +1,222 @@
+import argparse
+import json
+import math
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+import Solution
+from Business.Actor import Actor
+from Business.Critic import Critic
+from Business.Movie import Movie
+from Business.Studio import Studio
+from Benchmark.DataGenerator import DataGenerator, ScaleFactor, loadDataset, movieKey, actorName
+
+
+class BenchmarkCase:
+    """ one timed Solution function. make_args draws the arguments of a single call """
+
+    def __init__(self, name: str, function: Callable, make_args: Callable[[random.Random], tuple], samples=None):
+        self.name = name
+        self.function = function
+        self.make_args = make_args
+        self.samples = samples
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    # nearest rank, values must already be sorted. the product is rounded first, 0.07 * 100 is 7.000000000000001
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(round(fraction * len(sorted_values), 9)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float]) -> dict:
+    """ latencies in seconds, the summary in milliseconds """
+    ordered = sorted(latencies)
+    total = sum(ordered)
+    return {'samples': len(ordered),
+            'mean_ms': 1000 * total / len(ordered) if ordered else 0.0,
+            'p50_ms': 1000 * percentile(ordered, 0.50),
+            'p95_ms': 1000 * percentile(ordered, 0.95),
+            'p99_ms': 1000 * percentile(ordered, 0.99),
+            'max_ms': 1000 * ordered[-1] if ordered else 0.0,
+            'throughput_per_s': len(ordered) / total if total > 0 else 0.0}
+
+
+def defaultCases(scale: ScaleFactor, analytics_samples: int = 5) -> List[BenchmarkCase]:
+    """ every public Solution function. writes use ids beyond the generated ranges and are undone by the
+    matching delete case, so the dataset is unchanged after a run """
+
+    def movie(rng):
+        return movieKey(rng.randrange(scale.movies))
+
+    def actor_id(rng):
+        return rng.randint(1, scale.actors)
+
+    def critic_id(rng):
+        return rng.randint(1, scale.critics)
+
+    def studio_id(rng):
+        return rng.randint(1, scale.studios)
+
+    # each write case walks its own counter over keys beyond the generated ranges, so an add and its delete
+    # (or a relation insert and its removal) visit the same keys in the same order
+    counters = {}
+
+    def fresh(kind, first):
+        counters[kind] = counters.get(kind, first) + 1
+        return counters[kind]
+
+    def new_movie(kind):
+        return movieKey(fresh(kind, scale.movies - 1))
+
+    def paired(kind, count):
+        # deterministic partner of the n-th fresh movie of a relation case
+        return counters[kind] % count + 1
+
+    def production(kind):
+        name, year = new_movie(kind)
+        return paired(kind, scale.studios), name, year
+
+    def cast_of(kind):
+        name, year = new_movie(kind)
+        first = paired(kind, scale.actors)
+        # starts after the actor the actorPlayedInMovie case casts into the same movie
+        return name, year, [((first + offset) % scale.actors + 1, 1000, ['Lead'])
+                             for offset in range(scale.cast_size)]
+
+    return [
+        BenchmarkCase('getCriticProfile', Solution.getCriticProfile, lambda rng: (critic_id(rng),)),
+        BenchmarkCase('getActorProfile', Solution.getActorProfile, lambda rng: (actor_id(rng),)),
+        BenchmarkCase('getMovieProfile', Solution.getMovieProfile, lambda rng: movie(rng)),
+        BenchmarkCase('getStudioProfile', Solution.getStudioProfile, lambda rng: (studio_id(rng),)),
+        # the start of a name, and a fragment from its middle (as much as there is after the first word)
+        BenchmarkCase('searchMovies', Solution.searchMovies, lambda rng: (movie(rng)[0][:rng.randint(3, 8)], 20)),
+        BenchmarkCase('searchActors', Solution.searchActors,
+                      lambda rng: (actorName(actor_id(rng)).split(' ', 1)[1][:rng.randint(3, 8)], 20)),
+        BenchmarkCase('averageRating', Solution.averageRating, lambda rng: movie(rng)),
+        BenchmarkCase('averageActorRating', Solution.averageActorRating, lambda rng: (actor_id(rng),)),
+        BenchmarkCase('bestPerformance', Solution.bestPerformance, lambda rng: (actor_id(rng),)),
+        BenchmarkCase('stageCrewBudget', Solution.stageCrewBudget, lambda rng: movie(rng)),
+        BenchmarkCase('overlyInvestedInMovie', Solution.overlyInvestedInMovie,
+                      lambda rng: movie(rng) + (actor_id(rng),)),
+        BenchmarkCase('franchiseRevenue', Solution.franchiseRevenue, lambda rng: (), analytics_samples),
+        BenchmarkCase('studioRevenueByYear', Solution.studioRevenueByYear, lambda rng: (), analytics_samples),
+        BenchmarkCase('getFanCritics', Solution.getFanCritics, lambda rng: (), analytics_samples),
+        BenchmarkCase('averageAgeByGenre', Solution.averageAgeByGenre, lambda rng: (), analytics_samples),
+        BenchmarkCase('getExclusiveActors', Solution.getExclusiveActors, lambda rng: (), analytics_samples),
+        BenchmarkCase('addCritic', Solution.addCritic,
+                      lambda rng: (Critic(fresh('critic', scale.critics), 'Benchmark Critic'),)),
+        BenchmarkCase('addActor', Solution.addActor,
+                      lambda rng: (Actor(fresh('actor', scale.actors), 'Benchmark Actor', 30, 170),)),
+        BenchmarkCase('addStudio', Solution.addStudio,
+                      lambda rng: (Studio(fresh('studio', scale.studios), 'Benchmark Studio'),)),
+        BenchmarkCase('addMovie', Solution.addMovie, lambda rng: (Movie(*new_movie('movie'), 'Drama'),)),
+        BenchmarkCase('criticRatedMovie', Solution.criticRatedMovie,
+                      lambda rng: new_movie('rated') + (paired('rated', scale.critics), rng.randint(1, 5))),
+        BenchmarkCase('actorPlayedInMovie', Solution.actorPlayedInMovie,
+                      lambda rng: new_movie('cast') + (paired('cast', scale.actors), 1000, ['Lead'])),
+        BenchmarkCase('addMovieCast', Solution.addMovieCast, lambda rng: cast_of('bulk_cast')),
+        BenchmarkCase('studioProducedMovie', Solution.studioProducedMovie,
+                      lambda rng: production('produced') + (100, 200)),
+        BenchmarkCase('criticDidntRateMovie', Solution.criticDidntRateMovie,
+                      lambda rng: new_movie('unrated') + (paired('unrated', scale.critics),)),
+        BenchmarkCase('actorDidntPlayInMovie', Solution.actorDidntPlayInMovie,
+                      lambda rng: new_movie('uncast') + (paired('uncast', scale.actors),)),
+        BenchmarkCase('studioDidntProduceMovie', Solution.studioDidntProduceMovie,
+                      lambda rng: production('unproduced')),
+        BenchmarkCase('deleteCritic', Solution.deleteCritic, lambda rng: (fresh('deleted_critic', scale.critics),)),
+        BenchmarkCase('deleteActor', Solution.deleteActor, lambda rng: (fresh('deleted_actor', scale.actors),)),
+        BenchmarkCase('deleteStudio', Solution.deleteStudio, lambda rng: (fresh('deleted_studio', scale.studios),)),
+        BenchmarkCase('deleteMovie', Solution.deleteMovie, lambda rng: new_movie('deleted_movie')),
+    ]
+
+
+def runCase(case: BenchmarkCase, samples: int, seed: int = 0) -> dict:
+    rng = random.Random(str(seed) + ':' + case.name)
+    latencies = []
+    for _ in range(case.samples or samples):
+        args = case.make_args(rng)
+        start = time.perf_counter()
+        case.function(*args)
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def runBenchmarks(scale: ScaleFactor, samples: int = 100, seed: int = 0, cases=None, only=None) -> dict:
+    cases = cases if cases is not None else defaultCases(scale)
+    results = {}
+    for case in cases:
+        if only and case.name not in only:
+            continue
+        results[case.name] = runCase(case, samples, seed)
+    return {'scale': scale.toDict(), 'seed': seed, 'samples': samples, 'results': results}
+
+
+def compareBaselines(baseline: dict, current: dict, threshold: float = 0.2, metric: str = 'p95_ms') -> Dict[str, dict]:
+    """ functions whose metric grew by more than threshold (a ratio) relative to the baseline """
+    regressions = {}
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None or before[metric] <= 0:
+            continue
+        ratio = result[metric] / before[metric]
+        if ratio > 1 + threshold:
+            regressions[name] = {'baseline': before[metric], 'current': result[metric], 'ratio': ratio}
+    return regressions
+
+
+def printReport(report: dict) -> None:
+    print('%-24s %8s %10s %10s %10s %10s %12s' % ('function', 'samples', 'mean ms', 'p50 ms', 'p95 ms', 'p99 ms',
+                                                 'calls/s'))
+    for name, result in report['results'].items():
+        print('%-24s %8d %10.3f %10.3f %10.3f %10.3f %12.1f' % (name, result['samples'], result['mean_ms'],
+                                                               result['p50_ms'], result['p95_ms'], result['p99_ms'],
+                                                               result['throughput_per_s']))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Times every Solution function against a synthetic dataset')
+    parser.add_argument('--scale', type=float, default=0.1, help='scale factor, 1 is 10k movies and 200k ratings')
+    parser.add_argument('--ratings-per-movie', type=int)
+    parser.add_argument('--cast-size', type=int)
+    parser.add_argument('--roles-per-actor', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--samples', type=int, default=100)
+    parser.add_argument('--analytics-samples', type=int, default=5)
+    parser.add_argument('--only', nargs='*', help='function names to run')
+    parser.add_argument('--skip-load', action='store_true', help='reuse the dataset already in the database')
+    parser.add_argument('--output', help='write the results as a JSON baseline')
+    parser.add_argument('--baseline', help='compare against a previous JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 growth before a regression')
+    args = parser.parse_args(argv)
+
+    overrides = {key: value for key, value in (('ratings_per_movie', args.ratings_per_movie),
+                                               ('cast_size', args.cast_size),
+                                               ('roles_per_actor', args.roles_per_actor)) if value is not None}
+    scale = ScaleFactor.scaled(args.scale, **overrides)
+    if not args.skip_load:
+        start = time.perf_counter()
+        loaded = loadDataset(DataGenerator(scale, args.seed))
+        print('loaded %s in %.1fs' % (loaded, time.perf_counter() - start))
+
+    report = runBenchmarks(scale, args.samples, args.seed, defaultCases(scale, args.analytics_samples), args.only)
+    printReport(report)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compareBaselines(json.load(file), report, args.threshold)
+        for name, regression in regressions.items():
+            print('REGRESSION %s: p95 %.3fms -> %.3fms (x%.2f)' % (name, regression['baseline'],
+                                                                  regression['current'], regression['ratio']))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,6 @@
 class Actor:
+    __slots__ = ('__id', '__name', '__age', '__height')
+
     def __init__(self, actor_id=None, actor_name=None, age=None, height=None):
         self.__id = actor_id
         self.__name = actor_name
@@ -1,4 +1,6 @@
 class Critic:
+    __slots__ = ('__id', '__name')
+
     def __init__(self,critic_id=None, critic_name=None):
         self.__id = critic_id
         self.__name = critic_name
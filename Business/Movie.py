@@ -1,4 +1,6 @@
 class Movie:
+    __slots__ = ('__name', '__year', '__genre')
+
     def __init__(self, movie_name=None, year=None, genre=None):
         self.__name = movie_name
         self.__year = year
@@ -1,4 +1,6 @@
 class Studio():
+    __slots__ = ('__id', '__name')
+
     def __init__(self,studio_id=None, studio_name=None):
         self.__id = studio_id
         self.__name = studio_name
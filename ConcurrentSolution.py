@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, List, Tuple, Union
+
+import Solution
+import Utility.DBConnector as Connector
+
+
+class ConcurrentSolution:
+    """ runs many Solution calls at once on a thread pool, each with a pooled connection of its own.
+
+    submit returns a Future resolving to the usual ReturnValue / Business object / list result.
+    at most max_in_flight calls are queued or running, further submits block the caller until one finishes.
+
+        with ConcurrentSolution(max_workers=8) as solution:
+            future = solution.getMovieProfile("Mission Impossible", 1996)
+            movie = future.result()
+    """
+
+    def __init__(self, max_workers: int = 8, max_in_flight: int = None, use_pool: bool = True):
+        self.__owns_pool = use_pool and Connector.DBConnector.poolSize() == 0
+        if self.__owns_pool:
+            Connector.DBConnector.usePool(max_workers)
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='solution')
+        self.__in_flight = threading.BoundedSemaphore(max_in_flight or 2 * max_workers)
+
+    def submit(self, function: Union[str, Callable], *args) -> Future:
+        if isinstance(function, str):
+            function = ConcurrentSolution.__lookup(function)
+        self.__in_flight.acquire()
+        try:
+            future = self.__executor.submit(function, *args)
+        except Exception:
+            self.__in_flight.release()
+            raise
+        future.add_done_callback(lambda _: self.__in_flight.release())
+        return future
+
+    def submitMany(self, calls: Iterable[Tuple]) -> List[Future]:
+        """ calls are (function, arg, arg, ...) tuples, the futures come back in the same order """
+        return [self.submit(call[0], *call[1:]) for call in calls]
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.__executor.shutdown(wait=wait)
+        if self.__owns_pool:
+            Connector.DBConnector.usePool(0)
+            self.__owns_pool = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    # solution.averageRating(name, year) is solution.submit("averageRating", name, year)
+    def __getattr__(self, name: str):
+        function = ConcurrentSolution.__lookup(name)
+        return lambda *args: self.submit(function, *args)
+
+    @staticmethod
+    def __lookup(name: str) -> Callable:
+        function = getattr(Solution, name, None)
+        if name.startswith('_') or not callable(function) or getattr(function, '__module__', None) != 'Solution':
+            raise AttributeError('Solution has no function ' + name)
+        return function
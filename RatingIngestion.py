@@ -0,0 +1,254 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Tuple
+
+from psycopg2 import sql
+
+import Solution
+import Utility.DBConnector as Connector
+from Utility.ReturnValue import ReturnValue
+from Utility.Exceptions import DatabaseException
+
+# one statement writes a whole batch and reports, per input row, whether its movie and critic exist
+# and whether the row was written. rows skipped by ON CONFLICT come back with written = false
+WRITE_RATINGS = """
+                WITH Input AS (
+                    SELECT * FROM unnest({ords}::INTEGER[], {names}::TEXT[], {years}::INTEGER[],
+                                         {critics}::INTEGER[], {ratings}::INTEGER[])
+                    AS I(Ord, MovieName, MovieYear, CriticID, Rating)
+                ), Valid AS (
+                    SELECT * FROM Input
+                    WHERE EXISTS (SELECT 1 FROM LiveMovie WHERE LiveMovie.Name = Input.MovieName
+                                  AND LiveMovie.Year = Input.MovieYear)
+                    AND EXISTS (SELECT 1 FROM Critic WHERE Critic.ID = Input.CriticID)
+                ), Written AS (
+                    INSERT INTO Ratings (MovieName, MovieYear, CriticID, Rating)
+                    SELECT MovieName, MovieYear, CriticID, Rating FROM Valid
+                    ON CONFLICT (MovieName, MovieYear, CriticID) {conflict}
+                    RETURNING MovieName, MovieYear, CriticID
+                )
+                SELECT Input.Ord, Valid.Ord IS NOT NULL AS found, Written.CriticID IS NOT NULL AS written
+                FROM Input
+                LEFT OUTER JOIN Valid ON Valid.Ord = Input.Ord
+                LEFT OUTER JOIN Written ON Written.MovieName = Input.MovieName AND Written.MovieYear = Input.MovieYear
+                                       AND Written.CriticID = Input.CriticID;
+                """
+INSERT_CONFLICT = "DO NOTHING"
+# unchanged ratings are not rewritten, they still count as OK
+UPSERT_CONFLICT = "DO UPDATE SET Rating = EXCLUDED.Rating WHERE Ratings.Rating <> EXCLUDED.Rating"
+UPDATE_RATING = "UPDATE Ratings SET Rating = {rating} WHERE MovieName = {name} AND MovieYear = {year} AND CriticID = {critic};"
+
+
+def _validate(event: tuple):
+    """ the event with an integer year, or None when criticRatedMovie would answer BAD_PARAMS """
+    movieName, movieYear, criticID, rating = event
+    try:
+        movieYear, criticID, rating = int(movieYear), int(criticID), int(rating)
+    except (TypeError, ValueError):
+        return None
+    if not movieName or not 1 <= rating <= 5:
+        return None
+    return movieName, movieYear, criticID, rating
+
+
+def writeRatings(events: List[Tuple[str, int, int, int]], upsert: bool = False) -> List[ReturnValue]:
+    """ writes (movieName, movieYear, criticID, rating) events with one statement and returns the outcome
+    of each event in input order, the same value criticRatedMovie would have returned had the events
+    been applied one after the other. in upsert mode an existing rating is replaced and the event is OK """
+    results = [ReturnValue.BAD_PARAMS] * len(events)
+    # the event that is actually sent for each key, its duplicates share its outcome
+    representative = {}
+    followers = {}
+    for index, event in enumerate(events):
+        event = _validate(event)
+        if event is None:
+            continue
+        key = event[:3]
+        if key in representative and not upsert:
+            followers.setdefault(representative[key], []).append(index)
+            continue
+        if key in representative:
+            # the last rating of a key wins, like consecutive updates would
+            followers.setdefault(index, []).append(representative[key])
+            followers[index].extend(followers.pop(representative[key], []))
+        representative[key] = index
+    batch = {index: _validate(events[index]) for index in representative.values()}
+    if not batch:
+        return results
+
+    outcomes = _write(batch, upsert)
+    for index, outcome in outcomes.items():
+        results[index] = outcome
+        for follower in followers.get(index, []):
+            # a second insert of a key that was just written finds it
+            results[follower] = ReturnValue.ALREADY_EXISTS if outcome == ReturnValue.OK and not upsert else outcome
+    return results
+
+
+def _write(batch: dict, upsert: bool) -> dict:
+    if Connector.DBConnector.backend() == Connector.SQLITE:
+        return _writeEach(batch, upsert)
+    ords = list(batch.keys())
+    query = sql.SQL(WRITE_RATINGS).format(
+        ords=sql.Literal(ords),
+        names=sql.Literal([batch[index][0] for index in ords]),
+        years=sql.Literal([batch[index][1] for index in ords]),
+        critics=sql.Literal([batch[index][2] for index in ords]),
+        ratings=sql.Literal([batch[index][3] for index in ords]),
+        conflict=sql.SQL(UPSERT_CONFLICT if upsert else INSERT_CONFLICT))
+    conn = Connector.DBConnector()
+    try:
+        _, result = conn.execute(Connector.tagQuery(query, 'writeRatings'))
+        outcomes = {}
+        for index, found, written in result.rows:
+            if not found:
+                outcomes[index] = ReturnValue.NOT_EXISTS
+            elif written or upsert:
+                outcomes[index] = ReturnValue.OK
+            else:
+                outcomes[index] = ReturnValue.ALREADY_EXISTS
+        return outcomes
+    except DatabaseException.FOREIGN_KEY_VIOLATION as e:
+        if Solution.DEBUG:
+            print(e)
+        # a movie or critic was deleted after the existence check, retry the events one by one
+        if len(batch) == 1:
+            return {index: ReturnValue.NOT_EXISTS for index in batch}
+        outcomes = {}
+        for index, event in batch.items():
+            outcomes.update(_write({index: event}, upsert))
+        return outcomes
+    except Exception as e:
+        if Solution.DEBUG:
+            print(e)
+        return {index: ReturnValue.ERROR for index in batch}
+    finally:
+        conn.close()
+
+
+def _writeEach(batch: dict, upsert: bool) -> dict:
+    """ one criticRatedMovie per event, for SQLite which has no data modifying CTEs """
+    outcomes = {}
+    for index, (movieName, movieYear, criticID, rating) in batch.items():
+        outcomes[index] = Solution.criticRatedMovie(movieName, movieYear, criticID, rating)
+        if not upsert or outcomes[index] != ReturnValue.ALREADY_EXISTS:
+            continue
+        query = sql.SQL(UPDATE_RATING).format(rating=sql.Literal(rating), name=sql.Literal(movieName),
+                                              year=sql.Literal(movieYear), critic=sql.Literal(criticID))
+        conn = Connector.DBConnector()
+        try:
+            conn.execute(Connector.tagQuery(query, 'writeRatings'))
+            outcomes[index] = ReturnValue.OK
+        except Exception as e:
+            if Solution.DEBUG:
+                print(e)
+            outcomes[index] = ReturnValue.ERROR
+        finally:
+            conn.close()
+    return outcomes
+
+
+class RatingIngestion:
+    """ coalesces a stream of rating events into micro-batches written by writeRatings.
+
+    a batch is written once max_batch events are waiting or the oldest waiting event is max_delay seconds old.
+    submit returns a Future resolving to the event's ReturnValue.
+
+        with RatingIngestion(max_batch=500, max_delay=0.05) as ingestion:
+            future = ingestion.submit("Mission Impossible", 1996, 1, 4)
+            ingestion.submit("Mission Impossible", 1996, 1, 5, upsert=True)
+    """
+
+    def __init__(self, max_batch: int = 500, max_delay: float = 0.05, upsert: bool = False):
+        self.__max_batch = max_batch
+        self.__max_delay = max_delay
+        self.__upsert = upsert
+        self.__events = queue.Queue()
+        self.__closed = False
+        self.__batches = 0
+        self.__written = 0
+        # a connection bound by the creating thread (e.g. a test transaction) is shared with the writer
+        self.__connection = Connector.DBConnector.boundConnection()
+        self.__worker = threading.Thread(target=self.__run, name='rating-ingestion', daemon=True)
+        self.__worker.start()
+
+    def submit(self, movieName: str, movieYear: int, criticID: int, rating: int, upsert: bool = None) -> Future:
+        if self.__closed:
+            raise RuntimeError('RatingIngestion is closed')
+        future = Future()
+        upsert = self.__upsert if upsert is None else upsert
+        self.__events.put(((movieName, movieYear, criticID, rating), upsert, future))
+        return future
+
+    def submitMany(self, events: List[Tuple[str, int, int, int]], upsert: bool = None) -> List[Future]:
+        return [self.submit(*event, upsert=upsert) for event in events]
+
+    def flush(self) -> None:
+        """ blocks until every event submitted so far has been written """
+        self.__events.join()
+
+    def close(self) -> None:
+        if self.__closed:
+            return
+        self.__closed = True
+        self.__events.put(None)
+        self.__worker.join()
+
+    def stats(self) -> dict:
+        return {'batches': self.__batches, 'events': self.__written, 'pending': self.__events.qsize()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __run(self):
+        if self.__connection is not None:
+            Connector.DBConnector.bind(self.__connection)
+        stopping = False
+        while not stopping:
+            first = self.__events.get()
+            if first is None:
+                self.__events.task_done()
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.__max_delay
+            while len(batch) < self.__max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    event = self.__events.get(timeout=remaining) if remaining > 0 else self.__events.get_nowait()
+                except queue.Empty:
+                    break
+                if event is None:
+                    self.__events.task_done()
+                    stopping = True
+                    break
+                batch.append(event)
+            self.__flushBatch(batch)
+
+    def __flushBatch(self, batch: list):
+        try:
+            # events keep their order, consecutive events of the same mode share one statement
+            start = 0
+            while start < len(batch):
+                end = start
+                while end < len(batch) and batch[end][1] == batch[start][1]:
+                    end += 1
+                run = batch[start:end]
+                try:
+                    outcomes = writeRatings([event for event, _, _ in run], run[0][1])
+                except Exception as e:
+                    if Solution.DEBUG:
+                        print(e)
+                    outcomes = [ReturnValue.ERROR] * len(run)
+                for (_, _, future), outcome in zip(run, outcomes):
+                    future.set_result(outcome)
+                self.__batches += 1
+                self.__written += len(run)
+                start = end
+        finally:
+            for _ in batch:
+                self.__events.task_done()
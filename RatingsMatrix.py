@@ -0,0 +1,283 @@
+import array
+import codecs
+import csv
+import io
+import struct
+from typing import Dict, List, Tuple
+
+import numpy as np
+from psycopg2.extensions import encodings
+
+import Utility.DBConnector as Connector
+
+FORMATS = ('binary', 'csv')
+
+# ordered by critic so every critic's row of the matrix arrives in one piece and needs no client side sort
+_EXPORT = "SELECT CriticID, MovieName, MovieYear, Rating FROM LiveRatings ORDER BY CriticID, MovieName, MovieYear"
+_COPY_OPTIONS = {'binary': '(FORMAT binary)', 'csv': '(FORMAT csv)'}
+# bytes read at a time by fromCopy, and written by the COPY before they are parsed
+CHUNK_SIZE = 1 << 16
+
+_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+_INT16 = struct.Struct('>h')
+_INT32 = struct.Struct('>i')
+# the critic id field and the length of the name, then the year and rating fields
+_FIRST = struct.Struct('>iii')
+_LAST = struct.Struct('>iiii')
+
+
+class RatingsMatrix:
+    """ the critic x movie ratings as a compressed sparse row matrix: the ratings of the critic of row r are
+    data[indptr[r]:indptr[r + 1]], given to the movies (columns) indices[indptr[r]:indptr[r + 1]].
+
+    rows are the critics with at least one rating, in id order, and columns the movies with at least one rating,
+    in (name, year) order. criticIds / movies map a row / column back to its critic id / movie key and
+    criticIndex / movieIndex go the other way.
+
+        matrix = exportRatings()
+        matrix.row(critic_id)
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, critic_ids: np.ndarray,
+                 movies: List[Tuple[str, int]]):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.criticIds = critic_ids
+        self.movies = movies
+        self.criticIndex = {int(critic_id): row for row, critic_id in enumerate(critic_ids)}
+        self.movieIndex = {movie: column for column, movie in enumerate(movies)}
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return len(self.criticIds), len(self.movies)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def row(self, critic_id: int) -> Dict[Tuple[str, int], int]:
+        """ the ratings of one critic by movie key, empty for a critic without ratings """
+        row = self.criticIndex.get(critic_id)
+        if row is None:
+            return {}
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return {self.movies[column]: int(rating) for column, rating in zip(self.indices[start:end],
+                                                                           self.data[start:end])}
+
+    def toDense(self) -> np.ndarray:
+        """ the full matrix, 0 where a critic did not rate a movie. only for small matrices """
+        dense = np.zeros(self.shape, dtype=self.data.dtype)
+        rows = np.repeat(np.arange(len(self.criticIds)), np.diff(self.indptr))
+        dense[rows, self.indices] = self.data
+        return dense
+
+    def toScipy(self):
+        """ the matrix as a scipy.sparse.csr_matrix, needs scipy """
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+
+    @staticmethod
+    def fromCopy(file, format: str = 'binary', encoding: str = 'utf-8',
+                 chunk_size: int = CHUNK_SIZE) -> 'RatingsMatrix':
+        """ the matrix of a saved COPY of the export query (critic id, movie name, movie year, rating ordered by
+        critic), read chunk_size bytes at a time """
+        builder = _MatrixBuilder()
+        sink = _sink(format, builder, encoding, chunk_size)
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            sink.write(chunk)
+        sink.close()
+        return builder.matrix()
+
+
+class _MatrixBuilder:
+    # about 5 bytes per rating while the export streams in: a movie code and the rating. movies get codes in
+    # the order they are first seen and are renumbered in key order at the end
+    def __init__(self):
+        self.columns = array.array('i')
+        self.ratings = array.array('b')
+        self.critics = array.array('q')
+        self.counts = array.array('q')
+        self.movieCodes = {}
+
+    def extend(self, critic_ids: list, movies: list, ratings: list) -> None:
+        """ a batch of ratings, ordered by critic like the whole export """
+        if not critic_ids:
+            return
+        codes = self.movieCodes
+        self.columns.extend([codes.setdefault(movie, len(codes)) for movie in movies])
+        self.ratings.extend(ratings)
+        ids = np.array(critic_ids, dtype=np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(ids[1:] != ids[:-1]) + 1))
+        run_ids, run_counts = ids[starts], np.diff(np.append(starts, len(ids)))
+        if np.any(run_ids[1:] < run_ids[:-1]) or (self.critics and run_ids[0] < self.critics[-1]):
+            raise ValueError('ratings must be ordered by critic')
+        if self.critics and run_ids[0] == self.critics[-1]:
+            # the batch goes on with the last critic of the previous one
+            self.counts[-1] += int(run_counts[0])
+            run_ids, run_counts = run_ids[1:], run_counts[1:]
+        self.critics.extend(run_ids.tolist())
+        self.counts.extend(run_counts.tolist())
+
+    def matrix(self) -> RatingsMatrix:
+        movies = sorted(self.movieCodes)
+        renumber = np.empty(len(movies), dtype=np.int32)
+        for column, movie in enumerate(movies):
+            renumber[self.movieCodes[movie]] = column
+        indices = renumber[np.frombuffer(self.columns, dtype=np.int32)] if movies else np.empty(0, np.int32)
+        data = np.frombuffer(self.ratings, dtype=np.int8).copy()
+        indptr = np.zeros(len(self.counts) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(self.counts, dtype=np.int64), out=indptr[1:])
+        rows = np.repeat(np.arange(len(self.counts), dtype=np.int64), np.diff(indptr))
+        # the database orders names by its collation, the columns are in code point order
+        if len(indices) > 1 and np.any((np.diff(indices) <= 0) & (np.diff(rows) == 0)):
+            order = np.lexsort((indices, rows))
+            indices, data = indices[order], data[order]
+        return RatingsMatrix(indptr, indices, data, np.array(self.critics, dtype=np.int64), movies)
+
+
+class _BinarySink:
+    # parses COPY binary output once batch bytes were written, a tuple may be split over any number of writes.
+    # every tuple of the export is: 4 fields, the critic id, the movie name, the year and the rating
+    def __init__(self, builder: _MatrixBuilder, encoding: str, batch: int):
+        self.builder = builder
+        self.encoding = encoding
+        self.batch = batch
+        self.chunks = []
+        self.size = 0
+        self.rest = b''
+        self.header = False
+        self.ended = False
+
+    def write(self, data: bytes) -> None:
+        self.chunks.append(data)
+        self.size += len(data)
+        if self.size >= self.batch:
+            self.__parse()
+
+    def __parse(self) -> None:
+        buffer = self.rest + b''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        offset = 0
+        if not self.header:
+            offset = self.__header(buffer)
+            if offset is None:
+                self.rest = buffer
+                return
+        critic_ids, movies, ratings = [], [], []
+        end, encoding = len(buffer), self.encoding
+        while offset + 2 <= end and not self.ended:
+            fields, = _INT16.unpack_from(buffer, offset)
+            if fields == -1:
+                self.ended = True
+                offset += 2
+                break
+            if fields != 4:
+                raise ValueError('not a COPY of the ratings export')
+            if offset + 14 > end:
+                break
+            _, critic_id, length = _FIRST.unpack_from(buffer, offset + 2)
+            tail = offset + 14 + length
+            if tail + 16 > end:
+                # the rest of the tuple comes with the next write
+                break
+            _, year, _, rating = _LAST.unpack_from(buffer, tail)
+            critic_ids.append(critic_id)
+            movies.append((buffer[offset + 14:tail].decode(encoding), year))
+            ratings.append(rating)
+            offset = tail + 16
+        self.rest = buffer[offset:]
+        self.builder.extend(critic_ids, movies, ratings)
+
+    def __header(self, buffer: bytes):
+        # the end of the signature, the flags and the header extension, None while they are incomplete
+        if len(buffer) < len(_SIGNATURE) + 8:
+            return None
+        if not buffer.startswith(_SIGNATURE):
+            raise ValueError('not a binary COPY')
+        extension, = _INT32.unpack_from(buffer, len(_SIGNATURE) + 4)
+        end = len(_SIGNATURE) + 8 + extension
+        if len(buffer) < end:
+            return None
+        self.header = True
+        return end
+
+    def close(self) -> None:
+        self.__parse()
+        if not self.ended or self.rest:
+            raise ValueError('binary COPY ended in the middle of the data')
+
+
+class _CsvSink:
+    # parses COPY csv output once batch bytes were written. a line only ends a record outside of a quoted field
+    def __init__(self, builder: _MatrixBuilder, encoding: str, batch: int):
+        self.builder = builder
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.batch = batch
+        self.chunks = []
+        self.size = 0
+        self.rest = ''
+
+    def write(self, data) -> None:
+        self.chunks.append(self.decoder.decode(data) if isinstance(data, bytes) else data)
+        self.size += len(data)
+        if self.size >= self.batch:
+            self.__parse(final=False)
+
+    def __parse(self, final: bool) -> None:
+        text = self.rest + ''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        complete = len(text)
+        if not final:
+            end = len(text)
+            while True:
+                newline = text.rfind('\n', 0, end)
+                if newline < 0:
+                    self.rest = text
+                    return
+                if text.count('"', 0, newline) % 2 == 0:
+                    break
+                end = newline
+            complete = newline + 1
+        self.rest = text[complete:]
+        rows = list(csv.reader(io.StringIO(text[:complete], newline='')))
+        self.builder.extend([int(row[0]) for row in rows], [(row[1], int(row[2])) for row in rows],
+                            [int(row[3]) for row in rows])
+
+    def close(self) -> None:
+        self.chunks.append(self.decoder.decode(b'', final=True))
+        self.__parse(final=True)
+
+
+def _sink(format: str, builder: _MatrixBuilder, encoding: str, batch: int):
+    if format not in FORMATS:
+        raise ValueError('format must be one of ' + ', '.join(FORMATS))
+    return (_BinarySink if format == 'binary' else _CsvSink)(builder, encoding, batch)
+
+
+def exportRatings(format: str = 'binary') -> RatingsMatrix:
+    """ the live ratings as a RatingsMatrix, streamed from the database by one COPY (a consistent snapshot).
+    rows are parsed as they arrive, only the compact columns of the matrix are kept. binary is the cheaper to
+    parse, csv the one to use through tools that only pass text. SQLite has no COPY TO, its rows are read by a
+    plain query and the format is ignored """
+    if format not in FORMATS:
+        raise ValueError('format must be one of ' + ', '.join(FORMATS))
+    builder = _MatrixBuilder()
+    conn = Connector.DBConnector(readOnly=True)
+    try:
+        if Connector.DBConnector.backend() == Connector.PRIMARY:
+            sink = _sink(format, builder, encodings[conn.connection.encoding], CHUNK_SIZE)
+            query = 'COPY (%s) TO STDOUT %s' % (_EXPORT, _COPY_OPTIONS[format])
+            conn.cursor.copy_expert(Connector.tagQuery(query, 'exportRatings'), sink)
+            sink.close()
+        else:
+            conn.cursor.execute(Connector.tagQuery(_EXPORT, 'exportRatings'))
+            rows = conn.cursor.fetchall()
+            builder.extend([row[0] for row in rows], [(row[1], row[2]) for row in rows], [row[3] for row in rows])
+    finally:
+        conn.rollback()
+        conn.close()
+    return builder.matrix()
@@ -0,0 +1,102 @@
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Tuple, Union
+
+from psycopg2 import sql
+
+import Solution
+import Utility.DBConnector as Connector
+from Utility.SingleFlight import READ_FUNCTIONS
+
+# the nightly report, what runReport runs when no functions are given
+REPORT_FUNCTIONS = ['franchiseRevenue', 'studioRevenueByYear', 'getFanCritics', 'averageAgeByGenre',
+                    'getExclusiveActors']
+
+
+@contextlib.contextmanager
+def consistentSnapshot(snapshot_id: str = None, export: bool = False):
+    """ every Solution call of this thread inside the block reads one snapshot of the database, on one
+    connection in a REPEATABLE READ READ ONLY transaction (a plain transaction on SQLite, whose reads are
+    consistent anyway). with export the snapshot is exported and its id yielded, other connections (threads or
+    processes) join it by passing that id as snapshot_id while this block is still open. otherwise None is yielded.
+
+    a thread already bound to a connection (see DBConnector.bind) reads in that transaction instead,
+    nothing is exported from it since other connections could not see its own writes
+
+        with consistentSnapshot():
+            revenue, fans = Solution.franchiseRevenue(), Solution.getFanCritics()
+    """
+    if Connector.DBConnector.boundConnection() is not None:
+        yield None
+        return
+    postgres = Connector.DBConnector.backend() == Connector.PRIMARY
+    # an imported snapshot must be taken on the server that exported it, the primary (or shard) of both
+    conn = Connector.DBConnector(readOnly=snapshot_id is None and not export)
+    try:
+        exported = None
+        if postgres:
+            conn.cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            if snapshot_id is not None:
+                conn.cursor.execute(sql.SQL("SET TRANSACTION SNAPSHOT {}").format(sql.Literal(snapshot_id)))
+            if export:
+                conn.cursor.execute("SELECT pg_export_snapshot()")
+                exported = conn.cursor.fetchall()[0][0]
+        elif snapshot_id is not None or export:
+            raise ValueError('only PostgreSQL shares snapshots between connections')
+        Connector.DBConnector.bind(conn.connection)
+        try:
+            yield exported
+        finally:
+            Connector.DBConnector.unbind()
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def runReport(functions: Iterable[Union[str, Tuple]] = None, workers: int = 1) -> Dict[Union[str, Tuple], object]:
+    """ runs the read functions of Solution, by name or as (name, arg, arg, ...) tuples, all on one snapshot so
+    their results agree with each other, and returns each result under its name (or tuple), in the given order.
+
+    with workers > 1 the functions are spread over that many connections on PostgreSQL, all reading the snapshot
+    exported by the first. inside a bound transaction, and on SQLite, they run one after the other on one connection
+
+        report = runReport(workers=3)
+        report['getFanCritics']
+    """
+    calls = list(functions if functions is not None else REPORT_FUNCTIONS)
+    for call in calls:
+        name = call if isinstance(call, str) else call[0]
+        if name not in READ_FUNCTIONS:
+            raise ValueError(name + ' is not a read function of Solution')
+    parallel = workers > 1 and len(calls) > 1 and Connector.DBConnector.backend() == Connector.PRIMARY \
+        and Connector.DBConnector.boundConnection() is None
+    if not parallel:
+        with consistentSnapshot():
+            return _run(calls)
+
+    shares = [calls[worker::workers] for worker in range(min(workers, len(calls)))]
+    shard = Connector.DBConnector.currentShard()
+    results = {}
+    with consistentSnapshot(export=True) as snapshot_id, ThreadPoolExecutor(len(shares) - 1) as executor:
+        # the other shares import the snapshot while this transaction keeps it alive
+        futures = [executor.submit(_runOn, share, snapshot_id, shard) for share in shares[1:]]
+        results.update(_run(shares[0]))
+        for future in futures:
+            results.update(future.result())
+    return {call: results[call] for call in calls}
+
+
+def _runOn(calls: list, snapshot_id: str, shard: str) -> dict:
+    with Connector.DBConnector.onShard(shard) if shard is not None else contextlib.nullcontext(), \
+            consistentSnapshot(snapshot_id=snapshot_id):
+        return _run(calls)
+
+
+def _run(calls: list) -> dict:
+    results = {}
+    for call in calls:
+        if isinstance(call, str):
+            results[call] = getattr(Solution, call)()
+        else:
+            results[call] = getattr(Solution, call[0])(*call[1:])
+    return results
@@ -0,0 +1,398 @@
+import heapq
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple, Union
+
+from psycopg2 import sql
+
+import Solution
+import Utility.DBConnector as Connector
+from Utility.ReturnValue import ReturnValue
+from Business.Movie import Movie
+from Business.Studio import Studio
+from Business.Critic import Critic
+from Business.Actor import Actor
+
+# the rows that belong to a movie and live on its home shard, parents first
+_MOVIE_RELATIONS = [
+    ('Ratings', ['MovieName', 'MovieYear', 'CriticID', 'Rating']),
+    ('Casts', ['MovieName', 'MovieYear', 'ActorID', 'Salary']),
+    ('Roles', ['MovieName', 'MovieYear', 'ActorID', 'Role']),
+]
+# the studio producing a movie, part of the directory on every shard, so finding the home shard of a movie
+# is one lookup on one shard. it goes with its movie
+CREATE_PLACEMENT_TABLE = """
+                CREATE TABLE IF NOT EXISTS MoviePlacement(
+                MovieName TEXT NOT NULL,
+                MovieYear INTEGER NOT NULL,
+                StudioID INTEGER NOT NULL,
+                PRIMARY KEY(MovieName, MovieYear),
+                FOREIGN KEY(MovieName, MovieYear) REFERENCES Movie ON DELETE CASCADE
+                );
+                """
+
+
+class ShardedSolution:
+    """ the Solution API over several databases, the shard* sections of database.ini (see DBConnector.shards).
+
+    Critic, Actor and Movie are a directory replicated on every shard, along with the studio producing each
+    movie (MoviePlacement). a studio and its productions live on shard studio_id % shards, and a produced
+    movie's ratings, casts and roles live with its studio. the rows of a movie nobody produced live on a shard
+    picked by hashing its name and year, and they move when a studio produces the movie or stops producing it.
+    a call on one movie looks up its placement on one shard and then runs on the movie's home shard.
+
+    franchiseRevenue, studioRevenueByYear, getFanCritics and getExclusiveActors query every shard at once and
+    merge the results in the order Solution returns them. averageActorRating, bestPerformance and
+    averageAgeByGenre span the movies of every shard and are not offered.
+
+    writes to several shards are not atomic: a directory write is applied to the first shard, then copied to
+    the others, and a failed copy returns ERROR. a movie's relation writes racing with a studio starting or
+    stopping to produce it may land on the shard it is leaving.
+
+        with ShardedSolution() as solution:
+            solution.createTables()
+            solution.studioProducedMovie(3, "Mission Impossible", 1996, 100, 200)
+            solution.studioRevenueByYear()
+    """
+
+    def __init__(self, shards: List[str] = None):
+        self.shards = list(shards or Connector.DBConnector.shards())
+        if not self.shards:
+            raise ValueError('database.ini lists no shard sections')
+        self.__executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix='shard')
+
+    def close(self) -> None:
+        self.__executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    # ---------------------------------- placement: ----------------------------------
+    def studioShard(self, studio_id: int) -> str:
+        if not isinstance(studio_id, int):
+            # no such studio anywhere, any shard gives the answer Solution gives
+            return self.shards[0]
+        return self.shards[studio_id % len(self.shards)]
+
+    def movieShard(self, movie_name: str, movie_year: int) -> str:
+        """ the shard of the rows of a movie no studio produces """
+        return self.shards[zlib.crc32(repr((movie_name, movie_year)).encode()) % len(self.shards)]
+
+    def homeShard(self, movie_name: str, movie_year: int, caller: str = 'homeShard') -> str:
+        """ the shard holding the ratings, casts and roles of a movie: its studio's, or movieShard when unproduced.
+        its lookup queries are tagged as caller's """
+        return self.__locate(movie_name, movie_year, caller)[0]
+
+    def __locate(self, movie_name: str, movie_year: int, caller: str) -> Tuple[str, bool]:
+        # (home shard, whether a studio produces the movie)
+        studio_id = self.__on(self.__directoryShard(movie_name, movie_year), _placement, movie_name, movie_year,
+                              caller)
+        if studio_id is None:
+            return self.movieShard(movie_name, movie_year), False
+        return self.studioShard(studio_id), True
+
+    def __directoryShard(self, *key) -> str:
+        # directory reads are spread over the shards, each holds every row
+        return self.shards[zlib.crc32(repr(key).encode()) % len(self.shards)]
+
+    # ---------------------------------- execution: ----------------------------------
+    @staticmethod
+    def __on(shard: str, function: Callable, *args):
+        with Connector.DBConnector.onShard(shard):
+            return function(*args)
+
+    def __scatter(self, function: Callable, *args) -> list:
+        """ function(*args) on every shard at once, the results in shard order """
+        remaining = Connector.DBConnector.remainingTime()
+        futures = [self.__executor.submit(self.__run, shard, remaining, function, args) for shard in self.shards]
+        return [future.result() for future in futures]
+
+    @staticmethod
+    def __run(shard: str, remaining: float, function: Callable, args: tuple):
+        # the pool threads inherit neither the shard nor the caller's deadline
+        with Connector.DBConnector.onShard(shard):
+            if remaining is None:
+                return function(*args)
+            with Connector.DBConnector.deadline(remaining):
+                return function(*args)
+
+    def __everywhere(self, function: Callable, *args) -> ReturnValue:
+        # the first shard decides, the other copies only follow a change it accepted
+        result = self.__on(self.shards[0], function, *args)
+        if result != ReturnValue.OK or len(self.shards) == 1:
+            return result
+        remaining = Connector.DBConnector.remainingTime()
+        futures = [self.__executor.submit(self.__run, shard, remaining, function, args) for shard in self.shards[1:]]
+        if any(future.result() == ReturnValue.ERROR for future in futures):
+            return ReturnValue.ERROR
+        return result
+
+    def __move(self, movie_name: str, movie_year: int, source: str, target: str) -> None:
+        """ moves the ratings, casts and roles of a movie from shard source to target. the movie row stays locked
+        on source meanwhile, so no relation row of the movie is added there while they are copied """
+        if source == target:
+            return
+        movie = [sql.Literal(movie_name), sql.Literal(movie_year)]
+        with Connector.DBConnector.onShard(source):
+            conn = Connector.DBConnector()
+        try:
+            conn.cursor.execute(sql.SQL("SELECT 1 FROM Movie WHERE Name = {} AND Year = {} FOR UPDATE").format(*movie))
+            inserts = []
+            for table, columns in _MOVIE_RELATIONS:
+                names = sql.SQL(', ').join(map(sql.Identifier, map(str.lower, columns)))
+                conn.cursor.execute(sql.SQL("SELECT {} FROM {} WHERE MovieName = {} AND MovieYear = {}").format(
+                    names, sql.Identifier(table.lower()), *movie))
+                rows = conn.cursor.fetchall()
+                if rows:
+                    # rows the target got from a write that already saw the movie there are kept
+                    inserts.append(sql.SQL("INSERT INTO {} ({}) VALUES {} ON CONFLICT DO NOTHING").format(
+                        sql.Identifier(table.lower()), names, sql.SQL(', ').join(map(sql.Literal, rows))))
+            if inserts:
+                with Connector.DBConnector.onShard(target):
+                    copy = Connector.DBConnector()
+                try:
+                    copy.execute(Connector.tagQuery(sql.SQL('; ').join(inserts), 'moveMovie'))
+                finally:
+                    copy.close()
+            # the roles go with their casts
+            conn.cursor.execute(sql.SQL("DELETE FROM Ratings WHERE MovieName = {0} AND MovieYear = {1}; "
+                                        "DELETE FROM Casts WHERE MovieName = {0} AND MovieYear = {1}").format(*movie))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # ---------------------------------- schema: ----------------------------------
+    def createTables(self):
+        self.__scatter(Solution.createTables)
+        self.__scatter(_ddl, CREATE_PLACEMENT_TABLE)
+        # shards created before the placements were kept
+        productions = [row for rows in self.__scatter(_productions) for row in rows]
+        if productions:
+            self.__scatter(_place, productions, 'createTables')
+
+    def clearTables(self):
+        self.__scatter(Solution.clearTables)
+
+    def dropTables(self):
+        self.__scatter(_ddl, "DROP TABLE IF EXISTS MoviePlacement")
+        self.__scatter(Solution.dropTables)
+
+    # ---------------------------------- CRUD API: ----------------------------------
+    def addCritic(self, critic: Critic) -> ReturnValue:
+        return self.__everywhere(Solution.addCritic, critic)
+
+    def deleteCritic(self, critic_id: int) -> ReturnValue:
+        return self.__everywhere(Solution.deleteCritic, critic_id)
+
+    def getCriticProfile(self, critic_id: int) -> Critic:
+        return self.__on(self.__directoryShard(critic_id), Solution.getCriticProfile, critic_id)
+
+    def addActor(self, actor: Actor) -> ReturnValue:
+        return self.__everywhere(Solution.addActor, actor)
+
+    def deleteActor(self, actor_id: int) -> ReturnValue:
+        return self.__everywhere(Solution.deleteActor, actor_id)
+
+    def getActorProfile(self, actor_id: int) -> Actor:
+        return self.__on(self.__directoryShard(actor_id), Solution.getActorProfile, actor_id)
+
+    def addMovie(self, movie: Movie) -> ReturnValue:
+        return self.__everywhere(Solution.addMovie, movie)
+
+    def deleteMovie(self, movie_name: str, year: int) -> ReturnValue:
+        return self.__everywhere(Solution.deleteMovie, movie_name, year)
+
+    def getMovieProfile(self, movie_name: str, year: int) -> Movie:
+        return self.__on(self.__directoryShard(movie_name, year), Solution.getMovieProfile, movie_name, year)
+
+    def addStudio(self, studio: Studio) -> ReturnValue:
+        return self.__on(self.studioShard(studio.getStudioID()), Solution.addStudio, studio)
+
+    def deleteStudio(self, studio_id: int) -> ReturnValue:
+        shard = self.studioShard(studio_id)
+        produced = self.__on(shard, _producedBy, studio_id)
+        result = self.__on(shard, Solution.deleteStudio, studio_id)
+        if result == ReturnValue.OK:
+            try:
+                for movie_name, movie_year in produced:
+                    if self.__everywhere(_unplace, movie_name, movie_year, 'deleteStudio') != ReturnValue.OK:
+                        return ReturnValue.ERROR
+                    self.__move(movie_name, movie_year, shard, self.movieShard(movie_name, movie_year))
+            except Exception:
+                return ReturnValue.ERROR
+        return result
+
+    def getStudioProfile(self, studio_id: int) -> Studio:
+        return self.__on(self.studioShard(studio_id), Solution.getStudioProfile, studio_id)
+
+    def criticRatedMovie(self, movieName: str, movieYear: int, criticID: int, rating: int) -> ReturnValue:
+        return self.__on(self.homeShard(movieName, movieYear, 'criticRatedMovie'), Solution.criticRatedMovie,
+                         movieName, movieYear, criticID, rating)
+
+    def criticDidntRateMovie(self, movieName: str, movieYear: int, criticID: int) -> ReturnValue:
+        return self.__on(self.homeShard(movieName, movieYear, 'criticDidntRateMovie'), Solution.criticDidntRateMovie,
+                         movieName, movieYear, criticID)
+
+    def actorPlayedInMovie(self, movieName: str, movieYear: int, actorID: int, salary: int,
+                           roles: List[str]) -> ReturnValue:
+        return self.__on(self.homeShard(movieName, movieYear, 'actorPlayedInMovie'), Solution.actorPlayedInMovie,
+                         movieName, movieYear, actorID, salary, roles)
+
+    def actorDidntPlayInMovie(self, movieName: str, movieYear: int, actorID: int) -> ReturnValue:
+        return self.__on(self.homeShard(movieName, movieYear, 'actorDidntPlayInMovie'),
+                         Solution.actorDidntPlayInMovie, movieName, movieYear, actorID)
+
+    def addMovieCast(self, movie_name: str, year: int, cast: List[Tuple[int, int, List[str]]]) -> List[ReturnValue]:
+        return self.__on(self.homeShard(movie_name, year, 'addMovieCast'), Solution.addMovieCast,
+                         movie_name, year, cast)
+
+    def studioProducedMovie(self, studioID: int, movieName: str, movieYear: int, budget: int,
+                            revenue: int) -> ReturnValue:
+        shard = self.studioShard(studioID)
+        home, produced = self.__locate(movieName, movieYear, 'studioProducedMovie')
+        if produced and home != shard:
+            # produced by a studio of another shard. the NOT NULL and CHECK constraints fail before the unique one
+            if None in (studioID, movieName, movieYear, budget, revenue) or budget < 0 or revenue < 0:
+                return ReturnValue.BAD_PARAMS
+            return ReturnValue.ALREADY_EXISTS
+        result = self.__on(shard, Solution.studioProducedMovie, studioID, movieName, movieYear, budget, revenue)
+        if result == ReturnValue.OK:
+            # placed first, so the relation writes racing with the move already go to the new home
+            placed = self.__everywhere(_place, [(movieName, movieYear, studioID)], 'studioProducedMovie')
+            try:
+                if placed != ReturnValue.OK:
+                    raise RuntimeError('placement not recorded on every shard')
+                self.__move(movieName, movieYear, home, shard)
+            except Exception:
+                self.__everywhere(_unplace, movieName, movieYear, 'studioProducedMovie')
+                self.__on(shard, Solution.studioDidntProduceMovie, studioID, movieName, movieYear)
+                return ReturnValue.ERROR
+        return result
+
+    def studioDidntProduceMovie(self, studioID: int, movieName: str, movieYear: int) -> ReturnValue:
+        shard = self.studioShard(studioID)
+        production = self.__on(shard, _production, studioID, movieName, movieYear)
+        result = self.__on(shard, Solution.studioDidntProduceMovie, studioID, movieName, movieYear)
+        if result == ReturnValue.OK:
+            unplaced = self.__everywhere(_unplace, movieName, movieYear, 'studioDidntProduceMovie')
+            try:
+                if unplaced != ReturnValue.OK:
+                    raise RuntimeError('placement not removed on every shard')
+                self.__move(movieName, movieYear, shard, self.movieShard(movieName, movieYear))
+            except Exception:
+                budget, revenue = production[0]
+                self.__on(shard, Solution.studioProducedMovie, studioID, movieName, movieYear, budget, revenue)
+                self.__everywhere(_place, [(movieName, movieYear, studioID)], 'studioDidntProduceMovie')
+                return ReturnValue.ERROR
+        return result
+
+    # ---------------------------------- BASIC API: ----------------------------------
+    def averageRating(self, movieName: str, movieYear: int) -> float:
+        return self.__on(self.homeShard(movieName, movieYear, 'averageRating'), Solution.averageRating,
+                         movieName, movieYear)
+
+    def stageCrewBudget(self, movieName: str, movieYear: int) -> int:
+        return self.__on(self.homeShard(movieName, movieYear, 'stageCrewBudget'), Solution.stageCrewBudget,
+                         movieName, movieYear)
+
+    def overlyInvestedInMovie(self, movie_name: str, movie_year: int, actor_id: int) -> bool:
+        return self.__on(self.homeShard(movie_name, movie_year, 'overlyInvestedInMovie'),
+                         Solution.overlyInvestedInMovie, movie_name, movie_year, actor_id)
+
+    # ---------------------------------- ADVANCED API: ----------------------------------
+    def franchiseRevenue(self) -> List[Tuple[str, int]]:
+        # every shard lists every movie name (the directory), in the same order, with the revenue of its studios
+        totals = {}
+        for rows in self.__scatter(Solution.franchiseRevenue):
+            for name, revenue in rows:
+                totals[name] = totals.get(name, 0) + revenue
+        return list(totals.items())
+
+    def studioRevenueByYear(self) -> List[Tuple[str, int]]:
+        # a studio's productions are all on its shard, the groups of the shards are disjoint
+        return list(heapq.merge(*self.__scatter(Solution.studioRevenueByYear),
+                                key=lambda row: (-row[0], -row[1])))
+
+    def getFanCritics(self) -> List[Tuple[int, int]]:
+        # the ratings of a studio's movies are on the studio's shard, so each shard finds the fans of its studios
+        return list(heapq.merge(*self.__scatter(Solution.getFanCritics), key=lambda row: (-row[0], -row[1])))
+
+    def getExclusiveActors(self) -> List[Tuple[int, int]]:
+        # an actor is exclusive with exactly one ACTORS_MOVIES_STUDIO row over all the shards
+        rows = {}
+        for counts in self.__scatter(_actorStudioCounts):
+            for actor_id, count, studio_id in counts:
+                total, _ = rows.get(actor_id, (0, None))
+                rows[actor_id] = (total + count, studio_id)
+        return [(actor_id, studio_id) for actor_id, (count, studio_id) in sorted(rows.items(), reverse=True)
+                if count == 1]
+
+
+def _ddl(query: str) -> None:
+    conn = Connector.DBConnector()
+    try:
+        conn.execute(query)
+    except Exception as e:
+        if Solution.DEBUG:
+            print(e)
+    finally:
+        conn.close()
+
+
+def _actorStudioCounts() -> list:
+    _, _, rows = Solution.execute_query_select(
+        "SELECT actorid, COUNT(studioid), MIN(studioid) FROM ACTORS_MOVIES_STUDIO GROUP BY actorid",
+        caller='getExclusiveActors')
+    return rows.rows
+
+
+def _placement(movie_name: str, movie_year: int, caller: str) -> Union[int, None]:
+    # the studio producing the movie, None when nobody does
+    _, rows_count, rows = Solution.execute_query_select(sql.SQL(
+        "SELECT StudioID FROM MoviePlacement WHERE MovieName = {} AND MovieYear = {}").format(
+        sql.Literal(movie_name), sql.Literal(movie_year)), caller=caller)
+    return rows.rows[0][0] if rows_count > 0 else None
+
+
+def _place(placements: List[Tuple[str, int, int]], caller: str) -> ReturnValue:
+    # (movie name, movie year, studio id) rows, a movie that was deleted meanwhile is skipped
+    return Solution.execute_query_insert(sql.SQL(
+        "INSERT INTO MoviePlacement (MovieName, MovieYear, StudioID) SELECT Name, Year, StudioID "
+        "FROM Movie JOIN (VALUES {}) AS Placement (MovieName, MovieYear, StudioID) "
+        "ON Name = MovieName AND Year = MovieYear "
+        "ON CONFLICT (MovieName, MovieYear) DO UPDATE SET StudioID = EXCLUDED.StudioID").format(
+        sql.SQL(', ').join(map(sql.Literal, placements))), caller=caller)
+
+
+def _unplace(movie_name: str, movie_year: int, caller: str) -> ReturnValue:
+    result = Solution.execute_query_delete(sql.SQL(
+        "DELETE FROM MoviePlacement WHERE MovieName = {} AND MovieYear = {}").format(
+        sql.Literal(movie_name), sql.Literal(movie_year)), caller=caller)
+    # already gone is fine
+    return ReturnValue.OK if result == ReturnValue.NOT_EXISTS else result
+
+
+def _productions() -> list:
+    _, _, rows = Solution.execute_query_select(
+        "SELECT MovieName, MovieYear, StudioID FROM Productions", caller='createTables')
+    return rows.rows
+
+
+def _producedBy(studio_id: int) -> list:
+    _, _, rows = Solution.execute_query_select(sql.SQL(
+        "SELECT MovieName, MovieYear FROM LiveProductions WHERE StudioID = {}").format(sql.Literal(studio_id)),
+        caller='deleteStudio')
+    return rows.rows
+
+
+def _production(studio_id: int, movie_name: str, movie_year: int) -> list:
+    _, _, rows = Solution.execute_query_select(sql.SQL(
+        "SELECT Budget, Revenue FROM LiveProductions WHERE StudioID = {} AND MovieName = {} AND MovieYear = {}").format(
+        sql.Literal(studio_id), sql.Literal(movie_name), sql.Literal(movie_year)), caller='studioDidntProduceMovie')
+    return rows.rows
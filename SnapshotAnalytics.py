@@ -0,0 +1,204 @@
+import decimal
+from decimal import Decimal
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+import Utility.DBConnector as Connector
+
+# the rows a snapshot reads, all in one transaction. movies are keyed by their position in the Movie rows, which
+# come in the database's order of names so results sort by its collation. genres are in its order as well
+_SNAPSHOT_QUERIES = [
+    ('movies', "SELECT Name, Year, Genre FROM LiveMovie ORDER BY Name"),
+    ('genres', "SELECT DISTINCT Genre FROM LiveMovie ORDER BY Genre"),
+    ('actors', "SELECT ID, Age FROM LiveActor ORDER BY ID"),
+    ('casts', "SELECT MovieName, MovieYear, ActorID FROM LiveCasts"),
+    ('ratings', "SELECT MovieName, MovieYear, CriticID FROM LiveRatings"),
+    ('productions', "SELECT MovieName, MovieYear, StudioID, Revenue FROM LiveProductions"),
+]
+
+
+class AnalyticsSnapshot:
+    """ Movie, Actor, Casts, Ratings and Productions pulled once into NumPy columns, with movies encoded as
+    integers. the advanced API functions are computed from the columns with vectorized group-bys and return
+    what the SQL versions return for the same rows, ordered the same: names and genres sort by their position
+    in the rows the database ordered, so by its collation.
+
+        snapshot = AnalyticsSnapshot.capture()
+        snapshot.franchiseRevenue()
+        snapshot.where(genres=['Drama'], years=(2000, 2010)).averageAgeByGenre()
+    """
+
+    def __init__(self, movies: dict, actors: dict, casts: dict, ratings: dict, productions: dict,
+                 decimal_averages: bool = True):
+        self.movies = movies
+        self.actors = actors
+        self.casts = casts
+        self.ratings = ratings
+        self.productions = productions
+        # PostgreSQL averages integers as NUMERIC, SQLite as REAL
+        self.decimal_averages = decimal_averages
+
+    @staticmethod
+    def capture() -> 'AnalyticsSnapshot':
+        """ reads the live rows of every table in one read only transaction, so they are consistent """
+        conn = Connector.DBConnector(readOnly=True)
+        postgres = Connector.DBConnector.backend() == Connector.PRIMARY
+        try:
+            if postgres and not conn.bound:
+                conn.cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            tables = {}
+            for name, query in _SNAPSHOT_QUERIES:
+                conn.cursor.execute(Connector.tagQuery(query, 'snapshot'))
+                tables[name] = conn.cursor.fetchall()
+        finally:
+            conn.rollback()
+            conn.close()
+        return AnalyticsSnapshot.fromRows(decimal_averages=postgres, **tables)
+
+    @staticmethod
+    def fromRows(movies: list, actors: list, casts: list, ratings: list, productions: list, genres: list = None,
+                 decimal_averages: bool = True) -> 'AnalyticsSnapshot':
+        """ the snapshot of the rows the snapshot queries read: movies ordered by name and every genre once, in
+        the order results list them (code point order without genres) """
+        index = {(name, year): position for position, (name, year, _) in enumerate(movies)}
+        names = np.array([row[0] for row in movies], dtype=object)
+        # equal names are neighbours, a name's order is the number of other names before it
+        name_order = np.zeros(len(names), dtype=np.int64)
+        name_order[1:] = np.cumsum(names[1:] != names[:-1])
+        genre_names = sorted({row[2] for row in movies}) if genres is None else [row[0] for row in genres]
+        genre_order = {genre: order for order, genre in enumerate(genre_names)}
+
+        def movieColumn(rows):
+            return np.fromiter((index[row[0], row[1]] for row in rows), dtype=np.int64, count=len(rows))
+
+        def column(rows, position):
+            return np.fromiter((row[position] for row in rows), dtype=np.int64, count=len(rows))
+
+        return AnalyticsSnapshot(
+            movies={'name': names, 'year': column(movies, 1),
+                    'genre': np.array([row[2] for row in movies], dtype=object),
+                    'name_order': name_order,
+                    'genre_order': np.fromiter((genre_order[row[2]] for row in movies), dtype=np.int64,
+                                               count=len(movies)),
+                    'kept': np.ones(len(movies), dtype=bool)},
+            actors={'id': column(actors, 0), 'age': column(actors, 1)},
+            casts={'movie': movieColumn(casts), 'actor': column(casts, 2)},
+            ratings={'movie': movieColumn(ratings), 'critic': column(ratings, 2)},
+            productions={'movie': movieColumn(productions), 'studio': column(productions, 2),
+                         'revenue': column(productions, 3)},
+            decimal_averages=decimal_averages)
+
+    def where(self, genres: Iterable[str] = None, years: Tuple[int, int] = None,
+              studios: Iterable[int] = None) -> 'AnalyticsSnapshot':
+        """ the snapshot as if the database only held the movies of the given genres and (inclusive) year range,
+        and only the productions of the given studios. movie numbers stay the same, actors are kept """
+        keep = self.movies['kept'].copy()
+        if genres is not None:
+            keep &= np.isin(self.movies['genre'], list(genres))
+        if years is not None:
+            keep &= (self.movies['year'] >= years[0]) & (self.movies['year'] <= years[1])
+        productions = _rows(self.productions, keep[self.productions['movie']])
+        if studios is not None:
+            productions = _rows(productions, np.isin(productions['studio'], list(studios)))
+        # a filtered out movie keeps its number, its name must not count in franchiseRevenue
+        return AnalyticsSnapshot(dict(self.movies, kept=keep), self.actors,
+                                 _rows(self.casts, keep[self.casts['movie']]),
+                                 _rows(self.ratings, keep[self.ratings['movie']]), productions, self.decimal_averages)
+
+    def franchiseRevenue(self) -> List[Tuple[str, int]]:
+        kept = self.movies['kept']
+        revenue = np.zeros(len(self.movies['name']), dtype=np.int64)
+        # a movie has at most one production
+        revenue[self.productions['movie']] = self.productions['revenue']
+        _, first, codes = np.unique(self.movies['name_order'][kept], return_index=True, return_inverse=True)
+        names = self.movies['name'][kept][first]
+        totals = _groupSum(codes, revenue[kept], len(names))
+        return [(str(name), int(total)) for name, total in zip(names[::-1], totals[::-1])]
+
+    def studioRevenueByYear(self) -> List[Tuple[int, int, int]]:
+        years = self.movies['year'][self.productions['movie']]
+        keys, codes = _uniqueRows(self.productions['studio'], years)
+        totals = _groupSum(codes, self.productions['revenue'], len(keys))
+        return [(int(studio), int(year), int(total)) for (studio, year), total in zip(keys[::-1], totals[::-1])]
+
+    def getFanCritics(self) -> List[Tuple[int, int]]:
+        produced, studio_of_movie = self.__studioOfMovie()
+        rated = produced[self.ratings['movie']]
+        studios, produced_counts = np.unique(self.productions['studio'], return_counts=True)
+        pairs, codes = _uniqueRows(self.ratings['critic'][rated], studio_of_movie[self.ratings['movie'][rated]])
+        rated_counts = np.bincount(codes, minlength=len(pairs))
+        # a critic is a fan when the ratings on a studio's productions are as many as the productions
+        fans = rated_counts == produced_counts[np.searchsorted(studios, pairs[:, 1])] if len(pairs) else []
+        return [(int(critic), int(studio)) for critic, studio in pairs[fans][::-1]]
+
+    def averageAgeByGenre(self) -> list:
+        ages = self.actors['age'][np.searchsorted(self.actors['id'], self.casts['actor'])]
+        _, first, codes = np.unique(self.movies['genre_order'][self.casts['movie']], return_index=True,
+                                    return_inverse=True)
+        genres = self.movies['genre'][self.casts['movie']][first]
+        totals = _groupSum(codes, ages, len(genres))
+        counts = np.bincount(codes, minlength=len(genres))
+        return [(str(genre), self.__average(int(total), int(count)))
+                for genre, total, count in zip(genres, totals, counts)]
+
+    def getExclusiveActors(self) -> List[Tuple[int, int]]:
+        # every cast of a produced movie is a row of ACTORS_MOVIES_STUDIO, an actor with more than one is not exclusive
+        produced, studio_of_movie = self.__studioOfMovie()
+        rows = produced[self.casts['movie']]
+        actors, first, counts = np.unique(self.casts['actor'][rows], return_index=True, return_counts=True)
+        studios = studio_of_movie[self.casts['movie'][rows]][first]
+        exclusive = counts == 1
+        return [(int(actor), int(studio)) for actor, studio in zip(actors[exclusive][::-1], studios[exclusive][::-1])]
+
+    def __studioOfMovie(self):
+        produced = np.zeros(len(self.movies['name']), dtype=bool)
+        produced[self.productions['movie']] = True
+        studio_of_movie = np.zeros(len(self.movies['name']), dtype=np.int64)
+        studio_of_movie[self.productions['movie']] = self.productions['studio']
+        return produced, studio_of_movie
+
+    def __average(self, total: int, count: int):
+        if not self.decimal_averages:
+            return total / count
+        return numericDivision(total, count)
+
+
+def numericDivision(dividend: int, divisor: int) -> Decimal:
+    """ dividend / divisor as PostgreSQL divides NUMERIC values, with at least 16 significant digits
+    (select_div_scale) rounded half away from zero """
+    def weightAndFirstDigit(value):
+        # weight and leading digit of value in base 10000, the digits NUMERIC stores
+        value, weight = abs(value), 0
+        while value >= 10000:
+            value //= 10000
+            weight += 1
+        return weight, value
+
+    weight1, first1 = weightAndFirstDigit(dividend)
+    weight2, first2 = weightAndFirstDigit(divisor)
+    quotient_weight = weight1 - weight2 - (1 if first1 <= first2 else 0)
+    scale = min(max(16 - quotient_weight * 4, 0), 1000)
+    with decimal.localcontext() as context:
+        context.prec = scale + 40
+        return (Decimal(dividend) / Decimal(divisor)).quantize(Decimal(1).scaleb(-scale),
+                                                                rounding=decimal.ROUND_HALF_UP)
+
+
+def _rows(columns: dict, keep: np.ndarray) -> dict:
+    return {name: values[keep] for name, values in columns.items()}
+
+
+def _groupSum(codes: np.ndarray, values: np.ndarray, groups: int) -> np.ndarray:
+    # exact integer sums, bincount would go through float64
+    totals = np.zeros(groups, dtype=np.int64)
+    np.add.at(totals, codes, values)
+    return totals
+
+
+def _uniqueRows(first: np.ndarray, second: np.ndarray):
+    """ the distinct (first, second) pairs in ascending order and the pair number of every row """
+    if len(first) == 0:
+        return np.zeros((0, 2), dtype=np.int64), np.zeros(0, dtype=np.int64)
+    keys, codes = np.unique(np.stack([first, second], axis=1), axis=0, return_inverse=True)
+    return keys, codes.reshape(-1)
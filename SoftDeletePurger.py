@@ -0,0 +1,168 @@
+import threading
+import time
+from typing import Dict
+
+import Solution
+import Utility.DBConnector as Connector
+
+# rows removed per table and statement, each statement commits on its own so the locks it takes are short lived
+PURGE_BATCH = 500
+
+# relation rows of soft deleted parents, as a query over their ctids. the relations go first,
+# a parent is only removed once nothing refers to it any more, so its own delete cascades to nothing
+_DEPENDENTS = {
+    'Roles': """
+            SELECT R.ctid FROM Movie M JOIN Roles R ON R.MovieName = M.Name AND R.MovieYear = M.Year WHERE M.Deleted
+            UNION ALL
+            SELECT R.ctid FROM Actor A JOIN Roles R ON R.ActorID = A.ID WHERE A.Deleted
+            """,
+    'Ratings': """
+            SELECT R.ctid FROM Movie M JOIN Ratings R ON R.MovieName = M.Name AND R.MovieYear = M.Year WHERE M.Deleted
+            """,
+    'Casts': """
+            SELECT C.ctid FROM Movie M JOIN Casts C ON C.MovieName = M.Name AND C.MovieYear = M.Year WHERE M.Deleted
+            UNION ALL
+            SELECT C.ctid FROM Actor A JOIN Casts C ON C.ActorID = A.ID WHERE A.Deleted
+            """,
+    'Productions': """
+            SELECT P.ctid FROM Movie M JOIN Productions P ON P.MovieName = M.Name AND P.MovieYear = M.Year
+            WHERE M.Deleted
+            """,
+    'Movie': """
+            SELECT M.ctid FROM Movie M WHERE M.Deleted
+            AND NOT EXISTS (SELECT 1 FROM Ratings R WHERE R.MovieName = M.Name AND R.MovieYear = M.Year)
+            AND NOT EXISTS (SELECT 1 FROM Casts C WHERE C.MovieName = M.Name AND C.MovieYear = M.Year)
+            AND NOT EXISTS (SELECT 1 FROM Productions P WHERE P.MovieName = M.Name AND P.MovieYear = M.Year)
+            """,
+    'Actor': """
+            SELECT A.ctid FROM Actor A WHERE A.Deleted
+            AND NOT EXISTS (SELECT 1 FROM Casts C WHERE C.ActorID = A.ID)
+            """,
+}
+
+
+def purgeBatch(batch_size: int = PURGE_BATCH) -> Dict[str, int]:
+    """ removes up to batch_size rows of every table that belong to soft deleted movies and actors.
+    returns the number of rows removed per table """
+    removed = {}
+    for table, rows in _DEPENDENTS.items():
+        query = "DELETE FROM " + table + " WHERE ctid = ANY(ARRAY(" + rows + " LIMIT " + str(int(batch_size)) + "));"
+        conn = Connector.DBConnector()
+        try:
+            removed[table], _ = conn.execute(Connector.tagQuery(query, 'purgeBatch'))
+        except Exception as e:
+            if Solution.DEBUG:
+                print(e)
+            removed[table] = 0
+        finally:
+            conn.close()
+    return removed
+
+
+def purgeAll(batch_size: int = PURGE_BATCH) -> Dict[str, int]:
+    """ purges batch after batch until nothing is left, returns the total removed per table """
+    total = dict.fromkeys(_DEPENDENTS, 0)
+    while True:
+        removed = purgeBatch(batch_size)
+        for table, count in removed.items():
+            total[table] += count
+        if not any(removed.values()):
+            return total
+
+
+def purgeBacklog() -> Dict[str, int]:
+    """ rows still waiting for the purger per table, the Movie and Actor counts are the soft deleted rows """
+    counts = ["(SELECT COUNT(*) FROM Movie WHERE Deleted) AS Movie", "(SELECT COUNT(*) FROM Actor WHERE Deleted) AS Actor"]
+    for table in ('Roles', 'Ratings', 'Casts', 'Productions'):
+        # a row of a deleted actor in a deleted movie is listed twice by the purge query
+        rows = _DEPENDENTS[table].replace("UNION ALL", "UNION")
+        counts.append("(SELECT COUNT(*) FROM (" + rows + ") AS Pending) AS " + table)
+    query = "SELECT " + ", ".join(counts) + ";"
+    conn = Connector.DBConnector(readOnly=True)
+    try:
+        _, result = conn.execute(Connector.tagQuery(query, 'purgeBacklog'))
+    finally:
+        conn.close()
+    backlog = dict(zip([table.lower() for table in result.cols_header], result.rows[0]))
+    return {table: backlog[table.lower()] for table in _DEPENDENTS}
+
+
+def enableSoftDelete() -> None:
+    """ installs the views hiding soft deleted rows and the triggers rejecting new rows of them in the database,
+    then sets Solution.SOFT_DELETE. the views cost every read an anti-join, so they are only there while needed """
+    _installSoftDelete(Solution.INSTALL_SOFT_DELETE)
+    Solution.SOFT_DELETE = True
+
+
+def disableSoftDelete(batch_size: int = PURGE_BATCH) -> None:
+    """ clears Solution.SOFT_DELETE, purges what is left and puts the plain views back. while another process
+    still marks rows deleted the database keeps the soft delete views, a later call removes them """
+    Solution.SOFT_DELETE = False
+    purgeAll(batch_size)
+    _installSoftDelete(Solution.UNINSTALL_SOFT_DELETE)
+
+
+def _installSoftDelete(ddl: Dict[str, str]) -> None:
+    conn = Connector.DBConnector()
+    try:
+        conn.execute(ddl[Connector.DBConnector.backend()])
+    finally:
+        conn.close()
+
+
+class SoftDeletePurger:
+    """ removes the rows of soft deleted movies and actors in the background, one purgeBatch at a time.
+
+    after a batch that removed rows the next one follows after pause seconds, an idle purger polls every
+    interval seconds.
+
+        enableSoftDelete()
+        with SoftDeletePurger(batch_size=500) as purger:
+            Solution.deleteMovie("Mission Impossible", 1996)
+            print(purger.stats(), purger.backlog())
+    """
+
+    def __init__(self, batch_size: int = PURGE_BATCH, interval: float = 1.0, pause: float = 0.0):
+        self.__batch_size = batch_size
+        self.__interval = interval
+        self.__pause = pause
+        self.__stopped = threading.Event()
+        self.__lock = threading.Lock()
+        self.__removed = dict.fromkeys(_DEPENDENTS, 0)
+        self.__batches = 0
+        self.__last_batch_seconds = 0.0
+        # a connection bound by the creating thread (e.g. a test transaction) is shared with the purger
+        self.__connection = Connector.DBConnector.boundConnection()
+        self.__worker = threading.Thread(target=self.__run, name='soft-delete-purger', daemon=True)
+        self.__worker.start()
+
+    def stats(self) -> dict:
+        with self.__lock:
+            return {'batches': self.__batches, 'removed': dict(self.__removed),
+                    'last_batch_seconds': self.__last_batch_seconds}
+
+    def backlog(self) -> Dict[str, int]:
+        return purgeBacklog()
+
+    def close(self) -> None:
+        self.__stopped.set()
+        self.__worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __run(self):
+        if self.__connection is not None:
+            Connector.DBConnector.bind(self.__connection)
+        while not self.__stopped.is_set():
+            start = time.perf_counter()
+            removed = purgeBatch(self.__batch_size)
+            with self.__lock:
+                self.__batches += 1
+                self.__last_batch_seconds = time.perf_counter() - start
+                for table, count in removed.items():
+                    self.__removed[table] += count
+            self.__stopped.wait(self.__pause if any(removed.values()) else self.__interval)
@@ -1,7 +1,12 @@
+import sys
 from typing import List, Tuple
 from psycopg2 import sql
 
 import Utility.DBConnector as Connector
+import Utility.SchemaManager as SchemaManager
+import Utility.Profiler as Profiler
+import Utility.SingleFlight as SingleFlight
+import Utility.ExistenceIndex as ExistenceIndex
 from Utility.ReturnValue import ReturnValue
 from Utility.Exceptions import DatabaseException
 
@@ -12,157 +17,336 @@ from Business.Actor import Actor
 from typing import Union
 
 DEBUG = False
+# seconds a call of the named function may spend in the database, e.g. {'getFanCritics': 2.0}. a call past
+# its deadline is cancelled and returns ReturnValue.ERROR (or the function's empty result). an enclosing
+# DBConnector.deadline block applies too, the earlier deadline wins
+DEADLINES = {}
 
 # ---------------------------------- CRUD API: ----------------------------------
 
 
-def createTables():
-    conn = None
-    try:
-        conn = Connector.DBConnector()
-
-        create_critic_table = """
-                     CREATE TABLE IF NOT EXISTS Critic(
-                     ID INTEGER NOT NULL PRIMARY KEY,
-                     Name TEXT NOT NULL
-                     );
-                     """
-
-        create_movie_table = """
-                        CREATE TABLE IF NOT EXISTS Movie(
-                        Name TEXT NOT NULL,
-                        Year INTEGER NOT NULL CHECK (Year > 1984),
-                        PRIMARY KEY(Name, Year),
-                        Genre TEXT NOT NULL CHECK(Genre = 'Horror' or Genre = 'Comedy' or Genre = 'Action' or Genre = 'Drama')
-                        );
-                        """
-
-        create_actor_table = """
-                        CREATE TABLE IF NOT EXISTS Actor(
-                        ID INTEGER PRIMARY KEY CHECK (ID > 0),
-                        Name TEXT NOT NULL,
-                        Age INTEGER NOT NULL CHECK (Age > 0),
-                        Height INTEGER NOT NULL CHECK (Height > 0 )
-                        );
-                        """
-
-        create_studio_table = """
-                        CREATE TABLE IF NOT EXISTS Studio(
-                        ID INTEGER PRIMARY KEY,
-                        Name TEXT NOT NULL
-                        );
-                        """
-
-        create_Ratings_table = """
-                        CREATE TABLE IF NOT EXISTS Ratings(
-                        MovieName TEXT NOT NULL,
-                        MovieYear INTEGER NOT NULL,
-                        CriticID INTEGER NOT NULL REFERENCES Critic(ID) ON DELETE CASCADE,
-                        Rating INTEGER NOT NULL CHECK (rating >= 1 AND rating <=5),
-                        FOREIGN KEY(MovieName, MovieYear) REFERENCES Movie(Name, Year) ON DELETE CASCADE,
-                        UNIQUE(MovieName, MovieYear, CriticID)
-                        );
-                        """
-        create_Cast_table = """
-                        CREATE TABLE IF NOT EXISTS Casts(
-                        MovieName TEXT NOT NULL,
-                        MovieYear INTEGER NOT NULL,
-                        ActorID INTEGER NOT NULL REFERENCES Actor ON DELETE CASCADE,
-                        Salary INTEGER NOT NULL CHECK (Salary > 0),
-                        FOREIGN KEY(MovieName, MovieYear) REFERENCES Movie ON DELETE CASCADE,
-                        UNIQUE(MovieName, MovieYear, ActorID)
-                        );
-                        """
-        create_Roles_table = """
-                        CREATE TABLE IF NOT EXISTS Roles(
-                        MovieName TEXT NOT NULL,
-                        MovieYear INTEGER NOT NULL,
-                        ActorID INTEGER NOT NULL,
-                        Role TEXT NOT NULL,
-                        FOREIGN KEY(MovieName, MovieYear, ActorID) REFERENCES Casts(MovieName, MovieYear, ActorID) ON DELETE CASCADE,
-                        UNIQUE(MovieName, MovieYear, ActorID, Role)
-                        );
-                        """
-
-        create_Production_table = """
-                        CREATE TABLE IF NOT EXISTS Productions(
-                        StudioID INTEGER NOT NULL REFERENCES Studio ON DELETE CASCADE,
-                        MovieName TEXT NOT NULL,
-                        MovieYear INTEGER NOT NULL,
-                        Budget INTEGER NOT NULL CHECK (Budget >= 0),
-                        Revenue INTEGER NOT NULL CHECK (Revenue >= 0),
-                        FOREIGN KEY(MovieName, MovieYear) REFERENCES Movie ON DELETE CASCADE,
-                        UNIQUE (MovieName, MovieYear)
-                        );
-                        """
-        create_total_salaries_view = """
-                        Create VIEW TotalSalaries AS
-                        SELECT name AS MovieName, year AS MovieYear, Coalesce(Sum, 0) as total_salary FROM
+CREATE_CRITIC_TABLE = """
+             CREATE TABLE IF NOT EXISTS Critic(
+             ID INTEGER NOT NULL PRIMARY KEY,
+             Name TEXT NOT NULL
+             );
+             """
+
+CREATE_MOVIE_TABLE = """
+                CREATE TABLE IF NOT EXISTS Movie(
+                Name TEXT NOT NULL,
+                Year INTEGER NOT NULL CHECK (Year > 1984),
+                PRIMARY KEY(Name, Year),
+                Genre TEXT NOT NULL CHECK(Genre = 'Horror' or Genre = 'Comedy' or Genre = 'Action' or Genre = 'Drama')
+                );
+                """
+
+CREATE_ACTOR_TABLE = """
+                CREATE TABLE IF NOT EXISTS Actor(
+                ID INTEGER PRIMARY KEY CHECK (ID > 0),
+                Name TEXT NOT NULL,
+                Age INTEGER NOT NULL CHECK (Age > 0),
+                Height INTEGER NOT NULL CHECK (Height > 0 )
+                );
+                """
+
+CREATE_STUDIO_TABLE = """
+                CREATE TABLE IF NOT EXISTS Studio(
+                ID INTEGER PRIMARY KEY,
+                Name TEXT NOT NULL
+                );
+                """
+
+CREATE_RATINGS_TABLE = """
+                CREATE TABLE IF NOT EXISTS Ratings(
+                MovieName TEXT NOT NULL,
+                MovieYear INTEGER NOT NULL,
+                CriticID INTEGER NOT NULL REFERENCES Critic(ID) ON DELETE CASCADE,
+                Rating INTEGER NOT NULL CHECK (rating >= 1 AND rating <=5),
+                FOREIGN KEY(MovieName, MovieYear) REFERENCES Movie(Name, Year) ON DELETE CASCADE,
+                UNIQUE(MovieName, MovieYear, CriticID)
+                );
+                """
+CREATE_CAST_TABLE = """
+                CREATE TABLE IF NOT EXISTS Casts(
+                MovieName TEXT NOT NULL,
+                MovieYear INTEGER NOT NULL,
+                ActorID INTEGER NOT NULL REFERENCES Actor ON DELETE CASCADE,
+                Salary INTEGER NOT NULL CHECK (Salary > 0),
+                FOREIGN KEY(MovieName, MovieYear) REFERENCES Movie ON DELETE CASCADE,
+                UNIQUE(MovieName, MovieYear, ActorID)
+                );
+                """
+CREATE_ROLES_TABLE = """
+                CREATE TABLE IF NOT EXISTS Roles(
+                MovieName TEXT NOT NULL,
+                MovieYear INTEGER NOT NULL,
+                ActorID INTEGER NOT NULL,
+                Role TEXT NOT NULL,
+                FOREIGN KEY(MovieName, MovieYear, ActorID) REFERENCES Casts(MovieName, MovieYear, ActorID) ON DELETE CASCADE,
+                UNIQUE(MovieName, MovieYear, ActorID, Role)
+                );
+                """
+
+CREATE_PRODUCTION_TABLE = """
+                CREATE TABLE IF NOT EXISTS Productions(
+                StudioID INTEGER NOT NULL REFERENCES Studio ON DELETE CASCADE,
+                MovieName TEXT NOT NULL,
+                MovieYear INTEGER NOT NULL,
+                Budget INTEGER NOT NULL CHECK (Budget >= 0),
+                Revenue INTEGER NOT NULL CHECK (Revenue >= 0),
+                FOREIGN KEY(MovieName, MovieYear) REFERENCES Movie ON DELETE CASCADE,
+                UNIQUE (MovieName, MovieYear)
+                );
+                """
+CREATE_TOTAL_SALARIES_VIEW = """
+                CREATE OR REPLACE VIEW TotalSalaries AS
+                SELECT name AS MovieName, year AS MovieYear, Coalesce(Sum, 0) as total_salary FROM
 		                (SELECT * FROM Movie) AS MovieSum
 	                    LEFT OUTER JOIN 
 		                (SELECT MovieName, MovieYear, SUM(Salary) FROM CASTS GROUP BY MovieName, MovieYear) AS SalarySum
 		                ON MovieSum.Name = SalarySum.MovieName AND MovieSum.Year = SalarySum.MovieYear;
-                        """
-        create_total_roles_actor_in_movie_view = """
-                                                 Create VIEW TotalActorRoles AS
-                                                 SELECT moviename, movieYear, actorid, count(roles) AS TOTAL_ACTOR_ROLES FROM roles
-                                                 GROUP BY moviename, movieYear, actorid;
-                                                 """
-        create_actor_casts_view = """
-                                                 CREATE VIEW ACTORS_CASTS AS
+                """
+CREATE_TOTAL_ROLES_ACTOR_IN_MOVIE_VIEW = """
+                                         CREATE OR REPLACE VIEW TotalActorRoles AS
+                                         SELECT moviename, movieYear, actorid, count(roles) AS TOTAL_ACTOR_ROLES FROM roles
+                                         GROUP BY moviename, movieYear, actorid;
+                                         """
+CREATE_ACTOR_CASTS_VIEW = """
+                                         CREATE OR REPLACE VIEW ACTORS_CASTS AS
 			                                     SELECT ID, age As AAge, movieName as CMovieName, movieYear As CMovieYear FROM
-                                                 (actor INNER JOIN casts
+                                         (actor INNER JOIN casts
 			                                     ON actor.id = casts.ActorID );
-                                                 """
-        create_actors_in_studios_view = """
-                                                 CREATE VIEW ACTORS_MOVIES_STUDIO AS
-                                                 SELECT actorid, studioid FROM (
-                                                 SELECT moviename, movieyear, actorID FROM casts
-                                                 ) as C
-                                                 INNER JOIN productions ON C.moviename = productions.MovieName AND C.movieyear = productions.MovieYear
-                                                 """
-
-
+                                         """
+CREATE_ACTORS_IN_STUDIOS_VIEW = """
+                                         CREATE OR REPLACE VIEW ACTORS_MOVIES_STUDIO AS
+                                         SELECT actorid, studioid FROM (
+                                         SELECT moviename, movieyear, actorID FROM casts
+                                         ) as C
+                                         INNER JOIN productions ON C.moviename = productions.MovieName AND C.movieyear = productions.MovieYear
+                                         """
+
+# soft delete: a deleted movie or actor keeps its row with Deleted set until the purger has removed
+# the rows depending on it. the Live views hide both, every read goes through them
+ADD_DELETED_COLUMNS = """
+                ALTER TABLE Movie ADD COLUMN IF NOT EXISTS Deleted BOOLEAN NOT NULL DEFAULT FALSE;
+                ALTER TABLE Actor ADD COLUMN IF NOT EXISTS Deleted BOOLEAN NOT NULL DEFAULT FALSE;
+                CREATE INDEX IF NOT EXISTS DeletedMovies ON Movie (Name, Year) WHERE Deleted;
+                CREATE INDEX IF NOT EXISTS DeletedActors ON Actor (ID) WHERE Deleted;
+                -- the purger (and the cascades of a hard delete) find the relation rows of an actor through these
+                CREATE INDEX IF NOT EXISTS CastsActor ON Casts (ActorID);
+                CREATE INDEX IF NOT EXISTS RolesActor ON Roles (ActorID);
+                """
+CREATE_LIVE_VIEWS = """
+                CREATE OR REPLACE VIEW LiveMovie AS
+                SELECT Name, Year, Genre FROM Movie WHERE NOT Deleted;
+                CREATE OR REPLACE VIEW LiveActor AS
+                SELECT ID, Name, Age, Height FROM Actor WHERE NOT Deleted;
+                CREATE OR REPLACE VIEW LiveRatings AS
+                SELECT * FROM Ratings R WHERE NOT EXISTS (
+                    SELECT 1 FROM Movie M WHERE M.Deleted AND M.Name = R.MovieName AND M.Year = R.MovieYear);
+                CREATE OR REPLACE VIEW LiveCasts AS
+                SELECT * FROM Casts C WHERE NOT EXISTS (
+                    SELECT 1 FROM Movie M WHERE M.Deleted AND M.Name = C.MovieName AND M.Year = C.MovieYear)
+                AND NOT EXISTS (SELECT 1 FROM Actor A WHERE A.Deleted AND A.ID = C.ActorID);
+                CREATE OR REPLACE VIEW LiveRoles AS
+                SELECT * FROM Roles R WHERE NOT EXISTS (
+                    SELECT 1 FROM Movie M WHERE M.Deleted AND M.Name = R.MovieName AND M.Year = R.MovieYear)
+                AND NOT EXISTS (SELECT 1 FROM Actor A WHERE A.Deleted AND A.ID = R.ActorID);
+                CREATE OR REPLACE VIEW LiveProductions AS
+                SELECT * FROM Productions P WHERE NOT EXISTS (
+                    SELECT 1 FROM Movie M WHERE M.Deleted AND M.Name = P.MovieName AND M.Year = P.MovieYear);
+                """
+CREATE_LIVE_DERIVED_VIEWS = """
+                CREATE OR REPLACE VIEW TotalSalaries AS
+                SELECT name AS MovieName, year AS MovieYear, Coalesce(Sum, 0) as total_salary FROM
+                    (SELECT * FROM LiveMovie) AS MovieSum
+                    LEFT OUTER JOIN
+                    (SELECT MovieName, MovieYear, SUM(Salary) FROM LiveCasts GROUP BY MovieName, MovieYear) AS SalarySum
+                    ON MovieSum.Name = SalarySum.MovieName AND MovieSum.Year = SalarySum.MovieYear;
+                CREATE OR REPLACE VIEW TotalActorRoles AS
+                SELECT moviename, movieYear, actorid, count(roles) AS TOTAL_ACTOR_ROLES FROM LiveRoles AS roles
+                GROUP BY moviename, movieYear, actorid;
+                CREATE OR REPLACE VIEW ACTORS_CASTS AS
+                SELECT ID, age As AAge, movieName as CMovieName, movieYear As CMovieYear FROM
+                (LiveActor AS actor INNER JOIN LiveCasts AS casts ON actor.id = casts.ActorID);
+                CREATE OR REPLACE VIEW ACTORS_MOVIES_STUDIO AS
+                SELECT actorid, studioid FROM (
+                SELECT moviename, movieyear, actorID FROM LiveCasts
+                ) as C
+                INNER JOIN LiveProductions AS productions
+                ON C.moviename = productions.MovieName AND C.movieyear = productions.MovieYear;
+                """
+# new relation rows of a soft deleted movie or actor must fail like rows of a missing one. the trigger points
+# the row at a key that can never exist (years and actor ids are positive), so the foreign key check rejects it
+# after the NOT NULL and CHECK constraints and without clashing with the rows still waiting for the purger
+CREATE_DELETED_PARENT_TRIGGERS = """
+                CREATE OR REPLACE FUNCTION DetachDeletedMovie() RETURNS TRIGGER AS $$
+                BEGIN
+                    IF EXISTS (SELECT 1 FROM Movie WHERE Deleted AND Name = NEW.MovieName AND Year = NEW.MovieYear) THEN
+                        NEW.MovieYear := -NEW.MovieYear;
+                    END IF;
+                    RETURN NEW;
+                END $$ LANGUAGE plpgsql;
+                CREATE OR REPLACE FUNCTION DetachDeletedActor() RETURNS TRIGGER AS $$
+                BEGIN
+                    IF EXISTS (SELECT 1 FROM Actor WHERE Deleted AND ID = NEW.ActorID) THEN
+                        NEW.ActorID := -NEW.ActorID;
+                    END IF;
+                    RETURN NEW;
+                END $$ LANGUAGE plpgsql;
+                CREATE TRIGGER RatingsMovieDeleted BEFORE INSERT ON Ratings
+                FOR EACH ROW EXECUTE FUNCTION DetachDeletedMovie();
+                CREATE TRIGGER CastsMovieDeleted BEFORE INSERT ON Casts
+                FOR EACH ROW EXECUTE FUNCTION DetachDeletedMovie();
+                CREATE TRIGGER CastsActorDeleted BEFORE INSERT ON Casts
+                FOR EACH ROW EXECUTE FUNCTION DetachDeletedActor();
+                CREATE TRIGGER ProductionsMovieDeleted BEFORE INSERT ON Productions
+                FOR EACH ROW EXECUTE FUNCTION DetachDeletedMovie();
+                """
+# SQLite triggers cannot change NEW, they fail the insert like the foreign key would. the WHEN clauses let rows
+# breaking a NOT NULL or CHECK constraint through, so those still fail with BAD_PARAMS first
+SQLITE_DELETED_PARENT_TRIGGERS = """
+                CREATE TRIGGER RatingsMovieDeleted BEFORE INSERT ON Ratings
+                WHEN NEW.CriticID IS NOT NULL AND NEW.Rating BETWEEN 1 AND 5 AND EXISTS (
+                    SELECT 1 FROM Movie WHERE Deleted AND Name = NEW.MovieName AND Year = NEW.MovieYear)
+                BEGIN SELECT RAISE(ABORT, 'FOREIGN KEY constraint failed'); END;
+                CREATE TRIGGER CastsMovieDeleted BEFORE INSERT ON Casts
+                WHEN NEW.ActorID IS NOT NULL AND NEW.Salary > 0 AND EXISTS (
+                    SELECT 1 FROM Movie WHERE Deleted AND Name = NEW.MovieName AND Year = NEW.MovieYear)
+                BEGIN SELECT RAISE(ABORT, 'FOREIGN KEY constraint failed'); END;
+                CREATE TRIGGER CastsActorDeleted BEFORE INSERT ON Casts
+                WHEN NEW.MovieName IS NOT NULL AND NEW.MovieYear IS NOT NULL AND NEW.Salary > 0 AND EXISTS (
+                    SELECT 1 FROM Actor WHERE Deleted AND ID = NEW.ActorID)
+                BEGIN SELECT RAISE(ABORT, 'FOREIGN KEY constraint failed'); END;
+                CREATE TRIGGER ProductionsMovieDeleted BEFORE INSERT ON Productions
+                WHEN NEW.StudioID IS NOT NULL AND NEW.Budget >= 0 AND NEW.Revenue >= 0 AND EXISTS (
+                    SELECT 1 FROM Movie WHERE Deleted AND Name = NEW.MovieName AND Year = NEW.MovieYear)
+                BEGIN SELECT RAISE(ABORT, 'FOREIGN KEY constraint failed'); END;
+                """
+# without soft delete nothing is ever marked deleted, the relation views are the plain tables and no trigger runs
+# on insert. enableSoftDelete installs CREATE_LIVE_VIEWS and the deleted parent triggers, disableSoftDelete puts
+# these back once nothing is left to purge
+CREATE_PLAIN_LIVE_VIEWS = """
+                CREATE OR REPLACE VIEW LiveRatings AS SELECT * FROM Ratings;
+                CREATE OR REPLACE VIEW LiveCasts AS SELECT * FROM Casts;
+                CREATE OR REPLACE VIEW LiveRoles AS SELECT * FROM Roles;
+                CREATE OR REPLACE VIEW LiveProductions AS SELECT * FROM Productions;
+                """
+DROP_DELETED_PARENT_TRIGGERS = """
+                DROP TRIGGER IF EXISTS RatingsMovieDeleted ON Ratings;
+                DROP TRIGGER IF EXISTS CastsMovieDeleted ON Casts;
+                DROP TRIGGER IF EXISTS CastsActorDeleted ON Casts;
+                DROP TRIGGER IF EXISTS ProductionsMovieDeleted ON Productions;
+                """
+SQLITE_DROP_DELETED_PARENT_TRIGGERS = """
+                DROP TRIGGER IF EXISTS RatingsMovieDeleted;
+                DROP TRIGGER IF EXISTS CastsMovieDeleted;
+                DROP TRIGGER IF EXISTS CastsActorDeleted;
+                DROP TRIGGER IF EXISTS ProductionsMovieDeleted;
+                """
+# only while no row is marked deleted, another process may still be soft deleting
+DROP_SOFT_DELETE = """
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (SELECT 1 FROM Movie WHERE Deleted) AND NOT EXISTS (SELECT 1 FROM Actor WHERE Deleted)
+                    THEN
+                        EXECUTE $ddl$ """ + CREATE_PLAIN_LIVE_VIEWS + DROP_DELETED_PARENT_TRIGGERS + """ $ddl$;
+                    END IF;
+                END $$;
+                """
+INSTALL_SOFT_DELETE = {
+    'postgresql': CREATE_LIVE_VIEWS + DROP_DELETED_PARENT_TRIGGERS + CREATE_DELETED_PARENT_TRIGGERS,
+    'sqlite': CREATE_LIVE_VIEWS + SQLITE_DROP_DELETED_PARENT_TRIGGERS + SQLITE_DELETED_PARENT_TRIGGERS,
+}
+UNINSTALL_SOFT_DELETE = {
+    'postgresql': DROP_SOFT_DELETE,
+    'sqlite': CREATE_PLAIN_LIVE_VIEWS + SQLITE_DROP_DELETED_PARENT_TRIGGERS,
+}
+# name search. the key indexes hold the lower case names in code point order, so prefix matches and the next
+# page of a search are read off the index in order. trigram indexes find the names containing a fragment, they
+# need the pg_trgm extension, created once in public so the schemas of every test worker share it. when it cannot
+# be installed (not available, or not allowed to create it) the migration warns and fragments are found by a scan.
+# any other failure, like a lock or statement timeout while building the index, fails the migration
+CREATE_NAME_KEY_INDEXES = """
+                CREATE INDEX IF NOT EXISTS MovieNameKey ON Movie ((lower(Name) COLLATE "C"), (Name COLLATE "C"), Year);
+                CREATE INDEX IF NOT EXISTS ActorNameKey ON Actor ((lower(Name) COLLATE "C"), ID);
+                """
+CREATE_NAME_TRIGRAM_INDEXES = """
+                DO $$
+                DECLARE
+                    trgm TEXT;
+                BEGIN
+                    CREATE EXTENSION IF NOT EXISTS pg_trgm SCHEMA public;
+                    -- where it was installed before, maybe not in public
+                    SELECT extnamespace::regnamespace::TEXT INTO trgm FROM pg_extension WHERE extname = 'pg_trgm';
+                    EXECUTE format('CREATE INDEX IF NOT EXISTS MovieNameTrigrams ON Movie '
+                                   'USING GIN (lower(Name) %s.gin_trgm_ops)', trgm);
+                    EXECUTE format('CREATE INDEX IF NOT EXISTS ActorNameTrigrams ON Actor '
+                                   'USING GIN (lower(Name) %s.gin_trgm_ops)', trgm);
+                -- not installed on the server (undefined_file before PostgreSQL 15), or not allowed to create it
+                EXCEPTION WHEN feature_not_supported OR undefined_file OR insufficient_privilege THEN
+                    RAISE WARNING 'no trigram indexes for name search, fragments are found by a scan: %', SQLERRM;
+                END $$;
+                """
+
+# schema migrations applied in order by createTables, each one exactly once per database.
+# never edit a released step, append a new one instead
+SCHEMA_MIGRATIONS = [
+    (1, ''.join([
         # basic tables
-        conn.execute(create_critic_table)
-        conn.execute(create_movie_table)
-        conn.execute(create_actor_table)
-        conn.execute(create_studio_table)
-
+        CREATE_CRITIC_TABLE, CREATE_MOVIE_TABLE, CREATE_ACTOR_TABLE, CREATE_STUDIO_TABLE,
         # relations
-        conn.execute(create_Ratings_table)
-        conn.execute(create_Cast_table)
-        conn.execute(create_Roles_table)
-        conn.execute(create_Production_table)
-
+        CREATE_RATINGS_TABLE, CREATE_CAST_TABLE, CREATE_ROLES_TABLE, CREATE_PRODUCTION_TABLE,
         # views
-        conn.execute(create_total_salaries_view)
-        conn.execute(create_total_roles_actor_in_movie_view)
-        conn.execute(create_actor_casts_view)
-        conn.execute(create_actors_in_studios_view)
+        CREATE_TOTAL_SALARIES_VIEW, CREATE_TOTAL_ROLES_ACTOR_IN_MOVIE_VIEW, CREATE_ACTOR_CASTS_VIEW,
+        CREATE_ACTORS_IN_STUDIOS_VIEW + ';'
+    ])),
+    (2, {
+        'postgresql': ''.join([
+            ADD_DELETED_COLUMNS, CREATE_LIVE_VIEWS, CREATE_LIVE_DERIVED_VIEWS, CREATE_DELETED_PARENT_TRIGGERS
+        ]),
+        'sqlite': ''.join([
+            ADD_DELETED_COLUMNS, CREATE_LIVE_VIEWS, CREATE_LIVE_DERIVED_VIEWS, SQLITE_DELETED_PARENT_TRIGGERS
+        ]),
+    }),
+    (3, {
+        'postgresql': CREATE_NAME_KEY_INDEXES + CREATE_NAME_TRIGRAM_INDEXES,
+        'sqlite': CREATE_NAME_KEY_INDEXES,
+    }),
+    (4, {
+        'postgresql': DROP_SOFT_DELETE,
+        # SQLite has no conditional DDL to check for soft deleted rows first, an embedded database keeps
+        # the soft delete views and triggers until disableSoftDelete removes them
+        'sqlite': '',
+    }),
+]
+
+# when set, deleteMovie / deleteActor (and their bulk versions) only mark the row deleted and return at once.
+# a SoftDeletePurger removes the dependent rows and the marked row in small batches later. set it through
+# SoftDeletePurger.enableSoftDelete, which first installs the views hiding the marked rows.
+# a marked movie or actor keeps its key until the purger removed it: adding it again fails with ALREADY_EXISTS
+# while rows still refer to it, so the add never waits for a cascade
+SOFT_DELETE = False
+# an ExistenceIndex lets criticRatedMovie, actorPlayedInMovie and studioProducedMovie answer NOT_EXISTS without a
+# query when their movie, critic or actor is definitely missing (a missing studio still asks the database). only
+# safe when this process makes every add (or the index has a max_age), see Utility/ExistenceIndex.py.
+# SOLUTION_EXISTENCE_INDEX=1 sets it at import
+EXISTENCE_INDEX = ExistenceIndex.fromEnvironment()
 
-        conn.commit()
+
+def createTables():
+    """ brings the schema up to the latest version. when it is already current this costs a single query """
+    try:
+        SchemaManager.migrate(SCHEMA_MIGRATIONS)
     except Exception as e:
         if DEBUG:
             print(e)
-        conn.rollback()
-    finally:
-        if conn is not None:
-            conn.close()
 
 
 def clearTables():
-    query = """
-            DELETE FROM Critic;
-            DELETE FROM Movie;
-            DELETE FROM Actor;
-            DELETE FROM Studio;
-            DELETE FROM Ratings;
-            DELETE FROM Casts;
-            DELETE FROM Productions;
-            DELETE FROM Roles;
-            """
-    execute_query_delete(query)
+    query = "TRUNCATE Critic, Movie, Actor, Studio, Ratings, Casts, Productions, Roles CASCADE;"
+    execute_query_delete(query, caller='clearTables')
 
 
 def dropTables():
@@ -182,6 +366,9 @@ def dropTables():
             "DROP VIEW IF EXISTS TotalActorRoles CASCADE;"
             "DROP VIEW IF EXISTS ACTORS_CASTS CASCADE;"
             "DROP VIEW IF EXISTS ACTORS_MOVIES_STUDIO CASCADE;"
+            "DROP FUNCTION IF EXISTS DetachDeletedMovie CASCADE;"
+            "DROP FUNCTION IF EXISTS DetachDeletedActor CASCADE;"
+            "DROP TABLE IF EXISTS " + SchemaManager.VERSION_TABLE + " CASCADE;"
         )
         conn.commit()
     except Exception as e:
@@ -198,26 +385,28 @@ def addCritic(critic: Critic) -> ReturnValue:
     critic_id = validateInteger(critic_id)
     critic_name = critic.getName()
     critic_name = stringQouteMark(critic_name)
+    if EXISTENCE_INDEX is not None:
+        EXISTENCE_INDEX.addCritic(critic.getCriticID())
 
     query = "INSERT INTO Critic (ID, Name) VALUES ({critic_id}, {critic_name});"
     query = query.format(critic_id=critic_id, critic_name=critic_name)
-    return execute_query_insert(query)
+    return execute_query_insert(query, caller='addCritic')
 
 
 def deleteCritic(critic_id: int) -> ReturnValue:
     query = "DELETE FROM Critic Where ID = {critic_id};"
     query = query.format(critic_id=critic_id)
-    return execute_query_delete(query)
+    return execute_query_delete(query, caller='deleteCritic')
 
 
 def getCriticProfile(critic_id: int) -> Critic:
     critic_id = validateInteger(critic_id)
     result = Critic.badCritic()
-    query = "select * FROM Critic Where ID = {critic_id};"
+    query = "select ID, Name FROM Critic Where ID = {critic_id};"
     query = query.format(critic_id=critic_id)
-    _, rows_count, rows = execute_query_select(query)
+    _, rows_count, critics = execute_query_objects(query, Critic, caller='getCriticProfile')
     if rows_count == 1:
-        result = Critic(rows[0]["id"], rows[0]["name"])
+        result = critics[0]
     return result
 
 
@@ -226,29 +415,37 @@ def addActor(actor: Actor) -> ReturnValue:
     actor_name = stringQouteMark(actor.getActorName())
     actor_age = validateInteger(actor.getAge())
     actor_height = validateInteger(actor.getHeight())
+    if EXISTENCE_INDEX is not None:
+        EXISTENCE_INDEX.addActor(actor.getActorID())
 
     query = "INSERT INTO Actor (ID, Name, Age, Height) VALUES ({actor_id}, {actor_name}, {actor_age}, {actor_height});"
+    if SOFT_DELETE:
+        # a soft deleted actor with the same id is removed right away once the purger left nothing referring to it
+        query = "DELETE FROM Actor WHERE ID = {actor_id} AND Deleted " \
+                "AND NOT EXISTS (SELECT 1 FROM Casts WHERE ActorID = {actor_id});" + query
     query = query.format(actor_id=actor_id,
                          actor_name=actor_name,
                          actor_age=actor_age,
                          actor_height=actor_height)
-    return execute_query_insert(query)
+    return execute_query_insert(query, caller='addActor')
 
 
 def deleteActor(actor_id: int) -> ReturnValue:
-    query = "DELETE FROM Actor Where (ID = {actor_id});"
+    if SOFT_DELETE:
+        query = "UPDATE Actor SET Deleted = TRUE Where (ID = {actor_id}) AND NOT Deleted;"
+    else:
+        query = "DELETE FROM LiveActor Where (ID = {actor_id});"
     query = query.format(actor_id=actor_id)
-    return execute_query_delete(query)
+    return execute_query_delete(query, caller='deleteActor')
 
 
 def getActorProfile(actor_id: int) -> Actor:
     result = Actor.badActor()
-    query = "select * FROM Actor Where (ID = {actor_id});"
+    query = "select ID, Name, Age, Height FROM LiveActor Where (ID = {actor_id});"
     query = query.format(actor_id=actor_id)
-    _, rows_count, rows = execute_query_select(query)
+    _, rows_count, actors = execute_query_objects(query, Actor, caller='getActorProfile')
     if rows_count == 1:
-        result = Actor(rows[0]["id"], rows[0]["name"],
-                       rows[0]['age'], rows[0]['height'])
+        result = actors[0]
     return result
 
 
@@ -256,76 +453,98 @@ def addMovie(movie: Movie) -> ReturnValue:
     movie_name = stringQouteMark(movie.getMovieName())
     movie_year = validateInteger(movie.getYear())
     movie_genre = stringQouteMark(movie.getGenre())
+    if EXISTENCE_INDEX is not None:
+        EXISTENCE_INDEX.addMovie(movie.getMovieName(), movie.getYear())
 
     query = "INSERT INTO Movie (Name, Year, Genre) VALUES ({movie_name}, {movie_year}, {movie_genre});"
+    if SOFT_DELETE:
+        # a soft deleted movie with the same key is removed right away once the purger left nothing referring to it
+        query = "DELETE FROM Movie WHERE Name = {movie_name} AND Year = {movie_year} AND Deleted " \
+                "AND NOT EXISTS (SELECT 1 FROM Ratings WHERE MovieName = {movie_name} AND MovieYear = {movie_year}) " \
+                "AND NOT EXISTS (SELECT 1 FROM Casts WHERE MovieName = {movie_name} AND MovieYear = {movie_year}) " \
+                "AND NOT EXISTS (SELECT 1 FROM Productions " \
+                "WHERE MovieName = {movie_name} AND MovieYear = {movie_year});" + query
     query = query.format(movie_name=movie_name,
                          movie_year=movie_year,
                          movie_genre=movie_genre)
-    return execute_query_insert(query)
+    return execute_query_insert(query, caller='addMovie')
 
 
 def deleteMovie(movie_name: str, year: int) -> ReturnValue:
     string_movie_name = stringQouteMark(movie_name)
-    query = "DELETE FROM Movie Where (Name = {string_movie_name} AND Year = {movie_year});"
+    if SOFT_DELETE:
+        query = "UPDATE Movie SET Deleted = TRUE " \
+                "Where (Name = {string_movie_name} AND Year = {movie_year}) AND NOT Deleted;"
+    else:
+        query = "DELETE FROM LiveMovie Where (Name = {string_movie_name} AND Year = {movie_year});"
     query = query.format(string_movie_name=string_movie_name,
                          movie_year=year)
-    return execute_query_delete(query)
+    return execute_query_delete(query, caller='deleteMovie')
 
 
 def getMovieProfile(movie_name: str, year: int) -> Movie:
     string_movie_name = stringQouteMark(movie_name)
     result = Movie.badMovie()
-    query = "select * FROM Movie Where (Name = {string_movie_name} AND Year = {movie_year});"
+    query = "select Name, Year, Genre FROM LiveMovie Where (Name = {string_movie_name} AND Year = {movie_year});"
     query = query.format(string_movie_name=string_movie_name, movie_year=year)
-    _, rows_count, rows = execute_query_select(query)
+    _, rows_count, movies = execute_query_objects(query, Movie, caller='getMovieProfile')
     if rows_count == 1:
-        result = Movie(rows[0]["name"], rows[0]["year"], rows[0]["genre"])
+        result = movies[0]
     return result
 
 
 def addStudio(studio: Studio) -> ReturnValue:
     studio_id = validateInteger(studio.getStudioID())
     studio_name = stringQouteMark(studio.getStudioName())
+    if EXISTENCE_INDEX is not None:
+        EXISTENCE_INDEX.addStudio(studio.getStudioID())
 
     query = "INSERT INTO Studio (ID, Name) VALUES ({studio_id}, {studio_name});"
     query = query.format(studio_id=studio_id, studio_name=studio_name)
-    return execute_query_insert(query)
+    return execute_query_insert(query, caller='addStudio')
 
 
 def deleteStudio(studio_id: int) -> ReturnValue:
     query = "DELETE FROM Studio Where (ID = {studio_id});"
     query = query.format(studio_id=studio_id)
-    return execute_query_delete(query)
+    return execute_query_delete(query, caller='deleteStudio')
 
 
 def getStudioProfile(studio_id: int) -> Studio:
     result = Studio.badStudio()
-    query = "SELECT * FROM Studio WHERE (ID = {studio_id});"
+    query = "SELECT ID, Name FROM Studio WHERE (ID = {studio_id});"
     query = query.format(studio_id=studio_id)
-    _, rows_count, rows = execute_query_select(query)
+    _, rows_count, studios = execute_query_objects(query, Studio, caller='getStudioProfile')
     if rows_count == 1:
-        result = Studio(rows[0]["id"], rows[0]["name"])
+        result = studios[0]
     return result
 
 
 def criticRatedMovie(movieName: str, movieYear: int, criticID: int, rating: int) -> ReturnValue:
+    if isInteger(rating) and 1 <= rating <= 5 and missingParent(movieName, movieYear, 'Critic', criticID):
+        return ReturnValue.NOT_EXISTS
     string_movie_name = stringQouteMark(movieName)
     query = "INSERT INTO Ratings (MovieName, MovieYear, CriticID, rating) VALUES \
                                     ({movieName}, {movieYear}, {criticID}, {rating});"
     query = query.format(movieName=string_movie_name,
                          movieYear=movieYear, criticID=criticID, rating=rating)
-    return execute_query_insert(query)
+    return execute_query_insert(query, caller='criticRatedMovie')
 
 
 def criticDidntRateMovie(movieName: str, movieYear: int, criticID: int) -> ReturnValue:
     string_movie_name = stringQouteMark(movieName)
-    query = "DELETE FROM Ratings Where (MovieName = {movieName} AND MovieYear = {movieYear} AND CriticID = {criticID});"
+    query = "DELETE FROM LiveRatings Where (MovieName = {movieName} AND MovieYear = {movieYear} AND CriticID = {criticID});"
     query = query.format(movieName=string_movie_name,
                          movieYear=movieYear, criticID=criticID)
-    return execute_query_delete(query)
+    return execute_query_delete(query, caller='criticDidntRateMovie')
 
 
 def actorPlayedInMovie(movieName: str, movieYear: int, actorID: int, salary: int, roles: List[str]) -> ReturnValue:
+    """ a missing movie year, actor id or salary is BAD_PARAMS, like for a member of addMovieCast """
+    # roles that would fail as BAD_PARAMS keep the query
+    if isInteger(salary) and salary > 0 and roles and all(isinstance(role, str) and role for role in roles) \
+            and missingParent(movieName, movieYear, 'Actor', actorID):
+        return ReturnValue.NOT_EXISTS
     string_movie_name = stringQouteMark(movieName)
 
     query_roles = ""
@@ -333,8 +552,8 @@ def actorPlayedInMovie(movieName: str, movieYear: int, actorID: int, salary: int
         string_role = stringQouteMark(role)
         query_to_add = "({movieName}, {movieYear}, {actorId}, {string_role}),"
         query_to_add = query_to_add.format(movieName=string_movie_name,
-                                           movieYear=movieYear,
-                                           actorId=actorID,
+                                           movieYear=nullable(movieYear),
+                                           actorId=nullable(actorID),
                                            string_role=string_role)
         query_roles += query_to_add
     query_roles = query_roles[:-1] + \
@@ -346,33 +565,246 @@ def actorPlayedInMovie(movieName: str, movieYear: int, actorID: int, salary: int
             """
     query = query + '\n' + query_roles
     query = query.format(movieName=string_movie_name,
-                         movieYear=movieYear, actorId=actorID, salary=salary)
-    return execute_query_insert(query)
+                         movieYear=nullable(movieYear), actorId=nullable(actorID), salary=nullable(salary))
+    return execute_query_insert(query, caller='actorPlayedInMovie')
 
 
 def actorDidntPlayInMovie(movieName: str, movieYear: int, actorID: int) -> ReturnValue:
     string_movie_name = stringQouteMark(movieName)
-    query = "DELETE FROM Casts Where (movieName = {movieName} AND movieYear = {movieYear} AND actorID = {actorID});"
+    query = "DELETE FROM LiveCasts Where (movieName = {movieName} AND movieYear = {movieYear} AND actorID = {actorID});"
     query = query.format(movieName=string_movie_name,
                          movieYear=movieYear, actorID=actorID)
-    return execute_query_delete(query)
+    return execute_query_delete(query, caller='actorDidntPlayInMovie')
 
 
 def studioProducedMovie(studioID: int, movieName: str, movieYear: int, budget: int, revenue: int) -> ReturnValue:
+    # a missing studio still goes to the database, the movie may be produced already and that fails first
+    if isInteger(budget) and budget >= 0 and isInteger(revenue) and revenue >= 0 \
+            and missingParent(movieName, movieYear, None, studioID):
+        return ReturnValue.NOT_EXISTS
     string_movie_name = stringQouteMark(movieName)
     query = "INSERT INTO Productions (studioID, MovieName, MovieYear, budget, revenue) VALUES \
                                     ({studioID}, {movieName}, {movieYear}, {budget}, {revenue});"
     query = query.format(studioID=studioID, movieName=string_movie_name,
                          movieYear=movieYear, budget=budget, revenue=revenue)
-    return execute_query_insert(query)
+    return execute_query_insert(query, caller='studioProducedMovie')
 
 
 def studioDidntProduceMovie(studioID: int, movieName: str, movieYear: int) -> ReturnValue:
     string_movie_name = stringQouteMark(movieName)
-    query = "DELETE FROM Productions Where (studioID = {studioID} AND movieName = {movieName} AND movieYear = {movieYear});"
+    query = "DELETE FROM LiveProductions Where (studioID = {studioID} AND movieName = {movieName} AND movieYear = {movieYear});"
     query = query.format(
         studioID=studioID, movieName=string_movie_name, movieYear=movieYear)
-    return execute_query_delete(query)
+    return execute_query_delete(query, caller='studioDidntProduceMovie')
+
+
+# ---------------------------------- BULK API: ----------------------------------
+ADD_MOVIE_CAST = """
+                WITH Input AS (
+                    SELECT * FROM unnest({ords}::INTEGER[], {actors}::INTEGER[], {salaries}::INTEGER[], {sent}::BOOLEAN[])
+                    AS I(Ord, ActorID, Salary, Sent)
+                ), Checked AS (
+                    SELECT Input.*,
+                    EXISTS (SELECT 1 FROM LiveActor WHERE LiveActor.ID = Input.ActorID) AS ActorFound,
+                    EXISTS (SELECT 1 FROM LiveMovie WHERE LiveMovie.Name = {movieName} AND LiveMovie.Year = {movieYear})
+                    AS MovieFound,
+                    EXISTS (SELECT 1 FROM LiveCasts C WHERE C.MovieName = {movieName} AND C.MovieYear = {movieYear}
+                            AND C.ActorID = Input.ActorID) AS CastFound
+                    FROM Input
+                ), NewCasts AS (
+                    INSERT INTO Casts (MovieName, MovieYear, ActorID, Salary)
+                    SELECT {movieName}, {movieYear}, ActorID, Salary FROM Checked
+                    WHERE Sent AND ActorFound AND MovieFound AND NOT CastFound
+                    ON CONFLICT DO NOTHING
+                    RETURNING ActorID
+                ), NewRoles AS (
+                    INSERT INTO Roles (MovieName, MovieYear, ActorID, Role)
+                    SELECT {movieName}, {movieYear}, R.ActorID, R.Role
+                    FROM unnest({roleActors}::INTEGER[], {roles}::TEXT[]) AS R(ActorID, Role)
+                    WHERE R.ActorID IN (SELECT ActorID FROM NewCasts)
+                )
+                SELECT Ord, ActorFound, MovieFound, CastFound, ActorID IN (SELECT ActorID FROM NewCasts) AS Inserted
+                FROM Checked;
+                """
+
+
+def addMovieCast(movie_name: str, year: int, cast: List[Tuple[int, int, List[str]]]) -> List[ReturnValue]:
+    """ adds a whole cast of (actor_id, salary, roles) to a movie with one statement. returns one ReturnValue per
+    cast member, the one actorPlayedInMovie would have returned for it had the members been added in order """
+    results = [ReturnValue.BAD_PARAMS] * len(cast)
+    if not movie_name or year is None:
+        return results
+    # only the first member of each actor with valid parameters and roles is sent, the rest is resolved from it
+    sent = {}
+    checked = []
+    for index, (actor_id, salary, roles) in enumerate(cast):
+        if actor_id is None or salary is None or salary <= 0:
+            continue
+        checked.append(index)
+        if roles and all(roles) and len(set(roles)) == len(roles) and actor_id not in sent:
+            sent[actor_id] = index
+    if not checked:
+        return results
+    if Connector.DBConnector.backend() == Connector.SQLITE:
+        # SQLite has no data modifying CTEs, the members are added one after the other
+        for index in checked:
+            actor_id, salary, roles = cast[index]
+            results[index] = actorPlayedInMovie(movie_name, year, actor_id, salary, roles)
+        return results
+
+    query = sql.SQL(ADD_MOVIE_CAST).format(
+        ords=sql.Literal(checked),
+        actors=sql.Literal([cast[index][0] for index in checked]),
+        salaries=sql.Literal([cast[index][1] for index in checked]),
+        sent=sql.Literal([sent.get(cast[index][0]) == index for index in checked]),
+        movieName=sql.Literal(movie_name),
+        movieYear=sql.Literal(year),
+        roleActors=sql.Literal([actor_id for actor_id, index in sent.items() for _ in cast[index][2]]),
+        roles=sql.Literal([role for index in sent.values() for role in cast[index][2]]))
+    status, _, rows = execute_query_returning(query, caller='addMovieCast')
+    if status != ReturnValue.OK:
+        for index in checked:
+            results[index] = status
+        return results
+
+    inserted = {}
+    for index, actor_found, movie_found, cast_found, was_inserted in sorted(rows.rows):
+        actor_id, _, roles = cast[index]
+        if cast_found or inserted.get(actor_id, len(cast)) < index:
+            results[index] = ReturnValue.ALREADY_EXISTS
+        elif not actor_found or not movie_found:
+            results[index] = ReturnValue.NOT_EXISTS
+        elif not roles or not all(roles):
+            results[index] = ReturnValue.BAD_PARAMS
+        elif len(set(roles)) != len(roles) or not was_inserted:
+            # a repeated role violates the Roles key, not inserted means a concurrent insert won the race
+            results[index] = ReturnValue.ALREADY_EXISTS
+        else:
+            results[index] = ReturnValue.OK
+            inserted[actor_id] = index
+    return results
+
+
+# keys per DELETE statement of the bulk deletes. every chunk commits on its own, so a smaller chunk holds the
+# row locks of the cascading deletes for a shorter time
+BULK_DELETE_CHUNK = 1000
+
+
+def deleteCritics(critic_ids: List[int], chunk_size: int = BULK_DELETE_CHUNK) -> List[ReturnValue]:
+    return execute_bulk_delete("Critic", [("ID", "INTEGER")], [(critic_id,) for critic_id in critic_ids], chunk_size,
+                               caller='deleteCritics')
+
+
+def deleteActors(actor_ids: List[int], chunk_size: int = BULK_DELETE_CHUNK) -> List[ReturnValue]:
+    return execute_bulk_delete("LiveActor", [("ID", "INTEGER")], [(actor_id,) for actor_id in actor_ids], chunk_size,
+                               soft_table="Actor", caller='deleteActors')
+
+
+def deleteStudios(studio_ids: List[int], chunk_size: int = BULK_DELETE_CHUNK) -> List[ReturnValue]:
+    return execute_bulk_delete("Studio", [("ID", "INTEGER")], [(studio_id,) for studio_id in studio_ids], chunk_size,
+                               caller='deleteStudios')
+
+
+def deleteMovies(movies: List[Tuple[str, int]], chunk_size: int = BULK_DELETE_CHUNK) -> List[ReturnValue]:
+    return execute_bulk_delete("LiveMovie", [("Name", "TEXT"), ("Year", "INTEGER")], movies, chunk_size,
+                               soft_table="Movie", caller='deleteMovies')
+
+
+def deleteRatings(ratings: List[Tuple[str, int, int]], chunk_size: int = BULK_DELETE_CHUNK) -> List[ReturnValue]:
+    """ ratings are (movieName, movieYear, criticID) """
+    return execute_bulk_delete("LiveRatings", [("MovieName", "TEXT"), ("MovieYear", "INTEGER"), ("CriticID", "INTEGER")],
+                               ratings, chunk_size, caller='deleteRatings')
+
+
+def deleteCasts(casts: List[Tuple[str, int, int]], chunk_size: int = BULK_DELETE_CHUNK) -> List[ReturnValue]:
+    """ casts are (movieName, movieYear, actorID) """
+    return execute_bulk_delete("LiveCasts", [("MovieName", "TEXT"), ("MovieYear", "INTEGER"), ("ActorID", "INTEGER")],
+                               casts, chunk_size, caller='deleteCasts')
+
+
+def deleteProductions(productions: List[Tuple[int, str, int]],
+                      chunk_size: int = BULK_DELETE_CHUNK) -> List[ReturnValue]:
+    """ productions are (studioID, movieName, movieYear) """
+    return execute_bulk_delete("LiveProductions",
+                               [("StudioID", "INTEGER"), ("MovieName", "TEXT"), ("MovieYear", "INTEGER")],
+                               productions, chunk_size, caller='deleteProductions')
+
+
+# ---------------------------------- SEARCH API: ----------------------------------
+# the names starting with the searched text are rank 0, the names containing it further on rank 1. each rank is read
+# in {key} order, {after} is the keyset condition that starts the next page behind the last result of a page
+SEARCH_RANK = """
+                SELECT {fields} FROM {view}
+                WHERE {match} {after}
+                ORDER BY {key} LIMIT {limit};
+                """
+# fragments shorter than this only match the start of names, a trigram index cannot find them
+SEARCH_MIN_FRAGMENT = 3
+MOVIE_SEARCH_KEY = ['lower(Name) COLLATE "C"', 'Name COLLATE "C"', 'Year']
+ACTOR_SEARCH_KEY = ['lower(Name) COLLATE "C"', 'ID']
+
+
+def searchMovies(text: str, limit: int = 10, after: Movie = None) -> List[Movie]:
+    """ up to limit movies whose name contains text, case insensitive. movies whose name starts with text come first,
+    each group in name order. the next page is searchMovies(text, limit, after=<last movie of this page>) """
+    after_key = None if after is None else (after.getMovieName(), after.getMovieName(), after.getYear())
+    movies = []
+    for rank in searchRanks(text, limit):
+        if len(movies) >= limit:
+            break
+        query = searchQuery('Name, Year, Genre', 'LiveMovie', MOVIE_SEARCH_KEY, text, rank, limit - len(movies),
+                            after_key)
+        _, _, found = execute_query_objects(query, Movie, caller='searchMovies')
+        movies += found
+    return movies
+
+
+def searchActors(text: str, limit: int = 10, after: Actor = None) -> List[Actor]:
+    """ up to limit actors whose name contains text, ranked and paged like searchMovies """
+    after_key = None if after is None else (after.getActorName(), after.getActorID())
+    actors = []
+    for rank in searchRanks(text, limit):
+        if len(actors) >= limit:
+            break
+        query = searchQuery('ID, Name, Age, Height', 'LiveActor', ACTOR_SEARCH_KEY, text, rank, limit - len(actors),
+                            after_key)
+        _, _, found = execute_query_objects(query, Actor, caller='searchActors')
+        actors += found
+    return actors
+
+
+def searchRanks(text: str, limit: int) -> List[int]:
+    """ the ranks to search: names starting with text, then (for long enough text) names containing it """
+    if not isinstance(text, str) or not text or limit is None or limit <= 0:
+        return []
+    return [0, 1] if len(text) >= SEARCH_MIN_FRAGMENT else [0]
+
+
+def searchQuery(fields: str, view: str, key: List[str], text: str, rank: int, limit: int,
+                after_key: Union[tuple, None]) -> sql.Composed:
+    pattern = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+    def startsWith(name: sql.Composable) -> sql.Composed:
+        return sql.SQL('lower({}) COLLATE "C" LIKE lower({}) ESCAPE {}').format(name, sql.Literal(pattern + '%'),
+                                                                               sql.Literal('\\'))
+
+    prefix = startsWith(sql.SQL('Name'))
+    match = prefix if rank == 0 else sql.SQL('lower(Name) LIKE lower({}) ESCAPE {} AND NOT {}').format(
+        sql.Literal('%' + pattern + '%'), sql.Literal('\\'), prefix)
+    after = sql.SQL('')
+    if after_key is not None:
+        # the server lowers the name of the last row of the previous page and tells its rank, just like it does
+        # for the rows. the rank test is constant, the planner folds it away: a page that ended among the names
+        # containing text searches no prefixes, one that ended among the prefixes starts the names containing text
+        # from the beginning
+        values = [sql.SQL(column.replace('Name', '{}')).format(sql.Literal(value)) if 'Name' in column
+                  else sql.Literal(value) for column, value in zip(key, after_key)]
+        later = sql.SQL('({}) > ({})').format(sql.SQL(', ').join(sql.SQL(column) for column in key),
+                                              sql.SQL(', ').join(values))
+        after_prefix = startsWith(sql.Literal(after_key[0]))
+        after = sql.SQL('AND {} AND {}' if rank == 0 else 'AND ({} OR {})').format(after_prefix, later)
+    return sql.SQL(SEARCH_RANK).format(fields=sql.SQL(fields), view=sql.SQL(view), match=match, after=after,
+                                       key=sql.SQL(', '.join(key)), limit=sql.Literal(limit))
 
 
 # ---------------------------------- BASIC API: ----------------------------------
@@ -382,11 +814,12 @@ def averageRating(movieName: str, movieYear: int) -> float:
     conn = None
     result = 0.0
     try:
-        conn = Connector.DBConnector()
-        query = "SELECT AVG(rating) FROM Ratings WHERE MovieName = {movieName} AND MovieYear = {movieYear};"
+        conn = Connector.DBConnector(readOnly=True)
+        query = "SELECT AVG(rating) FROM LiveRatings WHERE MovieName = {movieName} AND MovieYear = {movieYear};"
         query = query.format(movieName=stringQouteMark(
             movieName), movieYear=movieYear)
-        rows_count, rows = conn.execute(query)
+        rows_count, rows = conn.execute(Connector.tagQuery(query, 'averageRating'),
+                                        timeout=DEADLINES.get('averageRating'))
         row = rows[0]['avg']
         result = float(row) if row else None
         if result is None:
@@ -412,15 +845,15 @@ def averageActorRating(actorID: int) -> float:
     query = """
             SELECT Avg(single_movie_rating) FROM (
             SELECT Casts.MovieName, Casts.MovieYear, COALESCE(AVG(rating), 0) AS single_movie_rating
-            FROM Casts
-            LEFT OUTER JOIN Ratings
+            FROM LiveCasts AS Casts
+            LEFT OUTER JOIN LiveRatings AS Ratings
             ON Casts.MovieName = Ratings.MovieName AND Casts.MovieYear = Ratings.MovieYear
             WHERE actorID = {actorID}
             GROUP BY Casts.MovieName, Casts.MovieYear
             ) AS TEMPORARAY_NAME
             """
     query = query.format(actorID=actorID)
-    ret_res, rows_count, rows = execute_query_select(query)
+    ret_res, rows_count, rows = execute_query_select(query, caller='averageActorRating')
     if rows_count == 1 and ret_res == ReturnValue.OK:
         result = float(rows[0]['avg']) if rows[0]['avg'] else result
     return result
@@ -442,16 +875,15 @@ def bestPerformance(actor_id: int) -> Movie:
     query = """
             SELECT     movie.name,
                     movie.year,
-                    movie.genre,
-                    castings.rating
-            FROM       movie
+                    movie.genre
+            FROM       LiveMovie AS movie
             INNER JOIN
                     (
                                     SELECT          casts.moviename,
                                                     casts.movieyear,
                                                     Coalesce(rating, -1) AS rating
-                                    FROM            casts
-                                    LEFT OUTER JOIN ratings
+                                    FROM            LiveCasts AS casts
+                                    LEFT OUTER JOIN LiveRatings AS ratings
                                     ON              casts.moviename = ratings.moviename
                                     AND             casts.movieyear = ratings.movieyear
                                     WHERE           actorid = {actor_id} ) AS castings
@@ -463,9 +895,9 @@ def bestPerformance(actor_id: int) -> Movie:
             LIMIT      1
             """
     query = query.format(actor_id=actor_id)
-    ret_res, rows_count, rows = execute_query_select(query)
+    ret_res, rows_count, movies = execute_query_objects(query, Movie, caller='bestPerformance')
     if rows_count == 1 and ret_res == ReturnValue.OK:
-        result = Movie(rows[0]["name"], rows[0]["year"], rows[0]["genre"])
+        result = movies[0]
     return result
 
 
@@ -485,12 +917,12 @@ def stageCrewBudget(movieName: str, movieYear: int) -> int:
         SELECT COALESCE(budget, 0)-total_salary AS diff FROM 
 		(SELECT * FROM TotalSalaries  WHERE MovieName = {string_movie_name} AND MovieYear = {movieYear}) AS Movie_salary
 		LEFT OUTER JOIN
-		Productions P
+		LiveProductions P
 		ON Movie_salary.MovieName = P.MovieName AND Movie_salary.MovieYear = P.MovieYear
     """
     query = query.format(string_movie_name=string_movie_name,
                          movieYear=movieYear)
-    _, rows_count, rows = execute_query_select(query)
+    _, rows_count, rows = execute_query_select(query, caller='stageCrewBudget')
     if rows_count == 1:
         totalCrewBudget = rows[0]["diff"]
     return totalCrewBudget
@@ -516,7 +948,7 @@ def overlyInvestedInMovie(movie_name: str, movie_year: int, actor_id: int) -> bo
                            AND movieyear = {movie_year}
                            AND actorid = {actor_id}) AS TOTAL_ACTOR_ROLES_SELECT
                    INNER JOIN (SELECT moviename,movieyear,Count(roles) AS TOTAL_ROLES
-                               FROM   roles
+                               FROM   LiveRoles AS roles
                                GROUP  BY moviename,movieyear) AS TOTAL_MOVIE_ROLES
                            ON TOTAL_ACTOR_ROLES_SELECT.moviename =
                               TOTAL_MOVIE_ROLES.moviename
@@ -526,7 +958,7 @@ def overlyInvestedInMovie(movie_name: str, movie_year: int, actor_id: int) -> bo
     query = query.format(string_movie_name=string_movie_name,
                          movie_year=movie_year,
                          actor_id=actor_id)
-    _, rows_count, rows = execute_query_select(query)
+    _, rows_count, rows = execute_query_select(query, caller='overlyInvestedInMovie')
     if rows_count == 1:
         invested = rows[0]["invested"]
     return invested
@@ -546,13 +978,13 @@ def franchiseRevenue() -> List[Tuple[str, int]]:
     franchiseList = []
     query = """
         SELECT movie.name, SUM(COALESCE(revenue, 0)) as TOTAL_REVENUE FROM
-	    movie LEFT OUTER JOIN productions
+	    LiveMovie AS movie LEFT OUTER JOIN LiveProductions AS productions
 	    on movie.name = productions.moviename and movie.year = productions.movieyear
 	    GROUP BY movie.name
 	    ORDER BY
 	    movie.name DESC
         """
-    _, _, rows = execute_query_select(query)
+    _, _, rows = execute_query_select(query, caller='franchiseRevenue')
     return rows.rows
 
 
@@ -568,13 +1000,13 @@ studios should be ordered by year in descending order.
 
 def studioRevenueByYear() -> List[Tuple[str, int]]:
     query = """
-        SELECT studioid, movieyear, SUM(revenue) as total_revenue_year FROM PRODUCTIONS
+        SELECT studioid, movieyear, SUM(revenue) as total_revenue_year FROM LiveProductions
         GROUP BY studioid, movieyear
         ORDER BY
         studioid DESC,
         movieyear DESC
         """
-    _, _, rows = execute_query_select(query)
+    _, _, rows = execute_query_select(query, caller='studioRevenueByYear')
     return rows.rows
 
 
@@ -594,13 +1026,13 @@ def getFanCritics() -> List[Tuple[int, int]]:
     query = """
             SELECT RATINGS_FOR_STUDIO.criticid,MOVIES_PER_STUDIO.studioid
             FROM   (SELECT criticid,Count(studioid) AS Rated,studioid
-                    FROM   ratings R
-                           RIGHT OUTER JOIN productions P
+                    FROM   LiveRatings R
+                           RIGHT OUTER JOIN LiveProductions P
                                          ON R.moviename = P.moviename
                                             AND R.movieyear = P.movieyear
                     GROUP  BY criticid,studioid) AS RATINGS_FOR_STUDIO
                    RIGHT OUTER JOIN (SELECT Count(studioid) AS Produced,studioid
-                                     FROM   productions
+                                     FROM   LiveProductions
                                      GROUP  BY studioid) AS MOVIES_PER_STUDIO
                                  ON RATINGS_FOR_STUDIO.studioid = MOVIES_PER_STUDIO.studioid
                                     AND RATINGS_FOR_STUDIO.rated =
@@ -608,7 +1040,7 @@ def getFanCritics() -> List[Tuple[int, int]]:
             WHERE  RATINGS_FOR_STUDIO.criticid IS NOT NULL
             ORDER  BY RATINGS_FOR_STUDIO.criticid DESC,MOVIES_PER_STUDIO.studioid DESC; 
             """
-    _, _, rows = execute_query_select(query)
+    _, _, rows = execute_query_select(query, caller='getFanCritics')
     return rows.rows
 
 
@@ -624,12 +1056,12 @@ counted once.
 def averageAgeByGenre() -> List[Tuple[str, float]]:
     query = """
             SELECT genre, avg(aage) FROM
-            ACTORS_CASTS INNER JOIN movie
+            ACTORS_CASTS INNER JOIN LiveMovie AS movie
             ON ACTORS_CASTS.CmovieName = movie.Name AND ACTORS_CASTS.CmovieYear = movie.year
             GROUP BY genre
             ORDER BY genre ASC;
             """
-    _, _, rows = execute_query_select(query)
+    _, _, rows = execute_query_select(query, caller='averageAgeByGenre')
     return rows.rows
 
 
@@ -653,7 +1085,7 @@ def getExclusiveActors() -> List[Tuple[int, int]]:
             )
 		    ORDER BY actorid DESC
             """
-    _, _, rows = execute_query_select(query)
+    _, _, rows = execute_query_select(query, caller='getExclusiveActors')
     return rows.rows
 
 
@@ -664,6 +1096,24 @@ def stringQouteMark(string: str) -> str:
     return "'" + string + "'"
 
 
+def isInteger(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def missingParent(movie_name: str, movie_year: int, kind: Union[str, None], parent_id: int) -> bool:
+    """ True when EXISTENCE_INDEX knows that the movie or the Critic / Actor of a relation row is missing,
+    so inserting it fails with NOT_EXISTS. with kind None only the movie is looked up. False whenever a key is not
+    of a kind the insert would accept, those must still reach the database and fail with BAD_PARAMS """
+    index = EXISTENCE_INDEX
+    if index is None or Connector.DBConnector.currentShard() is not None:
+        # a shard holds part of the keys, the index knows those of the default database only
+        return False
+    if not (isinstance(movie_name, str) and movie_name and isInteger(movie_year) and isInteger(parent_id)
+            and parent_id):
+        return False
+    return index.lacksMovie(movie_name, movie_year) or (kind is not None and getattr(index, 'lacks' + kind)(parent_id))
+
+
 def validateInteger(integer: int):
     if not integer:
         return "Null"
@@ -671,10 +1121,21 @@ def validateInteger(integer: int):
     return integer
 
 
-def execute_query_insert(query: Union[str, sql.Composed]) -> ReturnValue:
+def nullable(value):
+    # None fails the NOT NULL constraint as BAD_PARAMS instead of the query as ERROR, 0 stays a value
+    if value is None:
+        return "Null"
+
+    return value
+
+
+# caller is the API function a query runs for: its tag (see DBConnector.tagQuery) and its key in DEADLINES.
+# queries without one are untagged and have no deadline of their own
+def execute_query_insert(query: Union[str, sql.Composed], caller: str = None) -> ReturnValue:
+    query = Connector.tagQuery(query, caller)
     conn = Connector.DBConnector()
     try:
-        conn.execute(query)
+        conn.execute(query, timeout=DEADLINES.get(caller))
         result = ReturnValue.OK
     except DatabaseException.NOT_NULL_VIOLATION as e:
         if DEBUG:
@@ -692,6 +1153,10 @@ def execute_query_insert(query: Union[str, sql.Composed]) -> ReturnValue:
         if DEBUG:
             print(e)
         result = ReturnValue.ALREADY_EXISTS
+    except DatabaseException.QUERY_TIMEOUT as e:
+        if DEBUG:
+            print(e)
+        result = ReturnValue.ERROR
     except DatabaseException.UNKNOWN_ERROR as e:
         if DEBUG:
             print(e)
@@ -705,10 +1170,11 @@ def execute_query_insert(query: Union[str, sql.Composed]) -> ReturnValue:
         return result
 
 
-def execute_query_delete(query: Union[str, sql.Composed]) -> ReturnValue:
+def execute_query_delete(query: Union[str, sql.Composed], caller: str = None) -> ReturnValue:
+    query = Connector.tagQuery(query, caller)
     conn = Connector.DBConnector()
     try:
-        rows_count, _ = conn.execute(query)
+        rows_count, _ = conn.execute(query, timeout=DEADLINES.get(caller))
         conn.close()
         if rows_count == 0:
             result = ReturnValue.NOT_EXISTS
@@ -730,6 +1196,10 @@ def execute_query_delete(query: Union[str, sql.Composed]) -> ReturnValue:
         if DEBUG:
             print(e)
         result = ReturnValue.ALREADY_EXISTS
+    except DatabaseException.QUERY_TIMEOUT as e:
+        if DEBUG:
+            print(e)
+        result = ReturnValue.ERROR
     except DatabaseException.UNKNOWN_ERROR as e:
         if DEBUG:
             print(e)
@@ -743,16 +1213,109 @@ def execute_query_delete(query: Union[str, sql.Composed]) -> ReturnValue:
         return result
 
 
-def execute_query_select(query: Union[str, sql.Composed]) -> Tuple[ReturnValue, int, Connector.ResultSet]:
+def execute_query_select(query: Union[str, sql.Composed],
+                         caller: str = None) -> Tuple[ReturnValue, int, Connector.ResultSet]:
+    query = Connector.tagQuery(query, caller)
+    conn = Connector.DBConnector(readOnly=True)
+    try:
+        rows_count, data = conn.execute(query, timeout=DEADLINES.get(caller))
+        result = (ReturnValue.OK, rows_count, data)
+    except Exception as e:
+        if DEBUG:
+            print(e)
+        result = (ReturnValue.ERROR, 0, Connector.ResultSet())
+    finally:
+        conn.close()
+        return result
+
+
+def execute_query_returning(query: Union[str, sql.Composed],
+                            caller: str = None) -> Tuple[ReturnValue, int, Connector.ResultSet]:
+    """ runs a writing statement that reports its own per row outcomes, like INSERT ... RETURNING """
+    query = Connector.tagQuery(query, caller)
     conn = Connector.DBConnector()
     try:
-        rows_count, data = conn.execute(query)
+        rows_count, data = conn.execute(query, timeout=DEADLINES.get(caller))
         result = (ReturnValue.OK, rows_count, data)
+    except (DatabaseException.NOT_NULL_VIOLATION, DatabaseException.CHECK_VIOLATION) as e:
+        if DEBUG:
+            print(e)
+        result = (ReturnValue.BAD_PARAMS, 0, Connector.ResultSet())
     except Exception as e:
         if DEBUG:
             print(e)
-        result = (ReturnValue.ERROR, 0, 0)
+        result = (ReturnValue.ERROR, 0, Connector.ResultSet())
     finally:
         conn.close()
         return result
+
+
+def execute_bulk_delete(table: str, columns: List[Tuple[str, str]], keys: List[tuple],
+                        chunk_size: int = BULK_DELETE_CHUNK, soft_table: str = None,
+                        caller: str = None) -> List[ReturnValue]:
+    """ deletes rows of table by their (column, type) key, one DELETE ... RETURNING statement per chunk of keys.
+    returns a ReturnValue per key in input order: OK when it was deleted, NOT_EXISTS when nothing matched
+    (a repeated key is only deleted once) and ERROR for every key of a failed chunk.
+    in SOFT_DELETE mode the rows of soft_table, when given, are marked deleted instead """
+    results = [ReturnValue.NOT_EXISTS] * len(keys)
+    positions = {}
+    for index, key in enumerate(keys):
+        try:
+            key = tuple(int(value) if kind == "INTEGER" else value for value, (_, kind) in zip(key, columns))
+        except (TypeError, ValueError):
+            continue
+        if None not in key and key not in positions:
+            positions[key] = index
+    unique_keys = list(positions)
+    names = sql.SQL(', ').join(sql.Identifier(column.lower()) for column, _ in columns)
+
+    for start in range(0, len(unique_keys), max(1, chunk_size)):
+        chunk = unique_keys[start:start + max(1, chunk_size)]
+        arrays = [sql.SQL("{}::{}[]").format(sql.Literal([key[position] for key in chunk]), sql.SQL(kind))
+                  for position, (_, kind) in enumerate(columns)]
+        if len(columns) == 1:
+            condition = sql.SQL("{} = ANY({})").format(names, arrays[0])
+        else:
+            condition = sql.SQL("({}) IN (SELECT * FROM unnest({}))").format(names, sql.SQL(', ').join(arrays))
+        if SOFT_DELETE and soft_table is not None:
+            query = sql.SQL("UPDATE {} SET Deleted = TRUE WHERE {} AND NOT Deleted RETURNING {};").format(
+                sql.Identifier(soft_table.lower()), condition, names)
+        else:
+            query = sql.SQL("DELETE FROM {} WHERE {} RETURNING {};").format(sql.Identifier(table.lower()), condition,
+                                                                            names)
+        conn = Connector.DBConnector()
+        try:
+            _, rows = conn.execute(Connector.tagQuery(query, caller), timeout=DEADLINES.get(caller))
+            for row in rows.rows:
+                results[positions[tuple(row)]] = ReturnValue.OK
+        except Exception as e:
+            if DEBUG:
+                print(e)
+            for key in chunk:
+                results[positions[key]] = ReturnValue.ERROR
+        finally:
+            conn.close()
+    return results
+
+
+def execute_query_objects(query: Union[str, sql.Composed], row_factory,
+                          caller: str = None) -> Tuple[ReturnValue, int, list]:
+    query = Connector.tagQuery(query, caller)
+    conn = Connector.DBConnector(readOnly=True)
+    try:
+        rows_count, objects = conn.executeObjects(query, row_factory, timeout=DEADLINES.get(caller))
+        result = (ReturnValue.OK, rows_count, objects)
+    except Exception as e:
+        if DEBUG:
+            print(e)
+        result = (ReturnValue.ERROR, 0, [])
+    finally:
+        conn.close()
+        return result
+
+
+# SOLUTION_PROFILE=<path> profiles the functions above for the whole process, see Utility/Profiler.py
+Profiler.profileFromEnvironment(sys.modules[__name__])
+# SOLUTION_SINGLE_FLIGHT=1 lets identical concurrent reads share one query, see Utility/SingleFlight.py
+SingleFlight.coalesceFromEnvironment(sys.modules[__name__])
 # GOOD LUCK!
@@ -0,0 +1,55 @@
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from ApproximateAnalytics import approximateAverageRating, approximateAverageAgeByGenre, \
+    approximateStudioRevenueByYear
+from Benchmark.DataGenerator import DataGenerator, ScaleFactor, loadDataset
+from Tests.abstractTest import AbstractTest
+
+
+class Test(AbstractTest):
+
+    def setUp(self) -> None:
+        super().setUp()
+        loadDataset(DataGenerator(ScaleFactor(critics=20, actors=60, movies=200, studios=6, ratings_per_movie=10,
+                                              cast_size=4), seed=5), recreate=False)
+
+    def testFullSampleIsExact(self) -> None:
+        average = Solution.execute_query_select("SELECT AVG(Rating) AS avg FROM LiveRatings")[2][0]['avg']
+        estimate = approximateAverageRating(100, 'BERNOULLI')
+        self.assertAlmostEqual(float(average), estimate.value, 9, "average of every rating")
+        self.assertEqual((estimate.value, estimate.value, 2000), (estimate.low, estimate.high, estimate.sampled),
+                         "no sampling error")
+        self.assertEqual([(genre, round(float(age), 9)) for genre, age in Solution.averageAgeByGenre()],
+                         [(genre, round(estimate.value, 9)) for genre, estimate in approximateAverageAgeByGenre(100)],
+                         "averageAgeByGenre")
+        self.assertEqual(Solution.studioRevenueByYear(),
+                         [(studio, year, estimate.value) for studio, year, estimate
+                          in approximateStudioRevenueByYear(100, 'bernoulli')], "studioRevenueByYear")
+
+    def testSample(self) -> None:
+        estimate = approximateAverageRating(30, 'BERNOULLI', confidence=0.99)
+        self.assertTrue(0 < estimate.sampled < 2000, "a part of the ratings")
+        self.assertTrue(estimate.low <= estimate.value <= estimate.high, "inside its interval")
+        self.assertTrue(1 <= estimate.value <= 5, "a rating")
+        narrow = approximateAverageRating(30, 'BERNOULLI', confidence=0.5)
+        self.assertLess(narrow.high - narrow.low, estimate.high - estimate.low + 1e-9, "lower confidence")
+        for genre, estimate in approximateAverageAgeByGenre(50, 'SYSTEM'):
+            self.assertTrue(estimate.low <= estimate.value <= estimate.high, genre)
+        for studio, year, estimate in approximateStudioRevenueByYear(50, 'SYSTEM'):
+            self.assertTrue(0 <= estimate.low <= estimate.value <= estimate.high, (studio, year))
+
+    @unittest.skipIf(Connector.DBConnector.backend() != Connector.PRIMARY, "REPEATABLE is PostgreSQL only")
+    def testRepeatableSeed(self) -> None:
+        self.assertEqual(approximateAverageAgeByGenre(20, 'BERNOULLI', seed=7),
+                         approximateAverageAgeByGenre(20, 'BERNOULLI', seed=7), "same seed, same sample")
+
+    def testBadArguments(self) -> None:
+        self.assertRaises(ValueError, approximateAverageRating, 0)
+        self.assertRaises(ValueError, approximateAverageRating, 101)
+        self.assertRaises(ValueError, approximateAverageRating, 10, 'RANDOM')
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,70 @@
+import time
+import unittest
+from unittest import mock
+from Benchmark import LoadGenerator
+from Benchmark.DataGenerator import ScaleFactor
+from Benchmark.Runner import percentile, summarize
+from Business.Critic import Critic
+from Business.Movie import Movie
+from Utility.ReturnValue import ReturnValue
+
+
+class Test(unittest.TestCase):
+
+    def testPercentile(self) -> None:
+        values = list(range(1, 101))
+        self.assertEqual(50, percentile(values, 0.50))
+        self.assertEqual(95, percentile(values, 0.95))
+        self.assertEqual(99, percentile(values, 0.99))
+        self.assertEqual(7, percentile(values, 0.07), "no float noise in the rank")
+        self.assertEqual(100, percentile(values, 1.0))
+        self.assertEqual(1, percentile(values, 0.0))
+        self.assertEqual(3, percentile([1, 2, 3, 4], 0.75), "nearest rank, not interpolated")
+        self.assertEqual(5, percentile([5], 0.99))
+        self.assertEqual(0.0, percentile([], 0.5))
+
+    def testSummary(self) -> None:
+        summary = summarize([value / 1000 for value in range(100, 0, -1)])
+        self.assertEqual(100, summary['samples'])
+        self.assertAlmostEqual(95, summary['p95_ms'])
+        self.assertAlmostEqual(100, summary['max_ms'])
+
+    def testOutcomes(self) -> None:
+        self.assertEqual('ALREADY_EXISTS', LoadGenerator.outcomeOf(ReturnValue.ALREADY_EXISTS))
+        self.assertEqual('OK', LoadGenerator.outcomeOf(Movie('Heat', 1995, 'Action')))
+        self.assertEqual('OK', LoadGenerator.outcomeOf(3.5))
+        self.assertEqual('OK', LoadGenerator.outcomeOf([1]))
+        for sentinel in (Movie.badMovie(), Critic.badCritic(), 0, 0.0, []):
+            self.assertEqual(LoadGenerator.EMPTY, LoadGenerator.outcomeOf(sentinel), sentinel)
+
+    def testReport(self) -> None:
+        records = [(0.1, 'getMovieProfile', 0.001, 'OK'), (0.5, 'getMovieProfile', 0.003, LoadGenerator.EMPTY),
+                   (1.2, 'addCritic', 0.002, 'ALREADY_EXISTS')]
+        report = LoadGenerator.buildReport(records, duration=2.0)
+        self.assertEqual(3, report['calls'])
+        self.assertEqual(1.5, report['throughput_per_s'])
+        self.assertEqual({'OK': 1, 'EMPTY': 1, 'ALREADY_EXISTS': 1}, report['outcomes'])
+        self.assertEqual({'OK': 1, 'EMPTY': 1}, report['functions']['getMovieProfile']['outcomes'])
+        self.assertAlmostEqual(3, report['functions']['getMovieProfile']['max_ms'])
+        self.assertEqual([(0.0, 2.0, ['getMovieProfile']), (1.0, 1.0, ['addCritic'])],
+                         [(window['start_s'], window['throughput_per_s'], list(window['functions']))
+                          for window in report['timeline']], "one window per second")
+
+    def testRateSchedule(self) -> None:
+        scale = ScaleFactor.scaled(0.01)
+        for stall, expected in ((0.0, 'calls on the schedule'), (0.1, 'late calls keep their scheduled start')):
+            kinds = {'stall': lambda rng: ('stall', time.sleep, (stall,))}
+            with mock.patch.object(LoadGenerator, 'operations', return_value=kinds):
+                records = LoadGenerator.runClient(0, scale, {'stall': 1}, duration=0.3, rate=20, seed=0,
+                                                  started=time.perf_counter())
+            self.assertGreaterEqual(len(records), 3, expected)
+            for index, (offset, _, latency, outcome) in enumerate(records):
+                self.assertAlmostEqual(index * 0.05, offset, msg=expected)
+                self.assertEqual('OK', outcome)
+                # a call waiting for the ones before it counts that wait
+                self.assertGreaterEqual(latency, stall * (index + 1) - index * 0.05, expected)
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
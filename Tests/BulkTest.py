@@ -0,0 +1,78 @@
+import unittest
+import Solution
+from Utility.ReturnValue import ReturnValue
+from Tests.abstractTest import AbstractTest
+
+from Business.Actor import Actor
+from Business.Movie import Movie
+
+
+class Test(AbstractTest):
+
+    def setUp(self) -> None:
+        super().setUp()
+        Solution.addMovie(Movie(movie_name="Mission Impossible", year=1996, genre="Action"))
+        for actor_id in range(1, 5):
+            Solution.addActor(Actor(actor_id=actor_id, actor_name="Actor " + str(actor_id), age=40, height=180))
+
+    def testAddMovieCast(self) -> None:
+        self.assertEqual(ReturnValue.OK, Solution.actorPlayedInMovie("Mission Impossible", 1996, 4, 100, ["Agent"]),
+                         "cast before the import")
+        cast = [(1, 1000, ["Ethan Hunt"]),
+                (2, 500, ["Luther", "Hacker"]),
+                (3, 0, ["Krieger"]),
+                (3, 300, []),
+                (4, 100, ["Agent"]),
+                (5, 100, ["Nobody"]),
+                (1, 1000, ["Ethan Hunt"]),
+                (3, 300, ["Krieger", "Krieger"]),
+                (3, 300, ["Krieger", None]),
+                (3, 300, ["Krieger"])]
+        self.assertEqual([ReturnValue.OK, ReturnValue.OK, ReturnValue.BAD_PARAMS, ReturnValue.BAD_PARAMS,
+                          ReturnValue.ALREADY_EXISTS, ReturnValue.NOT_EXISTS, ReturnValue.ALREADY_EXISTS,
+                          ReturnValue.ALREADY_EXISTS, ReturnValue.BAD_PARAMS, ReturnValue.OK],
+                         Solution.addMovieCast("Mission Impossible", 1996, cast), "per actor outcomes")
+        self.assertEqual(1900, _count("SELECT SUM(Salary) FROM Casts"), "salaries of the new cast")
+        self.assertEqual(5, _count("SELECT COUNT(*) FROM Roles"), "roles of the new cast")
+        self.assertEqual(ReturnValue.ALREADY_EXISTS,
+                         Solution.actorPlayedInMovie("Mission Impossible", 1996, 2, 500, ["Luther"]), "cast imported")
+        self.assertEqual([ReturnValue.NOT_EXISTS, ReturnValue.BAD_PARAMS],
+                         Solution.addMovieCast("Mission Impossible", 2000, [(1, 10, ["Ethan"]), (2, -1, ["Luther"])]),
+                         "unknown movie")
+
+    def testMissingValues(self) -> None:
+        members = [(None, 100, ["Agent"]), (1, None, ["Agent"]), (9, None, ["Agent"]), (None, None, [])]
+        for movie_year in (1996, None):
+            self.assertEqual([Solution.actorPlayedInMovie("Mission Impossible", movie_year, *member)
+                              for member in members],
+                             Solution.addMovieCast("Mission Impossible", movie_year, members),
+                             "the outcomes of actorPlayedInMovie")
+        self.assertEqual(ReturnValue.BAD_PARAMS, Solution.actorPlayedInMovie("Mission Impossible", 1996, None, 100,
+                                                                             ["Agent"]), "not an error")
+
+    def testBulkDeletes(self) -> None:
+        self.assertEqual(ReturnValue.OK, Solution.addMovie(Movie(movie_name="Rush Hour", year=1998, genre="Comedy")),
+                         "second movie")
+        self.assertEqual([ReturnValue.OK] * 2, Solution.addMovieCast("Rush Hour", 1998, [(1, 10, ["Lee"]),
+                                                                                          (2, 10, ["Carter"])]), "cast")
+        self.assertEqual([ReturnValue.OK, ReturnValue.NOT_EXISTS, ReturnValue.NOT_EXISTS],
+                         Solution.deleteCasts([("Rush Hour", 1998, 2), ("Rush Hour", 1998, 3),
+                                               ("Rush Hour", 1998, 2)]), "repeated cast")
+        self.assertEqual([ReturnValue.NOT_EXISTS, ReturnValue.OK, ReturnValue.OK, ReturnValue.NOT_EXISTS,
+                          ReturnValue.OK],
+                         Solution.deleteActors([9, 1, 3, 1, 4], chunk_size=2), "chunks of two")
+        self.assertEqual(0, _count("SELECT COUNT(*) FROM Roles"), "roles cascaded")
+        self.assertEqual([ReturnValue.OK, ReturnValue.NOT_EXISTS, ReturnValue.OK],
+                         Solution.deleteMovies([("Rush Hour", "1998"), ("Rush Hour", 2001),
+                                                ("Mission Impossible", 1996)]), "movies")
+        self.assertEqual(2, Solution.getActorProfile(2).getActorID(), "other actors untouched")
+
+
+def _count(query: str) -> int:
+    _, _, rows = Solution.execute_query_select(query)
+    return rows.rows[0][0]
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
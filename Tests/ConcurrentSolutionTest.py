@@ -0,0 +1,113 @@
+import threading
+import unittest
+import Utility.DBConnector as Connector
+from Business.Critic import Critic
+from ConcurrentSolution import ConcurrentSolution
+from Utility.ReturnValue import ReturnValue
+from Tests.abstractTest import AbstractTest
+
+
+class Test(AbstractTest):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.gate = threading.Event()
+
+    def tearDown(self) -> None:
+        self.gate.set()
+        Connector.DBConnector.usePool(0)
+        super().tearDown()
+
+    def requireServer(self) -> None:
+        if self.connector is not None:
+            self.skipTest("other threads do not see the rolled back test transaction")
+        if Connector.DBConnector.backend() != Connector.PRIMARY:
+            self.skipTest("embedded connections are never pooled")
+
+    def blocking(self, value=None):
+        self.assertTrue(self.gate.wait(5), "released")
+        return value
+
+    @staticmethod
+    def started(target) -> (threading.Thread, threading.Event):
+        """ runs target on a thread, the event is set once it returned """
+        done = threading.Event()
+
+        def run():
+            target()
+            done.set()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        return thread, done
+
+    def testFutures(self) -> None:
+        self.requireServer()
+        with ConcurrentSolution(max_workers=4) as solution:
+            self.assertEqual(4, Connector.DBConnector.poolSize(), "pool of its own")
+            added = solution.submitMany([('addCritic', Critic(critic_id, 'Critic %d' % critic_id))
+                                         for critic_id in range(1, 11)] + [('addCritic', Critic(1, 'Again'))])
+            self.assertEqual([ReturnValue.OK] * 10 + [ReturnValue.ALREADY_EXISTS],
+                             [future.result() for future in added], "in submit order")
+            profiles = [solution.getCriticProfile(critic_id) for critic_id in range(1, 11)]
+            self.assertEqual(['Critic %d' % critic_id for critic_id in range(1, 11)],
+                             [future.result().getName() for future in profiles], "profiles")
+        self.assertEqual(0, Connector.DBConnector.poolSize(), "its pool is closed on shutdown")
+
+    def testMaxInFlight(self) -> None:
+        with ConcurrentSolution(max_workers=1, max_in_flight=2, use_pool=False) as solution:
+            running = solution.submit(self.blocking, 1)
+            queued = solution.submit(self.blocking, 2)
+            futures = []
+            thread, done = self.started(lambda: futures.append(solution.submit(self.blocking, 3)))
+            self.assertFalse(done.wait(0.2), "a third call waits for a free slot")
+            self.gate.set()
+            thread.join(5)
+            self.assertEqual([1, 2, 3], [running.result(), queued.result(), futures[0].result()], "all done")
+
+    def testExceptions(self) -> None:
+        def fail():
+            raise ValueError('failed')
+
+        with ConcurrentSolution(max_workers=1, max_in_flight=1, use_pool=False) as solution:
+            with self.assertRaises(ValueError):
+                solution.submit(fail).result(5)
+            self.assertEqual(4, solution.submit(lambda: 4).result(5), "the failed call freed its slot")
+            with self.assertRaises(AttributeError):
+                solution.noSuchFunction()
+            with self.assertRaises(AttributeError):
+                solution.submit('_Solution__private')
+
+    def testExhaustedPoolWaits(self) -> None:
+        self.requireServer()
+        Connector.DBConnector.usePool(1)
+        first = Connector.DBConnector()
+        second = []
+        thread, done = self.started(lambda: second.append(Connector.DBConnector()))
+        self.assertFalse(done.wait(0.2), "waits for the only connection")
+        first.close()
+        thread.join(5)
+        self.assertEqual(1, second[0].execute("SELECT 1")[0], "got the returned connection")
+        second[0].close()
+
+    def testUsePoolWhileCheckedOut(self) -> None:
+        self.requireServer()
+        Connector.DBConnector.usePool(1)
+        old = Connector.DBConnector()
+        Connector.DBConnector.usePool(0)
+        unpooled = Connector.DBConnector()
+        self.assertEqual(1, unpooled.execute("SELECT 1")[0], "connects without a pool")
+        unpooled.close()
+        Connector.DBConnector.usePool(1)
+        old.close()
+        first = Connector.DBConnector()
+        thread, done = self.started(lambda: Connector.DBConnector().close())
+        self.assertFalse(done.wait(0.2), "closing the old connection left the new pool at one connection")
+        first.close()
+        thread.join(5)
+        self.assertTrue(done.is_set(), "connected once it was returned")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
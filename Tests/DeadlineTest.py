@@ -0,0 +1,53 @@
+import time
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from Utility.ReturnValue import ReturnValue
+from Tests.abstractTest import AbstractTest
+
+from Business.Critic import Critic
+from Business.Movie import Movie
+
+
+class Test(AbstractTest):
+
+    def tearDown(self) -> None:
+        Solution.DEADLINES.clear()
+        super().tearDown()
+
+    def testExpiredDeadline(self) -> None:
+        with Connector.DBConnector.deadline(0):
+            self.assertEqual(ReturnValue.ERROR, Solution.addCritic(Critic(critic_id=1, critic_name="John")),
+                             "no time left")
+            self.assertEqual([], Solution.getFanCritics(), "empty result")
+        self.assertEqual(ReturnValue.OK, Solution.addCritic(Critic(critic_id=1, critic_name="John")), "no deadline")
+
+    @unittest.skipIf(Connector.DBConnector.backend() == Connector.SQLITE, "LOCK TABLE is PostgreSQL only")
+    def testEndpointDeadline(self) -> None:
+        self.assertEqual(ReturnValue.OK, Solution.addMovie(Movie(movie_name="Mission Impossible", year=1996,
+                                                                 genre="Action")), "movie")
+        Solution.addCritic(Critic(critic_id=1, critic_name="John"))
+        Solution.DEADLINES.update({'averageRating': 0.2, 'criticRatedMovie': 0.2})
+        # the blocking transaction needs a connection of its own, also in rollback isolation
+        Connector.DBConnector.unbind()
+        try:
+            blocker = Connector.DBConnector()
+            blocker.cursor.execute("LOCK TABLE Ratings IN ACCESS EXCLUSIVE MODE NOWAIT")
+        finally:
+            if self.connector is not None:
+                Connector.DBConnector.bind(self.connector.connection)
+        try:
+            start = time.monotonic()
+            self.assertEqual(ReturnValue.ERROR, Solution.criticRatedMovie("Mission Impossible", 1996, 1, 3),
+                             "waits for the lock until the deadline")
+            self.assertEqual(0, Solution.averageRating("Mission Impossible", 1996), "read blocked too")
+            self.assertLess(time.monotonic() - start, 2, "both calls gave up at their deadline")
+        finally:
+            blocker.rollback()
+            blocker.close()
+        self.assertEqual(ReturnValue.OK, Solution.criticRatedMovie("Mission Impossible", 1996, 1, 3), "lock released")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,85 @@
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from Utility.ExistenceIndex import BloomFilter, ExistenceIndex
+from Utility.ReturnValue import ReturnValue
+from Tests.abstractTest import AbstractTest
+
+from Business.Actor import Actor
+from Business.Critic import Critic
+from Business.Movie import Movie
+from Business.Studio import Studio
+
+
+class Test(AbstractTest):
+
+    def setUp(self) -> None:
+        super().setUp()
+        Solution.addMovie(Movie(movie_name="Top Gun", year=1986, genre="Action"))
+        Solution.addActor(Actor(actor_id=1, actor_name="Tom Cruise", age=60, height=170))
+        Solution.addCritic(Critic(critic_id=1, critic_name="John"))
+        Solution.addStudio(Studio(studio_id=1, studio_name="Paramount"))
+        # built explicitly, the lazy build waits for a call outside of a transaction
+        Solution.EXISTENCE_INDEX = ExistenceIndex().build()
+        self.queries = []
+        Connector.DBConnector.addQueryListener(self.queries.append)
+
+    def tearDown(self) -> None:
+        Connector.DBConnector.removeQueryListener(self.queries.append)
+        Solution.EXISTENCE_INDEX = None
+        super().tearDown()
+
+    def testBloomFilter(self) -> None:
+        bloom = BloomFilter(1000, 0.01)
+        for key in range(1000):
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in range(1000)), "no false negatives")
+        false_positives = sum(key in bloom for key in range(1000, 11000))
+        self.assertLess(false_positives, 300, "about 1% false positives")
+
+    def testMissingWithoutQuery(self) -> None:
+        self.assertEqual(ReturnValue.NOT_EXISTS, Solution.criticRatedMovie("Top Gun", 1986, 2, 5), "no critic")
+        self.assertEqual(ReturnValue.NOT_EXISTS, Solution.criticRatedMovie("Cocktail", 1988, 1, 5), "no movie")
+        self.assertEqual(ReturnValue.NOT_EXISTS, Solution.actorPlayedInMovie("Top Gun", 1986, 2, 10, ["Iceman"]),
+                         "no actor")
+        self.assertEqual(ReturnValue.NOT_EXISTS, Solution.studioProducedMovie(1, "Cocktail", 1988, 1, 1), "no movie")
+        self.assertEqual([], self.queries, "answered by the index")
+        summary = Solution.EXISTENCE_INDEX.summary()
+        self.assertEqual(1, summary['critic']['missing'])
+        self.assertEqual(2, summary['movie']['missing'])
+
+    def testExistingKeysReachDatabase(self) -> None:
+        self.assertEqual(ReturnValue.OK, Solution.criticRatedMovie("Top Gun", 1986, 1, 5))
+        self.assertEqual(ReturnValue.OK, Solution.actorPlayedInMovie("Top Gun", 1986, 1, 10, ["Maverick"]))
+        self.assertEqual(ReturnValue.OK, Solution.studioProducedMovie(1, "Top Gun", 1986, 1, 1))
+        self.assertEqual(ReturnValue.ALREADY_EXISTS, Solution.criticRatedMovie("Top Gun", 1986, 1, 4))
+
+    def testProducedFirst(self) -> None:
+        self.assertEqual(ReturnValue.OK, Solution.studioProducedMovie(1, "Top Gun", 1986, 1, 1))
+        self.assertEqual(ReturnValue.ALREADY_EXISTS, Solution.studioProducedMovie(2, "Top Gun", 1986, 1, 1),
+                         "the movie is produced already, whether or not the studio exists")
+        self.assertEqual(ReturnValue.OK, Solution.studioDidntProduceMovie(1, "Top Gun", 1986))
+        self.assertEqual(ReturnValue.NOT_EXISTS, Solution.studioProducedMovie(2, "Top Gun", 1986, 1, 1), "no studio")
+
+    def testBadParamsFirst(self) -> None:
+        self.assertEqual(ReturnValue.BAD_PARAMS, Solution.criticRatedMovie("Cocktail", 1988, 1, 6), "bad rating")
+        self.assertEqual(ReturnValue.BAD_PARAMS, Solution.actorPlayedInMovie("Top Gun", 1986, 2, 0, ["Iceman"]),
+                         "bad salary")
+        self.assertEqual(ReturnValue.BAD_PARAMS, Solution.studioProducedMovie(2, "Top Gun", 1986, -1, 1),
+                         "bad budget")
+
+    def testAddsAreSeen(self) -> None:
+        Solution.addMovie(Movie(movie_name="Cocktail", year=1988, genre="Drama"))
+        Solution.addCritic(Critic(critic_id=2, critic_name="Jane"))
+        self.assertEqual(ReturnValue.OK, Solution.criticRatedMovie("Cocktail", 1988, 2, 4))
+
+    def testRebuildSeesOtherWrites(self) -> None:
+        Solution.execute_query_insert("INSERT INTO Critic (ID, Name) VALUES (2, 'Jane');")
+        self.assertEqual(ReturnValue.NOT_EXISTS, Solution.criticRatedMovie("Top Gun", 1986, 2, 5),
+                         "written around Solution, unknown until the next build")
+        Solution.EXISTENCE_INDEX.build()
+        self.assertEqual(ReturnValue.OK, Solution.criticRatedMovie("Top Gun", 1986, 2, 5))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,113 @@
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+import time
+import unittest
+from typing import List
+
+import Utility.DBConnector as Connector
+
+'''
+    Runs the test suite over several worker processes. Every worker creates its own schema, binds
+    DBConnector to it and drops it when done, so workers never see each other's tables.
+    usage: python -m Tests.ParallelRunner --workers 4 main_test Tests.SimpleTest
+'''
+
+DEFAULT_MODULES = ['main_test', 'Tests.SimpleTest', 'Tests.PlanTest', 'Tests.RatingIngestionTest', 'Tests.BulkTest',
+                   'Tests.SoftDeleteTest', 'Tests.DeadlineTest', 'Tests.ProfilerTest',
+                   'Tests.SQLiteBackendTest', 'Tests.SnapshotAnalyticsTest',
+                   'Tests.ApproximateAnalyticsTest', 'Tests.ShardTest',
+                   'Tests.SingleFlightTest', 'Tests.ExistenceIndexTest', 'Tests.RatingsMatrixTest',
+                   'Tests.ReportBundleTest', 'Tests.SearchTest', 'Tests.BenchmarkTest',
+                   'Tests.RoutingTest', 'Tests.ConcurrentSolutionTest',
+                   'Tests.SchemaManagerTest', 'Tests.QueryTagTest']
+
+
+def _flatten(suite) -> List[unittest.TestCase]:
+    tests = []
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            tests.extend(_flatten(test))
+        else:
+            tests.append(test)
+    return tests
+
+
+def collectTestIds(modules: List[str]) -> List[str]:
+    loader = unittest.TestLoader()
+    return [test.id() for module in modules for test in _flatten(loader.loadTestsFromName(module))]
+
+
+def _execute(query: str) -> None:
+    conn = Connector.DBConnector()
+    try:
+        conn.execute(query)
+    finally:
+        conn.close()
+
+
+def runWorker(arguments) -> dict:
+    worker, test_ids, verbosity = arguments
+    schema = 'test_worker_' + str(os.getpid()) + '_' + str(worker)
+    Connector.DBConnector.useSchema(None)
+    _execute('CREATE SCHEMA IF NOT EXISTS ' + schema)
+    Connector.DBConnector.useSchema(schema)
+    stream = io.StringIO()
+    try:
+        suite = unittest.TestLoader().loadTestsFromNames(test_ids)
+        result = unittest.TextTestRunner(stream=stream, verbosity=verbosity).run(suite)
+    finally:
+        Connector.DBConnector.useSchema(None)
+        _execute('DROP SCHEMA IF EXISTS ' + schema + ' CASCADE')
+    return {'worker': worker,
+            'ran': result.testsRun,
+            'failures': [(test.id(), trace) for test, trace in result.failures],
+            'errors': [(test.id(), trace) for test, trace in result.errors],
+            'skipped': len(result.skipped),
+            'output': stream.getvalue()}
+
+
+def runParallel(modules: List[str], workers: int, verbosity: int = 1) -> List[dict]:
+    test_ids = collectTestIds(modules)
+    workers = max(1, min(workers, len(test_ids)))
+    # round robin keeps neighbouring (often similarly sized) tests on different workers
+    shares = [(worker, test_ids[worker::workers], verbosity) for worker in range(workers)]
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(runWorker, shares)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Run the tests over several processes, one schema per process')
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--verbosity', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = runParallel(args.modules, args.workers, args.verbosity)
+    elapsed = time.perf_counter() - start
+
+    ran = sum(result['ran'] for result in results)
+    failures = [failure for result in results for failure in result['failures']]
+    errors = [error for result in results for error in result['errors']]
+    if args.verbosity > 1:
+        for result in results:
+            print('--- worker %d ---' % result['worker'])
+            print(result['output'])
+    for kind, problems in (('FAIL', failures), ('ERROR', errors)):
+        for test_id, trace in problems:
+            print('=' * 70)
+            print(kind + ': ' + test_id)
+            print(trace)
+    print('Ran %d tests on %d workers in %.3fs' % (ran, len(results), elapsed))
+    if failures or errors:
+        print('FAILED (failures=%d, errors=%d)' % (len(failures), len(errors)))
+        return 1
+    print('OK')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
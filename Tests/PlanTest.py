@@ -0,0 +1,43 @@
+import os
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from Benchmark import PlanCheck
+from Benchmark.DataGenerator import DataGenerator, ScaleFactor, loadDataset
+
+'''
+    Guards the query plans of the Solution functions: loads the seeded dataset of the recorded snapshot
+    and fails when a statement stops using an index or its estimated cost grows too much.
+    after an intended plan change, record a new snapshot with: python -m Benchmark.PlanCheck --record
+'''
+
+
+class PlanTest(unittest.TestCase):
+    snapshot = None
+    current = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        if not os.path.exists(PlanCheck.DEFAULT_SNAPSHOT):
+            raise unittest.SkipTest('no plan snapshot recorded')
+        if Connector.DBConnector.backend() != Connector.PRIMARY:
+            raise unittest.SkipTest('the snapshot holds PostgreSQL plans')
+        cls.snapshot = PlanCheck.loadSnapshot()
+        scale = ScaleFactor(**cls.snapshot['scale'])
+        loadDataset(DataGenerator(scale, cls.snapshot['seed']))
+        cls.current = PlanCheck.capturePlans(scale, cls.snapshot['seed'])
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        Solution.dropTables()
+
+    def testEveryFunctionHasASnapshot(self) -> None:
+        self.assertEqual(sorted(self.snapshot['plans']), sorted(self.current['plans']), "re-record the snapshot")
+
+    def testNoPlanRegressions(self) -> None:
+        self.assertEqual({}, PlanCheck.comparePlans(self.snapshot, self.current), "plan regressions")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,95 @@
+import cProfile
+import os
+import pstats
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import Solution
+import Utility.DBConnector as Connector
+from Utility.Profiler import profiling
+from Utility.ReturnValue import ReturnValue
+from Tests.abstractTest import AbstractTest
+
+from Business.Critic import Critic
+
+
+class Test(AbstractTest):
+
+    def testProfiling(self) -> None:
+        original = Solution.getCriticProfile
+        path = os.path.join(tempfile.mkdtemp(), 'solution.prof')
+        with profiling(path, sample_every=2) as profiler:
+            self.assertIsNot(original, Solution.getCriticProfile, "wrapped")
+            for critic_id in range(1, 4):
+                self.assertEqual(ReturnValue.OK, Solution.addCritic(Critic(critic_id=critic_id, critic_name="John")),
+                                 "wrapped call keeps its result")
+            self.assertEqual("John", Solution.getCriticProfile(1).getName(), "read")
+        self.assertIs(original, Solution.getCriticProfile, "restored")
+
+        summary = profiler.summary()
+        self.assertEqual(3, summary['addCritic']['calls'], "calls")
+        self.assertEqual(2, summary['addCritic']['sampled'], "every second call traced")
+        self.assertGreater(summary['addCritic']['cpu_s'], 0, "cpu time")
+        self.assertEqual(1, summary['getCriticProfile']['calls'], "calls")
+        self.assertNotIn('execute_query_insert', summary, "helpers are part of the caller's profile")
+        self.assertGreater(pstats.Stats(path).total_calls, 0, "pstats dump")
+        with open(path + '.txt') as file:
+            self.assertIn('getCriticProfile', file.read(), "report")
+
+    def testCallerUnchanged(self) -> None:
+        queries = []
+        Connector.DBConnector.addQueryListener(queries.append)
+        try:
+            with profiling():
+                self.assertEqual(ReturnValue.OK, Solution.addCritic(Critic(critic_id=1, critic_name="John")))
+                self.assertTrue(queries[-1].startswith('/* solution:addCritic */'), "tagged with the API function")
+                Solution.DEADLINES['addCritic'] = 0
+                try:
+                    self.assertEqual(ReturnValue.ERROR, Solution.addCritic(Critic(critic_id=2, critic_name="Jane")),
+                                     "the deadline of the API function holds")
+                finally:
+                    Solution.DEADLINES.clear()
+        finally:
+            Connector.DBConnector.removeQueryListener(queries.append)
+
+
+    def testThreads(self) -> None:
+        if self.connector is not None:
+            self.skipTest('the rows of the test transaction are invisible to other threads')
+        results = []
+
+        def client(first_id: int) -> None:
+            for critic_id in range(first_id, first_id + 5):
+                results.append((Solution.addCritic(Critic(critic_id=critic_id, critic_name="John")),
+                                Solution.getCriticProfile(critic_id).getName()))
+        with profiling() as profiler:
+            threads = [threading.Thread(target=client, args=(first_id,)) for first_id in range(1, 21, 5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual([(ReturnValue.OK, "John")] * 20, results, "every call of every thread went through")
+        summary = profiler.summary()
+        self.assertEqual(20, summary['addCritic']['calls'])
+        self.assertEqual(0, summary['addCritic']['errors'])
+
+    def testProfilerBusy(self) -> None:
+        class Busy(cProfile.Profile):
+            # how Python 3.12+ answers a second thread enabling a profiler
+            def enable(self, *args, **kwargs):
+                raise ValueError('Another profiling tool is already active')
+
+        with mock.patch.object(cProfile, 'Profile', Busy), profiling() as profiler:
+            for critic_id in range(1, 4):
+                self.assertEqual(ReturnValue.OK, Solution.addCritic(Critic(critic_id=critic_id, critic_name="John")),
+                                 "the call still runs")
+        summary = profiler.summary()['addCritic']
+        self.assertEqual(3, summary['calls'], "every call measured, the thread is not left active")
+        self.assertEqual(3, summary['unprofiled'])
+        self.assertGreater(summary['wall_s'], 0, "timed")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
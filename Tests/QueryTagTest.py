@@ -0,0 +1,63 @@
+import unittest
+import Utility.DBConnector as Connector
+from Benchmark import QueryStats
+
+
+class Test(unittest.TestCase):
+
+    def testSplitStatements(self) -> None:
+        split = Connector.splitStatements
+        self.assertEqual(["SELECT 1", "SELECT 2"], split("SELECT 1; SELECT 2;"))
+        self.assertEqual(["SELECT 'a;b', 'it''s;'", 'SELECT "x;y" FROM t'],
+                         split("SELECT 'a;b', 'it''s;'; SELECT \"x;y\" FROM t"), "quotes")
+        self.assertEqual(["-- one; two\nSELECT 1", "SELECT /* ; */ 2"],
+                         split("-- one; two\nSELECT 1; SELECT /* ; */ 2; -- trailing; comment"), "comments")
+        self.assertEqual(["DO $$ BEGIN PERFORM 1; END $$", "DO $body$ BEGIN RAISE NOTICE '$$;'; END $body$"],
+                         split("DO $$ BEGIN PERFORM 1; END $$; DO $body$ BEGIN RAISE NOTICE '$$;'; END $body$;"),
+                         "dollar quoted bodies")
+        self.assertEqual([], split(" ; -- nothing\n;"), "no statements")
+
+    def testTagQuery(self) -> None:
+        self.assertEqual("SELECT 1", Connector.tagQuery("SELECT 1", None), "untagged")
+        self.assertEqual("/* solution:f */ SELECT 1; /* solution:f */ SELECT 2;",
+                         Connector.tagQuery("SELECT 1;SELECT 2", 'f'), "every statement")
+        self.assertEqual("/* solution:f */ SELECT 1 -- one\n; /* solution:f */ SELECT 2;",
+                         Connector.tagQuery("SELECT 1 -- one\n; SELECT 2", 'f'), "not ended inside a comment")
+
+    def testTaggedQueryRuns(self) -> None:
+        query = "SELECT 1 AS a; -- comment; with a semicolon\n" \
+                "DO $$ BEGIN PERFORM 1; END $$; SELECT ';' AS b -- last"
+        if Connector.DBConnector.backend() != Connector.PRIMARY:
+            query = "SELECT 1 AS a; -- comment; with a semicolon\nSELECT ';' AS b -- last"
+        conn = Connector.DBConnector()
+        try:
+            _, result = conn.execute(Connector.tagQuery(query, 'f'))
+        finally:
+            conn.close()
+        self.assertEqual(';', result[0]['b'], "the result of the last statement")
+
+    def testAggregateByFunction(self) -> None:
+        statements = [
+            {'query': '/* solution:addMovie */ INSERT INTO Movie VALUES ($1)', 'calls': 4, 'total_time': 8.0,
+             'plan_time': 1.0, 'rows': 4, 'shared_blks_hit': 30, 'shared_blks_read': 10},
+            {'query': '/* solution:addMovie */ DELETE FROM Movie WHERE Deleted', 'calls': 4, 'total_time': 2.0,
+             'plan_time': 0.5, 'rows': 0, 'shared_blks_hit': 10, 'shared_blks_read': 0},
+            {'query': '/* solution:getMovieProfile */ SELECT * FROM LiveMovie', 'calls': 10, 'total_time': 20.0,
+             'plan_time': 2.0, 'rows': 10, 'shared_blks_hit': 0, 'shared_blks_read': 0},
+            {'query': 'SELECT 1', 'calls': 1, 'total_time': 100.0, 'plan_time': 0.0, 'rows': 1,
+             'shared_blks_hit': None, 'shared_blks_read': None},
+        ]
+        report = QueryStats.aggregateByFunction(statements)
+        self.assertEqual(['getMovieProfile', 'addMovie'], [row['function'] for row in report], "by total time")
+        add = report[1]
+        self.assertEqual((2, 8, 10.0, 1.5, 1.25), (add['statements'], add['calls'], add['total_time'],
+                                                  add['plan_time'], add['mean_time']), "summed")
+        self.assertEqual(0.8, add['hit_ratio'])
+        self.assertEqual(1.0, report[0]['hit_ratio'], "no blocks read")
+        self.assertEqual([QueryStats.UNTAGGED, 'getMovieProfile', 'addMovie'],
+                         [row['function'] for row in QueryStats.aggregateByFunction(statements, True)], "untagged")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,58 @@
+import unittest
+import Solution
+import RatingIngestion
+from Utility.ReturnValue import ReturnValue
+from Tests.abstractTest import AbstractTest
+
+from Business.Critic import Critic
+from Business.Movie import Movie
+
+
+class Test(AbstractTest):
+
+    def setUp(self) -> None:
+        super().setUp()
+        Solution.addMovie(Movie(movie_name="Mission Impossible", year=1996, genre="Action"))
+        Solution.addCritic(Critic(critic_id=1, critic_name="John"))
+        Solution.addCritic(Critic(critic_id=2, critic_name="Bob"))
+
+    def testBatchOutcomes(self) -> None:
+        events = [("Mission Impossible", 1996, 1, 3),
+                  ("Mission Impossible", 1996, 1, 4),
+                  ("Mission Impossible", 1996, 2, 9),
+                  ("Mission Impossible", 1997, 2, 3),
+                  ("Mission Impossible", 1996, 3, 3),
+                  (None, 1996, 2, 3),
+                  ("Mission Impossible", 1996, 2, 5)]
+        self.assertEqual([ReturnValue.OK, ReturnValue.ALREADY_EXISTS, ReturnValue.BAD_PARAMS, ReturnValue.NOT_EXISTS,
+                          ReturnValue.NOT_EXISTS, ReturnValue.BAD_PARAMS, ReturnValue.OK],
+                         RatingIngestion.writeRatings(events), "same outcomes as criticRatedMovie one by one")
+        self.assertEqual([ReturnValue.ALREADY_EXISTS], RatingIngestion.writeRatings(events[:1]), "already rated")
+        self.assertEqual(4.0, Solution.averageRating("Mission Impossible", 1996), "first ratings kept")
+
+    def testUpsert(self) -> None:
+        events = [("Mission Impossible", 1996, 1, 1), ("Mission Impossible", 1996, 1, 2),
+                  ("Mission Impossible", 1996, 2, 4)]
+        self.assertEqual([ReturnValue.OK] * 3, RatingIngestion.writeRatings(events, upsert=True), "upserted")
+        self.assertEqual(3.0, Solution.averageRating("Mission Impossible", 1996), "last rating of a critic wins")
+        self.assertEqual([ReturnValue.OK, ReturnValue.NOT_EXISTS],
+                         RatingIngestion.writeRatings([("Mission Impossible", 1996, 1, 4),
+                                                       ("Mission Impossible", 1996, 3, 4)], upsert=True), "replaced")
+        self.assertEqual(4.0, Solution.averageRating("Mission Impossible", 1996), "rating replaced")
+
+    def testPipeline(self) -> None:
+        with RatingIngestion.RatingIngestion(max_batch=2, max_delay=0.01) as ingestion:
+            futures = ingestion.submitMany([("Mission Impossible", 1996, 1, 3), ("Mission Impossible", 1996, 2, 5),
+                                            ("Mission Impossible", 1996, 1, 4)])
+            upsert = ingestion.submit("Mission Impossible", 1996, 1, 1, upsert=True)
+            ingestion.flush()
+            self.assertEqual([ReturnValue.OK, ReturnValue.OK, ReturnValue.ALREADY_EXISTS],
+                             [future.result() for future in futures], "insert mode")
+            self.assertEqual(ReturnValue.OK, upsert.result(), "upsert mode")
+            self.assertEqual(4, ingestion.stats()['events'], "every event written")
+        self.assertEqual(3.0, Solution.averageRating("Mission Impossible", 1996), "ratings 1 and 5")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
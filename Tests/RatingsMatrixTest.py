@@ -0,0 +1,79 @@
+import io
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from RatingsMatrix import RatingsMatrix, exportRatings, _EXPORT
+from Benchmark.DataGenerator import DataGenerator, ScaleFactor, loadDataset
+from Tests.abstractTest import AbstractTest
+
+from Business.Critic import Critic
+from Business.Movie import Movie
+
+
+class Test(AbstractTest):
+
+    def setUp(self) -> None:
+        super().setUp()
+        loadDataset(DataGenerator(ScaleFactor(critics=6, actors=10, movies=30, studios=4, ratings_per_movie=3,
+                                              cast_size=2), seed=5), recreate=False)
+        # quotes, separators and line breaks must survive both formats
+        Solution.addMovie(Movie(movie_name='Say "Hi",\nBye', year=1999, genre="Drama"))
+        Solution.addCritic(Critic(critic_id=1000, critic_name="Late"))
+        Solution.criticRatedMovie('Say "Hi",\nBye', 1999, 1000, 4)
+
+    def expected(self) -> dict:
+        _, _, result = Solution.execute_query_select(_EXPORT)
+        ratings = {}
+        for critic_id, name, year, rating in result.rows:
+            ratings.setdefault(critic_id, {})[(name, year)] = rating
+        return ratings
+
+    def assertMatches(self, expected: dict, matrix: RatingsMatrix) -> None:
+        self.assertEqual(sorted(expected), list(matrix.criticIds), "a row per critic, in id order")
+        self.assertEqual(sorted({movie for row in expected.values() for movie in row}), matrix.movies,
+                         "a column per movie, in key order")
+        self.assertEqual(sum(len(row) for row in expected.values()), matrix.nnz)
+        for critic_id, row in expected.items():
+            self.assertEqual(row, matrix.row(critic_id), critic_id)
+            start, end = matrix.indptr[matrix.criticIndex[critic_id]:][:2]
+            self.assertEqual(sorted(matrix.indices[start:end]), list(matrix.indices[start:end]), "sorted columns")
+        dense = matrix.toDense()
+        self.assertEqual(matrix.shape, dense.shape)
+        self.assertEqual(4, dense[matrix.criticIndex[1000], matrix.movieIndex[('Say "Hi",\nBye', 1999)]])
+
+    def testFormats(self) -> None:
+        expected = self.expected()
+        self.assertNotEqual({}, expected)
+        for format in ('binary', 'csv'):
+            self.assertMatches(expected, exportRatings(format))
+
+    def testSplitWrites(self) -> None:
+        if Connector.DBConnector.backend() != Connector.PRIMARY:
+            self.skipTest('COPY TO needs PostgreSQL')
+        expected = self.expected()
+        for format in ('binary', 'csv'):
+            copied = io.BytesIO()
+            conn = Connector.DBConnector()
+            try:
+                conn.cursor.copy_expert('COPY (%s) TO STDOUT (FORMAT %s)' % (_EXPORT, format), copied)
+            finally:
+                conn.rollback()
+                conn.close()
+            for chunk_size in (1, 7):
+                copied.seek(0)
+                self.assertMatches(expected, RatingsMatrix.fromCopy(copied, format, chunk_size=chunk_size))
+
+    def testEmpty(self) -> None:
+        Solution.execute_query_delete("DELETE FROM Ratings;")
+        matrix = exportRatings()
+        self.assertEqual((0, 0), matrix.shape)
+        self.assertEqual([0], list(matrix.indptr))
+        self.assertEqual({}, matrix.row(1000))
+
+    def testUnknownFormat(self) -> None:
+        with self.assertRaises(ValueError):
+            exportRatings('parquet')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
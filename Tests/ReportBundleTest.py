@@ -0,0 +1,70 @@
+import threading
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from ReportBundle import REPORT_FUNCTIONS, consistentSnapshot, runReport
+from Benchmark.DataGenerator import DataGenerator, ScaleFactor, loadDataset
+from Tests.abstractTest import AbstractTest
+
+from Business.Movie import Movie
+
+
+class Test(AbstractTest):
+
+    def setUp(self) -> None:
+        super().setUp()
+        loadDataset(DataGenerator(ScaleFactor(critics=5, actors=20, movies=25, studios=5, ratings_per_movie=3,
+                                              cast_size=3), seed=7), recreate=False)
+
+    def requireSharedSnapshots(self) -> None:
+        if Connector.DBConnector.backend() != Connector.PRIMARY:
+            self.skipTest('snapshots are shared by PostgreSQL only')
+        if self.connector is not None:
+            self.skipTest('the rows of the test transaction are invisible to other connections')
+
+    def inOtherThread(self, function):
+        """ runs function on a thread of its own, outside of any snapshot, and returns its result """
+        result = []
+        thread = threading.Thread(target=lambda: result.append(function()))
+        thread.start()
+        thread.join()
+        return result[0]
+
+    def testSameResults(self) -> None:
+        expected = {name: getattr(Solution, name)() for name in REPORT_FUNCTIONS}
+        self.assertEqual(expected, runReport())
+        self.assertEqual(expected, runReport(workers=3), "the same over several connections")
+        self.assertEqual(REPORT_FUNCTIONS, list(runReport(workers=2)), "in the given order")
+        name, year = Solution.execute_query_select("SELECT Name, Year FROM LiveMovie")[2].rows[0]
+        calls = ['getFanCritics', ('averageRating', name, year)]
+        self.assertEqual({'getFanCritics': Solution.getFanCritics(),
+                          ('averageRating', name, year): Solution.averageRating(name, year)},
+                         runReport(calls, workers=2), "calls with arguments")
+
+    def testOneSnapshot(self) -> None:
+        self.requireSharedSnapshots()
+        with consistentSnapshot():
+            before = Solution.franchiseRevenue()
+            self.inOtherThread(lambda: Solution.addMovie(Movie(movie_name="Zulu", year=1999, genre="Drama")))
+            self.assertEqual(before, Solution.franchiseRevenue(), "a write committed meanwhile is not seen")
+        self.assertEqual(len(before) + 1, len(Solution.franchiseRevenue()), "seen after the snapshot")
+
+    def testExportedSnapshot(self) -> None:
+        self.requireSharedSnapshots()
+        with consistentSnapshot(export=True) as snapshot_id:
+            before = Solution.franchiseRevenue()
+            self.inOtherThread(lambda: Solution.addMovie(Movie(movie_name="Zulu", year=1999, genre="Drama")))
+
+            def joined():
+                with consistentSnapshot(snapshot_id=snapshot_id):
+                    return Solution.franchiseRevenue()
+            self.assertEqual(before, self.inOtherThread(joined), "another connection reads the same snapshot")
+            self.assertNotEqual(before, self.inOtherThread(Solution.franchiseRevenue))
+
+    def testOnlyReads(self) -> None:
+        with self.assertRaises(ValueError):
+            runReport(['franchiseRevenue', 'clearTables'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
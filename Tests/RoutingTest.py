@@ -0,0 +1,86 @@
+import os
+import tempfile
+import time
+import unittest
+import Utility.DBConnector as Connector
+
+
+@unittest.skipIf(Connector.DBConnector.backend() != Connector.PRIMARY, "replicas are PostgreSQL databases")
+class Test(unittest.TestCase):
+    """ read routing over two replicas that are the test database itself, told apart by the section a
+    connection was made to """
+
+    def setUp(self) -> None:
+        if Connector.DBConnector.boundConnection() is not None:
+            self.skipTest("a bound connection is never routed")
+        self.params = Connector.DBConnector.connectParams()
+        self.configure('replica0', 'replica1')
+
+    def tearDown(self) -> None:
+        Connector.DBConnector.reloadConfig()
+
+    def configure(self, *replicas: str, **routing: str) -> None:
+        Connector.DBConnector.reloadConfig()
+        for replica in replicas:
+            Connector.DBConnector.configure(replica, self.params)
+        Connector.DBConnector.configure('routing', routing)
+
+    @staticmethod
+    def target(readOnly: bool = True) -> str:
+        conn = Connector.DBConnector(readOnly=readOnly)
+        try:
+            conn.execute("SELECT 1")
+            return conn.target
+        finally:
+            conn.close()
+
+    def testRoundRobin(self) -> None:
+        targets = [self.target() for _ in range(6)]
+        self.assertEqual({'replica0', 'replica1'}, set(targets), "both replicas read from")
+        self.assertTrue(all(first != second for first, second in zip(targets, targets[1:])), targets)
+        self.assertEqual(Connector.PRIMARY, self.target(readOnly=False), "writes go to the primary")
+
+    def testLeastLoaded(self) -> None:
+        self.configure('replica0', 'replica1', strategy='least_loaded')
+        first = Connector.DBConnector(readOnly=True)
+        second = Connector.DBConnector(readOnly=True)
+        try:
+            self.assertEqual({'replica0', 'replica1'}, {first.target, second.target}, "one read on each")
+            second.close()
+            third = Connector.DBConnector(readOnly=True)
+            self.assertEqual(second.target, third.target, "the idle replica")
+            third.close()
+        finally:
+            first.close()
+
+    def testFallback(self) -> None:
+        self.configure('replica0', replica_retry='0.2')
+        Connector.DBConnector.configure('replica0', dict(self.params, port='1'))
+        self.assertEqual(Connector.PRIMARY, self.target(), "unavailable replica, read from the primary")
+        Connector.DBConnector.configure('replica0', self.params)
+        self.assertEqual(Connector.PRIMARY, self.target(), "marked down, not tried again")
+        time.sleep(0.3)
+        self.assertEqual('replica0', self.target(), "tried again after replica_retry")
+
+    def testReadYourWrites(self) -> None:
+        self.configure('replica0', read_your_writes='60')
+        self.target(readOnly=False)
+        self.assertEqual(Connector.PRIMARY, self.target(), "wrote within the window")
+        self.configure('replica0', read_your_writes='0')
+        self.assertEqual('replica0', self.target(), "no window")
+
+    def testMissingConfigIsNotCached(self) -> None:
+        Connector.DBConnector.reloadConfig()
+        directory = os.getcwd()
+        with tempfile.TemporaryDirectory() as empty:
+            os.chdir(empty)
+            try:
+                self.assertEqual([], Connector.DBConnector.shards(), "no database.ini")
+            finally:
+                os.chdir(directory)
+        self.assertEqual(self.params, Connector.DBConnector.connectParams(), "found once it is there")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
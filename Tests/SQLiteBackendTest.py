@@ -0,0 +1,68 @@
+import sqlite3
+import unittest
+from psycopg2 import sql
+
+import Utility.SQLiteBackend as SQLiteBackend
+from Utility.Exceptions import DatabaseException
+
+'''
+    Translation of the PostgreSQL statements for the embedded backend, against a private in-memory database.
+    The API tests run on it with DB_BACKEND=sqlite.
+'''
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.connection = SQLiteBackend.Connection(':memory:')
+        self.cursor = self.connection.cursor()
+        self.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS Movie(Name TEXT NOT NULL, Year INTEGER NOT NULL, PRIMARY KEY(Name, Year),
+                                             Genre TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS Critic(ID INTEGER PRIMARY KEY, Name TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS Ratings(MovieName TEXT NOT NULL, MovieYear INTEGER NOT NULL,
+                                               CriticID INTEGER NOT NULL REFERENCES Critic(ID) ON DELETE CASCADE,
+                                               FOREIGN KEY(MovieName, MovieYear) REFERENCES Movie ON DELETE CASCADE);
+            CREATE OR REPLACE VIEW LiveMovie AS SELECT Name, Year, Genre FROM Movie WHERE Year > 2000;
+            INSERT INTO Movie VALUES ('Old', 1990, 'Drama'), ('New', 2010, 'Drama'), ('It''s', 2011, 'Horror');
+            INSERT INTO Critic VALUES (1, 'John');
+            INSERT INTO Ratings VALUES ('New', 2010, 1), ('Old', 1990, 1);
+            """)
+
+    def tearDown(self) -> None:
+        self.connection.close()
+
+    def rows(self, query) -> list:
+        self.cursor.execute(query)
+        return self.cursor.fetchall()
+
+    def testTranslation(self) -> None:
+        self.assertEqual([(2,)], self.rows("SELECT count(*) FROM Movie WHERE Year = ANY('[2010, 2011]'::INTEGER[])"))
+        self.assertEqual([("It's",)], self.rows(sql.SQL("SELECT Name FROM Movie WHERE (Name, Year) IN "
+                                                         "(SELECT * FROM unnest({}::TEXT[], {}::INTEGER[]))").format(
+            sql.Literal(["It's", 'Old']), sql.Literal([2011, 2011]))), "unnest zips the arrays")
+        self.cursor.execute("SELECT AVG(Year) FROM Movie")
+        self.assertEqual('avg', self.cursor.description[0].name, "named like PostgreSQL names it")
+        self.assertEqual([(0.5,)], self.rows("SELECT Cast(1 AS DECIMAL) / Cast(2 AS DECIMAL)"))
+
+        self.cursor.execute("DELETE FROM LiveMovie WHERE Genre = 'Drama' RETURNING Name")
+        self.assertEqual([('New',)], self.cursor.fetchall(), "a view deletes the rows of its table it shows")
+        self.assertEqual([('Old', 1990, 1)], self.rows("SELECT * FROM Ratings"), "cascaded")
+
+        self.cursor.execute("DROP TABLE IF EXISTS Critic CASCADE; DROP TABLE IF EXISTS Movie CASCADE;"
+                            "DROP FUNCTION IF EXISTS Nothing CASCADE;")
+        self.assertEqual([], self.rows("SELECT name FROM sqlite_master"), "dependent views and tables dropped")
+
+    def testConstraintViolations(self) -> None:
+        for query, violation in [("INSERT INTO Critic VALUES (NULL, 'Jane')", DatabaseException.NOT_NULL_VIOLATION),
+                                 ("INSERT INTO Critic VALUES (1, 'Jane')", DatabaseException.UNIQUE_VIOLATION),
+                                 ("INSERT INTO Ratings VALUES ('Old', 1990, 2)",
+                                  DatabaseException.FOREIGN_KEY_VIOLATION)]:
+            with self.assertRaises(sqlite3.IntegrityError) as raised:
+                self.cursor.execute(query)
+            self.assertIsInstance(SQLiteBackend.constraintViolation(raised.exception), violation, query)
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
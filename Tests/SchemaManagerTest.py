@@ -0,0 +1,87 @@
+import threading
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+import Utility.SchemaManager as SchemaManager
+
+MIGRATIONS = [
+    (1, "CREATE TABLE MigrationA(ID INTEGER NOT NULL PRIMARY KEY);"),
+    (2, "CREATE TABLE MigrationB(ID INTEGER NOT NULL PRIMARY KEY);"),
+    (3, "INSERT INTO MigrationA (ID) VALUES (1); INSERT INTO MigrationB (ID) VALUES (1);"),
+]
+
+
+class Test(unittest.TestCase):
+    """ migrate() on the test schema with migrations of its own """
+
+    def setUp(self) -> None:
+        if Connector.DBConnector.boundConnection() is not None:
+            self.skipTest("migrations commit")
+        Solution.dropTables()
+        self.queries = []
+        Connector.DBConnector.addQueryListener(self.queries.append)
+
+    def tearDown(self) -> None:
+        Connector.DBConnector.removeQueryListener(self.queries.append)
+        conn = Connector.DBConnector()
+        try:
+            conn.execute("DROP TABLE IF EXISTS MigrationA; DROP TABLE IF EXISTS MigrationB;")
+        finally:
+            conn.close()
+        Solution.dropTables()
+
+    @staticmethod
+    def versions() -> list:
+        conn = Connector.DBConnector()
+        try:
+            _, result = conn.execute("SELECT Version FROM " + SchemaManager.VERSION_TABLE + " ORDER BY Version")
+        finally:
+            conn.close()
+        return [row[0] for row in result.rows]
+
+    def testUpToDate(self) -> None:
+        self.assertEqual(3, SchemaManager.migrate(MIGRATIONS), "migrated")
+        del self.queries[:]
+        self.assertEqual(3, SchemaManager.migrate(MIGRATIONS), "nothing pending")
+        self.assertEqual(1, len(self.queries), "a single query")
+        self.assertNotIn("CREATE", self.queries[0].upper(), "no DDL")
+
+    def testPendingSteps(self) -> None:
+        self.assertEqual(1, SchemaManager.migrate(MIGRATIONS, target=1), "up to the target")
+        self.assertEqual([1], self.versions(), "first step")
+        self.assertEqual(3, SchemaManager.migrate(MIGRATIONS), "the rest")
+        self.assertEqual([1, 2, 3], self.versions(), "each step once")
+        self.assertEqual(2, len([query for query in self.queries if "pg_advisory_xact_lock" in query]),
+                         "one script per migrate call")
+
+    def testFailedStepIsRolledBack(self) -> None:
+        SchemaManager.migrate(MIGRATIONS, target=1)
+        with self.assertRaises(Exception):
+            SchemaManager.migrate(MIGRATIONS + [(4, "CREATE TABLE MigrationA(ID INTEGER);")])
+        self.assertEqual([1], self.versions(), "none of the pending steps applied")
+        self.assertEqual(3, SchemaManager.migrate(MIGRATIONS), "applies once fixed")
+
+    @unittest.skipIf(Connector.DBConnector.backend() != Connector.PRIMARY, "advisory locks are PostgreSQL only")
+    def testConcurrentMigrators(self) -> None:
+        # the first step holds the lock for a while, so the other migrator has to wait for it
+        migrations = [(1, "SELECT pg_sleep(0.2);")] + [(version + 1, ddl) for version, ddl in MIGRATIONS]
+        results = []
+
+        def migrate():
+            try:
+                results.append(SchemaManager.migrate(migrations))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=migrate) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual([4, 4], results, "both see the latest version")
+        self.assertEqual([1, 2, 3, 4], self.versions(), "each step applied once")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
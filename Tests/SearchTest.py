@@ -0,0 +1,77 @@
+import unittest
+import Solution
+from Tests.abstractTest import AbstractTest
+
+from Business.Actor import Actor
+from Business.Movie import Movie
+
+
+class Test(AbstractTest):
+
+    def setUp(self) -> None:
+        super().setUp()
+        for name, year in [("Top Gun", 1986), ("top gun", 1990), ("Stop Making Sense", 1986), ("The Top", 2000),
+                           ("Topaz", 1995), ("100% Top", 1999), ("Top_Secret", 1995), ("TopXSecret", 1996)]:
+            Solution.addMovie(Movie(movie_name=name, year=year, genre="Drama"))
+        for actor_id, name in enumerate(["Tom Cruise", "Tommy Lee", "Atom Ant", "Bo Tom", "Val Kilmer"], 1):
+            Solution.addActor(Actor(actor_id=actor_id, actor_name=name, age=50, height=180))
+
+    @staticmethod
+    def movies(result: list) -> list:
+        return [(movie.getMovieName(), movie.getYear()) for movie in result]
+
+    def testRanking(self) -> None:
+        self.assertEqual([("Top Gun", 1986), ("top gun", 1990), ("Top_Secret", 1995), ("Topaz", 1995),
+                          ("TopXSecret", 1996), ("100% Top", 1999), ("Stop Making Sense", 1986), ("The Top", 2000)],
+                         self.movies(Solution.searchMovies("top", 10)), "prefixes first, each rank in name order")
+        self.assertEqual(["Tom Cruise", "Tommy Lee", "Atom Ant", "Bo Tom"],
+                         [actor.getActorName() for actor in Solution.searchActors("TOM", 10)], "case insensitive")
+        self.assertEqual(["Tom Cruise", "Tommy Lee"], [actor.getActorName() for actor in Solution.searchActors("to")],
+                         "a short fragment only matches prefixes")
+
+    def testPages(self) -> None:
+        everything = self.movies(Solution.searchMovies("top", 100))
+        pages, after = [], None
+        while True:
+            page = Solution.searchMovies("top", 3, after)
+            if not page:
+                break
+            self.assertLessEqual(len(page), 3)
+            pages += self.movies(page)
+            after = page[-1]
+        self.assertEqual(everything, pages, "the pages add up to the whole result")
+        self.assertEqual(["Atom Ant", "Bo Tom"],
+                         [actor.getActorName() for actor in Solution.searchActors("tom", 2, Actor(2, "Tommy Lee"))])
+
+    def testServerLowersTheNextPage(self) -> None:
+        # lower() of the database may leave É alone where Python lowers it, the next page must not skip "TopÉz"
+        for name, year in [("TopÉ", 2001), ("TopÉz", 2002), ("Tom Top", 2003)]:
+            Solution.addMovie(Movie(movie_name=name, year=year, genre="Drama"))
+        everything = self.movies(Solution.searchMovies("top", 100))
+        pages, after = [], None
+        for _ in range(len(everything) + 1):
+            page = Solution.searchMovies("top", 1, after)
+            if not page:
+                break
+            pages += self.movies(page)
+            after = page[-1]
+        self.assertEqual(everything, pages, "one movie per page")
+        self.assertEqual(everything[-3:], self.movies(Solution.searchMovies("top", 10, Movie("100% Top", 1999))),
+                         "a page ending among the names containing text")
+
+    def testPatternCharacters(self) -> None:
+        self.assertEqual([("Top_Secret", 1995)], self.movies(Solution.searchMovies("top_", 10)), "_ is no wildcard")
+        self.assertEqual([("100% Top", 1999)], self.movies(Solution.searchMovies("100%", 10)), "% is no wildcard")
+
+    def testNothingToSearch(self) -> None:
+        self.assertEqual([], Solution.searchMovies("", 10))
+        self.assertEqual([], Solution.searchMovies("top", 0))
+        self.assertEqual([], Solution.searchMovies("zzz", 10))
+        self.assertEqual([], Solution.searchMovies(None, 10))
+        self.assertEqual([], Solution.searchActors(7, 10))
+        Solution.deleteMovie("Topaz", 1995)
+        self.assertNotIn(("Topaz", 1995), self.movies(Solution.searchMovies("top", 10)), "deleted movies are gone")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
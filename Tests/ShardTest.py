@@ -0,0 +1,128 @@
+import os
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from Business.Actor import Actor
+from Business.Critic import Critic
+from Business.Movie import Movie
+from Business.Studio import Studio
+from ShardedSolution import ShardedSolution
+from Utility.ReturnValue import ReturnValue
+
+SHARDS = 3
+MOVIES = [('Here', 2001, 'Horror'), ('Zoo', 1999, 'Comedy'), ('Arrival', 2016, 'Drama'),
+          ('Heat', 1995, 'Action'), ('Heat', 2020, 'Drama'), ('Up', 2009, 'Comedy')]
+
+
+@unittest.skipIf(Connector.DBConnector.backend() != Connector.PRIMARY, "shards are PostgreSQL databases")
+class Test(unittest.TestCase):
+    """ runs every call on Solution over the test database and on ShardedSolution over shards kept in
+    schemas of the same database, the results must be the same """
+
+    def setUp(self) -> None:
+        self.schemas = ['shard_test_%d_%d' % (os.getpid(), index) for index in range(SHARDS)]
+        conn = Connector.DBConnector()
+        try:
+            conn.execute(''.join('CREATE SCHEMA IF NOT EXISTS %s;' % schema for schema in self.schemas))
+        finally:
+            conn.close()
+        for index, schema in enumerate(self.schemas):
+            Connector.DBConnector.configure('shard%d' % index, dict(Connector.DBConnector.connectParams(),
+                                                                    options='-c search_path=' + schema))
+        Solution.createTables()
+        self.sharded = ShardedSolution()
+        self.sharded.createTables()
+
+    def tearDown(self) -> None:
+        self.sharded.close()
+        Connector.DBConnector.reloadConfig()
+        Solution.dropTables()
+        conn = Connector.DBConnector()
+        try:
+            conn.execute(''.join('DROP SCHEMA IF EXISTS %s CASCADE;' % schema for schema in self.schemas))
+        finally:
+            conn.close()
+
+    def both(self, function: str, *args):
+        expected = getattr(Solution, function)(*args)
+        self.assertEqual(expected, getattr(self.sharded, function)(*args), function + str(args))
+        return expected
+
+    def assertSameAnalytics(self) -> None:
+        for function in ['franchiseRevenue', 'studioRevenueByYear', 'getFanCritics', 'getExclusiveActors']:
+            self.both(function)
+        for name, year, _ in MOVIES:
+            self.both('averageRating', name, year)
+            self.both('stageCrewBudget', name, year)
+
+    def ratingsOn(self, shard: str, name: str, year: int) -> int:
+        with Connector.DBConnector.onShard(shard):
+            _, rows_count, _ = Solution.execute_query_select(
+                "SELECT * FROM Ratings WHERE MovieName = %s AND MovieYear = %d" % (Solution.stringQouteMark(name), year))
+        return rows_count
+
+    def testScatterGather(self) -> None:
+        self.assertEqual(['shard0', 'shard1', 'shard2'], self.sharded.shards, "in order")
+        for critic_id in range(1, 5):
+            self.both('addCritic', Critic(critic_id, 'Critic %d' % critic_id))
+        for actor_id in range(1, 7):
+            self.both('addActor', Actor(actor_id, 'Actor %d' % actor_id, 20 + actor_id, 170))
+        for name, year, genre in MOVIES:
+            self.both('addMovie', Movie(name, year, genre))
+        for studio_id in range(1, 6):
+            self.both('addStudio', Studio(studio_id, 'Studio %d' % studio_id))
+        self.both('addCritic', Critic(1, 'Again'))
+        self.assertEqual(Solution.getMovieProfile('Here', 2001), self.sharded.getMovieProfile('Here', 2001))
+
+        # rated and cast before any studio produced them, on the shards their keys hash to
+        for index, (name, year, _) in enumerate(MOVIES):
+            for critic_id in range(1, 2 + index % 4):
+                self.both('criticRatedMovie', name, year, critic_id, 1 + (critic_id + index) % 5)
+            self.both('actorPlayedInMovie', name, year, 1 + index, 1000, ['Lead', 'Double'])
+            self.both('actorPlayedInMovie', name, year, 6 - index % 3, 500, ['Extra'])
+        self.both('criticRatedMovie', 'Zoo', 1999, 1, 3)
+        self.both('criticRatedMovie', 'Nope', 1999, 1, 3)
+        self.both('addMovieCast', 'Up', 2009, [(1, 10, ['Voice']), (2, -1, ['Voice']), (9, 10, ['Voice'])])
+
+        for studio_id, (name, year, _) in zip([1, 2, 3, 4, 1], MOVIES):
+            self.both('studioProducedMovie', studio_id, name, year, 100 * studio_id, 1000 * studio_id + year)
+        self.assertEqual(4, self.ratingsOn('shard1', 'Heat', 1995), "moved to the studio's shard")
+        self.assertEqual(0, sum(self.ratingsOn(shard, 'Heat', 1995) for shard in ['shard0', 'shard2']), "moved away")
+        self.both('studioProducedMovie', 2, 'Heat', 1995, 1, 1)
+        self.both('studioProducedMovie', 2, 'Heat', 1995, -1, 1)
+        self.both('studioProducedMovie', 4, 'Heat', 1995, 1, 1)
+        self.both('studioProducedMovie', 9, 'Up', 2009, 1, 1)
+        self.both('criticRatedMovie', 'Heat', 1995, 4, 5)
+        self.both('criticDidntRateMovie', 'Arrival', 2016, 1)
+        self.both('actorDidntPlayInMovie', 'Zoo', 1999, 2)
+        self.assertSameAnalytics()
+        self.assertNotEqual([], Solution.getFanCritics(), "fans in the data")
+        self.assertNotEqual([], Solution.getExclusiveActors(), "exclusive actors in the data")
+        queries = []
+        Connector.DBConnector.addQueryListener(queries.append)
+        try:
+            self.sharded.averageRating('Heat', 1995)
+        finally:
+            Connector.DBConnector.removeQueryListener(queries.append)
+        self.assertEqual(2, len(queries), "one placement lookup, then the home shard")
+
+        self.both('studioDidntProduceMovie', 1, 'Here', 2001)
+        self.both('studioDidntProduceMovie', 1, 'Here', 2001)
+        self.assertEqual(1, self.ratingsOn(self.sharded.movieShard('Here', 2001), 'Here', 2001),
+                         "back on the shard of its key")
+        self.both('deleteStudio', 4)
+        self.both('deleteStudio', 4)
+        self.assertEqual(self.sharded.movieShard('Heat', 1995), self.sharded.homeShard('Heat', 1995),
+                         "no longer produced")
+        self.both('deleteActor', 6)
+        self.both('deleteMovie', 'Zoo', 1999)
+        self.both('deleteCritic', 2)
+        self.assertSameAnalytics()
+
+        self.both('clearTables')
+        self.assertSameAnalytics()
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
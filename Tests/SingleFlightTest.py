@@ -0,0 +1,137 @@
+import threading
+import time
+import types
+import unittest
+import Solution
+import Utility.DBConnector as Connector
+from Business.Critic import Critic
+from Utility.SingleFlight import SingleFlight, coalescing
+from Tests.abstractTest import AbstractTest
+
+
+class Test(AbstractTest):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.gate = threading.Event()
+        self.entered = threading.Event()
+        self.queries = 0
+
+        def read(movie_id, fail=False):
+            self.queries += 1
+            self.entered.set()
+            self.gate.wait(5)
+            if fail:
+                raise ValueError('failed')
+            return [movie_id]
+
+        self.flights = SingleFlight(types.SimpleNamespace(read=read), ['read']).install()
+
+    def waitFor(self, condition) -> None:
+        for _ in range(500):
+            if condition():
+                return
+            time.sleep(0.01)
+        self.fail('timed out')
+
+    def concurrently(self, calls: list) -> list:
+        """ starts calls (callables) on threads, the first one is in flight before the others start """
+        results = [None] * len(calls)
+
+        def run(index):
+            try:
+                results[index] = calls[index]()
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(len(calls))]
+        threads[0].start()
+        self.assertTrue(self.entered.wait(5), "leader in flight")
+        for thread in threads[1:]:
+            thread.start()
+        return threads, results
+
+    def testCoalescing(self) -> None:
+        threads, results = self.concurrently([lambda: self.flights.module.read(7)] * 5)
+        self.waitFor(lambda: self.flights.summary()['read']['coalesced'] == 4)
+        self.gate.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([[7]] * 5, results, "every call gets the result")
+        self.assertEqual(5, len({id(result) for result in results}), "each one a copy of its own")
+        self.assertEqual(1, self.queries, "one query")
+        summary = self.flights.summary()['read']
+        self.assertEqual((5, 1, 4, 4), (summary['calls'], summary['executed'], summary['coalesced'],
+                                        summary['max_waiters']), "counts")
+        self.assertEqual([7], self.flights.module.read(7), "no caching")
+        self.assertEqual(2, self.queries, "a query of its own once the flight landed")
+        self.assertIn('read', self.flights.report(), "report")
+
+    def testOnlyIdenticalCalls(self) -> None:
+        self.gate.set()
+        threads, results = self.concurrently([lambda: self.flights.module.read(1), lambda: self.flights.module.read(2),
+                                              lambda: self.flights.module.read([3])])
+        for thread in threads:
+            thread.join()
+        self.assertEqual([[1], [2], [[3]]], results, "results")
+        summary = self.flights.summary()['read']
+        self.assertEqual((0, 1), (summary['coalesced'], summary['bypassed']), "unhashable arguments run alone")
+
+    def testErrorsAreShared(self) -> None:
+        threads, results = self.concurrently([lambda: self.flights.module.read(1, fail=True)] * 3)
+        self.waitFor(lambda: self.flights.summary()['read']['coalesced'] == 2)
+        self.gate.set()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(all(isinstance(result, ValueError) for result in results), "every call fails")
+        self.assertEqual(1, self.queries, "one query")
+
+    def testTimeout(self) -> None:
+        def impatient():
+            with Connector.DBConnector.deadline(0.1):
+                return self.flights.module.read(7)
+
+        threads, results = self.concurrently([lambda: self.flights.module.read(7), impatient])
+        self.waitFor(lambda: self.flights.summary()['read']['timed_out'] == 1)
+        self.gate.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([[7], [7]], results, "results")
+        self.assertEqual(2, self.queries, "the call that gave up ran its own query")
+        summary = self.flights.summary()['read']
+        self.assertEqual((2, 1, 0, 1, 0), (summary['calls'], summary['executed'], summary['coalesced'],
+                                           summary['timed_out'], summary['max_waiters']), "counted once")
+
+    def testReadsOwnWrites(self) -> None:
+        def write_then_read():
+            conn = Connector.DBConnector()
+            try:
+                conn.execute("SELECT 1")
+            finally:
+                conn.close()
+            return self.flights.module.read(7)
+
+        threads, results = self.concurrently([lambda: self.flights.module.read(7), write_then_read])
+        self.waitFor(lambda: self.queries == 2)
+        self.gate.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([[7], [7]], results, "results")
+        self.assertEqual(2, self.queries, "a thread that wrote after the flight started runs its own query")
+
+    def testSolution(self) -> None:
+        self.gate.set()
+        Solution.addCritic(Critic(1, 'Roger'))
+        original = Solution.getCriticProfile
+        with coalescing() as flights:
+            self.assertIsNot(original, Solution.getCriticProfile, "wrapped")
+            self.assertEqual('Roger', Solution.getCriticProfile(1).getName(), "read")
+        self.assertIs(original, Solution.getCriticProfile, "restored")
+        summary = flights.summary()['getCriticProfile']
+        self.assertEqual(1, summary['calls'], "calls")
+        self.assertEqual(1, summary['bypassed'] + summary['executed'], "bound connections run alone")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
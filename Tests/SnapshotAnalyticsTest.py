@@ -0,0 +1,58 @@
+import unittest
+from decimal import Decimal
+import Solution
+from SnapshotAnalytics import AnalyticsSnapshot, numericDivision
+from Benchmark.DataGenerator import DataGenerator, ScaleFactor, loadDataset
+from Tests.abstractTest import AbstractTest
+
+from Business.Movie import Movie
+
+FUNCTIONS = ['franchiseRevenue', 'studioRevenueByYear', 'getFanCritics', 'averageAgeByGenre', 'getExclusiveActors']
+
+
+class Test(AbstractTest):
+
+    def setUp(self) -> None:
+        super().setUp()
+        loadDataset(DataGenerator(ScaleFactor(critics=5, actors=30, movies=40, studios=8, ratings_per_movie=4,
+                                              cast_size=3), seed=3), recreate=False)
+
+    def testSameResultsAsSQL(self) -> None:
+        snapshot = AnalyticsSnapshot.capture()
+        for function in FUNCTIONS:
+            self.assertEqual(getattr(Solution, function)(), getattr(snapshot, function)(), function)
+        self.assertNotEqual([], snapshot.getFanCritics(), "the dataset has fans")
+
+    def testFilters(self) -> None:
+        snapshot = AnalyticsSnapshot.capture().where(genres=['Drama', 'Action'], years=(1990, 2010), studios=[1, 2, 3])
+        movies = [(movie[0], movie[1]) for movie in
+                  Solution.execute_query_select("SELECT Name, Year FROM Movie WHERE Genre NOT IN ('Drama', 'Action') "
+                                                "OR Year NOT BETWEEN 1990 AND 2010")[2].rows]
+        Solution.deleteMovies(movies)
+        Solution.deleteStudios([studio for studio in range(4, 9)])
+        for function in FUNCTIONS:
+            self.assertEqual(getattr(Solution, function)(), getattr(snapshot, function)(), function)
+
+    def testCollationOrder(self) -> None:
+        for name in ["a b", "ab", "B", "b", "a-b"]:
+            Solution.addMovie(Movie(movie_name=name, year=2000, genre="Drama"))
+        self.assertEqual(Solution.franchiseRevenue(), AnalyticsSnapshot.capture().franchiseRevenue())
+
+    def testOrderOfTheRows(self) -> None:
+        # the rows as a database ordering names case insensitively (en_US) returns them, not in code point order
+        movies = [("a b", 2000, "Drama"), ("ab", 2000, "Action"), ("ab", 2001, "Drama"), ("B", 2000, "Action")]
+        snapshot = AnalyticsSnapshot.fromRows(movies, actors=[(1, 40), (2, 50)],
+                                              casts=[("a b", 2000, 1), ("ab", 2000, 2)], ratings=[], productions=[],
+                                              genres=[("Drama",), ("Action",)])
+        self.assertEqual([("B", 0), ("ab", 0), ("a b", 0)], snapshot.franchiseRevenue())
+        self.assertEqual(["Drama", "Action"], [genre for genre, _ in snapshot.averageAgeByGenre()])
+
+    def testNumericDivision(self) -> None:
+        self.assertEqual('26.0000000000000000', str(numericDivision(78, 3)), "16 significant digits")
+        self.assertEqual('61728.500000000000', str(numericDivision(123457, 2)), "scale shrinks with the weight")
+        self.assertEqual(Decimal('0.66666666666666666667'), numericDivision(2, 3), "rounded half up")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
@@ -0,0 +1,107 @@
+import time
+import unittest
+import Solution
+import SoftDeletePurger
+from Utility.ReturnValue import ReturnValue
+from Tests.abstractTest import AbstractTest
+
+from Business.Actor import Actor
+from Business.Critic import Critic
+from Business.Movie import Movie
+from Business.Studio import Studio
+
+
+class Test(AbstractTest):
+
+    def setUp(self) -> None:
+        super().setUp()
+        SoftDeletePurger.enableSoftDelete()
+        Solution.addMovie(Movie(movie_name="Mission Impossible", year=1996, genre="Action"))
+        Solution.addMovie(Movie(movie_name="Top Gun", year=1986, genre="Action"))
+        Solution.addActor(Actor(actor_id=1, actor_name="Tom Cruise", age=60, height=170))
+        Solution.addActor(Actor(actor_id=2, actor_name="Val Kilmer", age=62, height=183))
+        Solution.addCritic(Critic(critic_id=1, critic_name="John"))
+        Solution.addStudio(Studio(studio_id=1, studio_name="Paramount"))
+        for name, year in (("Mission Impossible", 1996), ("Top Gun", 1986)):
+            Solution.criticRatedMovie(name, year, 1, 5 if year == 1996 else 3)
+            Solution.actorPlayedInMovie(name, year, 1, 1000, ["Lead"])
+            Solution.studioProducedMovie(1, name, year, 100, 200)
+        Solution.actorPlayedInMovie("Top Gun", 1986, 2, 500, ["Iceman"])
+
+    def tearDown(self) -> None:
+        SoftDeletePurger.disableSoftDelete()
+        super().tearDown()
+
+    def testDeletedMovieIsAbsent(self) -> None:
+        self.assertEqual(ReturnValue.OK, Solution.deleteMovie("Mission Impossible", 1996), "soft deleted")
+        self.assertEqual(ReturnValue.NOT_EXISTS, Solution.deleteMovie("Mission Impossible", 1996), "already deleted")
+        self.assertEqual(Movie.badMovie().getMovieName(),
+                         Solution.getMovieProfile("Mission Impossible", 1996).getMovieName(), "no profile")
+        self.assertEqual(0, Solution.averageRating("Mission Impossible", 1996), "no ratings")
+        self.assertEqual(3.0, Solution.averageActorRating(1), "only Top Gun counts")
+        self.assertEqual("Top Gun", Solution.bestPerformance(1).getMovieName(), "only Top Gun left")
+        self.assertEqual([("Top Gun", 200)], Solution.franchiseRevenue(), "revenue without the deleted movie")
+        self.assertEqual(ReturnValue.NOT_EXISTS, Solution.criticRatedMovie("Mission Impossible", 1996, 1, 4),
+                         "existing rating of a deleted movie")
+        self.assertEqual(ReturnValue.BAD_PARAMS, Solution.criticRatedMovie("Mission Impossible", 1996, 1, 9),
+                         "bad parameters keep their precedence")
+        self.assertEqual(ReturnValue.NOT_EXISTS, Solution.criticDidntRateMovie("Mission Impossible", 1996, 1),
+                         "no rating to remove")
+
+        self.assertEqual({'Roles': 1, 'Ratings': 1, 'Casts': 1, 'Productions': 1, 'Movie': 1, 'Actor': 0},
+                         SoftDeletePurger.purgeBacklog(), "backlog before the purge")
+        self.assertEqual({'Roles': 1, 'Ratings': 1, 'Casts': 1, 'Productions': 1, 'Movie': 1, 'Actor': 0},
+                         SoftDeletePurger.purgeAll(batch_size=1), "purged")
+        self.assertEqual(0, sum(SoftDeletePurger.purgeBacklog().values()), "no backlog after the purge")
+        self.assertEqual(ReturnValue.OK, Solution.addMovie(Movie(movie_name="Mission Impossible", year=1996,
+                                                                 genre="Action")), "added again")
+
+    def testDeletedActorIsAbsent(self) -> None:
+        self.assertEqual([ReturnValue.OK, ReturnValue.NOT_EXISTS], Solution.deleteActors([2, 3]), "soft deleted")
+        self.assertEqual(None, Solution.getActorProfile(2).getActorID(), "no profile")
+        self.assertEqual(ReturnValue.NOT_EXISTS, Solution.actorPlayedInMovie("Top Gun", 1986, 2, 500, ["Ice"]),
+                         "deleted actor")
+        self.assertTrue(Solution.overlyInvestedInMovie("Top Gun", 1986, 1), "the remaining lead plays every role")
+        self.assertEqual(ReturnValue.ALREADY_EXISTS,
+                         Solution.addActor(Actor(actor_id=2, actor_name="Val", age=62, height=183)),
+                         "the old actor is still cast")
+        self.assertEqual({'Roles': 1, 'Ratings': 0, 'Casts': 1, 'Productions': 0, 'Movie': 0, 'Actor': 1},
+                         SoftDeletePurger.purgeBacklog(), "re-adding did not cascade")
+        SoftDeletePurger.purgeAll()
+        self.assertEqual(ReturnValue.OK, Solution.addActor(Actor(actor_id=2, actor_name="Val", age=62, height=183)),
+                         "id reused after the purge")
+        self.assertEqual(ReturnValue.OK, Solution.addActor(Actor(actor_id=3, actor_name="Kelly", age=63, height=170)),
+                         "never cast")
+        self.assertEqual(ReturnValue.OK, Solution.deleteActor(3), "soft deleted")
+        self.assertEqual(ReturnValue.OK, Solution.addActor(Actor(actor_id=3, actor_name="Kelly", age=63, height=170)),
+                         "id reused before the purge, nothing refers to the old actor")
+        self.assertEqual(0, sum(SoftDeletePurger.purgeBacklog().values()), "re-adding removed the old actor")
+        self.assertEqual(ReturnValue.OK, Solution.actorPlayedInMovie("Top Gun", 1986, 2, 500, ["Iceman"]), "cast")
+
+    def testDisabled(self) -> None:
+        Solution.deleteMovie("Top Gun", 1986)
+        SoftDeletePurger.disableSoftDelete(batch_size=1)
+        self.assertEqual(0, sum(SoftDeletePurger.purgeBacklog().values()), "disabling purged the rest")
+        self.assertEqual(ReturnValue.OK, Solution.deleteMovie("Mission Impossible", 1996), "deleted at once")
+        self.assertEqual(0, sum(SoftDeletePurger.purgeBacklog().values()), "nothing left to purge")
+        self.assertEqual(ReturnValue.OK, Solution.addMovie(Movie(movie_name="Top Gun", year=1986, genre="Action")),
+                         "added again")
+        self.assertEqual(ReturnValue.OK, Solution.criticRatedMovie("Top Gun", 1986, 1, 4), "rated again")
+        self.assertEqual(4.0, Solution.averageRating("Top Gun", 1986), "read through the plain view")
+
+    def testBackgroundPurger(self) -> None:
+        Solution.deleteActor(1)
+        with SoftDeletePurger.SoftDeletePurger(batch_size=1, interval=0.01) as purger:
+            for _ in range(500):
+                if not any(purger.backlog().values()):
+                    break
+                time.sleep(0.01)
+        # the last batch is counted once the purger stopped, its deletes commit before it is counted
+        removed = purger.stats()['removed']
+        self.assertEqual({'Roles': 2, 'Ratings': 0, 'Casts': 2, 'Productions': 0, 'Movie': 0, 'Actor': 1}, removed,
+                         "rows of the deleted actor")
+
+
+# *** DO NOT RUN EACH TEST MANUALLY ***
+if __name__ == '__main__':
+    unittest.main(verbosity=2, exit=False)
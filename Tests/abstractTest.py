@@ -1,12 +1,42 @@
+import os
 import unittest
 import Solution as Solution
+import Utility.DBConnector as Connector
+
+# "recreate" builds and drops the schema around every test.
+# "rollback" builds it once per test class and runs each test in a transaction on one shared connection,
+# rolled back in tearDown, which is much faster
+ISOLATION = os.environ.get('DB_TEST_ISOLATION', 'recreate')
 
 
 class AbstractTest(unittest.TestCase):
+    connector = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        if ISOLATION == 'rollback':
+            Solution.dropTables()
+            Solution.createTables()
+            cls.connector = Connector.DBConnector()
+            Connector.DBConnector.bind(cls.connector.connection)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        if cls.connector is not None:
+            Connector.DBConnector.unbind()
+            cls.connector.rollback()
+            cls.connector.close()
+            cls.connector = None
+            Solution.dropTables()
+
     # before each test, setUp is executed
     def setUp(self) -> None:
-        Solution.createTables()
+        if self.connector is None:
+            Solution.createTables()
 
     # after each test, tearDown is executed
     def tearDown(self) -> None:
-        Solution.dropTables()
+        if self.connector is not None:
+            self.connector.rollback()
+        else:
+            Solution.dropTables()
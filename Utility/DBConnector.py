@@ -1,10 +1,82 @@
 import psycopg2
-from psycopg2 import errors, sql
+from psycopg2 import errors, pool, sql
 from configparser import ConfigParser
 from Utility.Exceptions import DatabaseException
+import Utility.SQLiteBackend as SQLiteBackend
+import contextlib
+import itertools
 import os
+import re
+import threading
+import time
 from typing import Union
 
+# connection shared by every DBConnector created on this thread, see DBConnector.bind
+_binding = threading.local()
+# schema new connections resolve unqualified table names in, see DBConnector.useSchema
+_schema = os.environ.get('DB_SCHEMA')
+# database.ini section of the primary, the one every write goes to
+PRIMARY = 'postgresql'
+# database.ini section of the embedded backend, see DBConnector.useBackend
+SQLITE = 'sqlite'
+# 'postgresql' or 'sqlite', None picks by database.ini: sqlite when it only has a [sqlite] section
+_backend = os.environ.get('DB_BACKEND')
+# parsed database.ini sections, see DBConnector.reloadConfig
+_config = None
+# (pool, free slots) per database.ini section, see DBConnector.usePool
+_pools = {}
+# read routing state per replica section: calls in flight and until when a failed replica is skipped
+_replicas = {}
+_routing_lock = threading.Lock()
+_round_robin = itertools.count()
+# callables receiving the text of every executed query, see DBConnector.addQueryListener
+_listeners = []
+
+
+# the parts of a query a ; does not end a statement in: quoted strings and identifiers, dollar quoted bodies
+# ($$ ... $$, $body$ ... $body$) and comments, plus the ; that do
+_STATEMENT_PARTS = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|(\$(?:[A-Za-z_]\w*)?\$)[\s\S]*?\1"""
+                              r"""|(?P<line>--[^\n]*)|(?P<block>/\*[\s\S]*?\*/)|;""")
+
+
+def splitStatements(text: str) -> list:
+    """ the statements of a multi-statement query. a ; inside quotes, a dollar quoted body or a comment
+    does not split, parts holding nothing but comments are dropped """
+    statements, start = [], 0
+    for match in _STATEMENT_PARTS.finditer(text):
+        if match.group() == ';':
+            statements.append(text[start:match.start()])
+            start = match.end()
+    statements.append(text[start:])
+    return [statement.strip() for statement in statements if _hasCode(statement)]
+
+
+def _hasCode(statement: str) -> bool:
+    without_comments = _STATEMENT_PARTS.sub(lambda match: '' if match.group('line') or match.group('block')
+                                            else match.group(), statement)
+    return bool(without_comments.strip())
+
+
+def _endsInLineComment(statement: str) -> bool:
+    last = None
+    for last in _STATEMENT_PARTS.finditer(statement):
+        pass
+    return last is not None and last.group('line') is not None and last.end() == len(statement)
+
+
+# comment naming the function a statement belongs to, it shows up in pg_stat_statements and pg_stat_activity.
+# a query without a tag is returned as it is
+def tagQuery(query: Union[str, sql.Composed], tag: Union[str, None]) -> Union[str, sql.Composed]:
+    if tag is None:
+        return query
+    comment = '/* solution:' + tag + ' */ '
+    if isinstance(query, str):
+        # every statement gets the tag, the server records the statements of a query separately.
+        # a ; after a trailing -- comment would be part of the comment
+        return ' '.join(comment + statement + ('\n;' if _endsInLineComment(statement) else ';')
+                        for statement in splitStatements(query))
+    return sql.Composed([sql.SQL(comment), query])
+
 
 class ResultSetDict(dict):
     def __getitem__(self, item):
@@ -65,29 +137,294 @@ class ResultSet:
 
 
 class DBConnector:
-    # constructor
-    def __init__(self):
+    # constructor. readOnly connections may be served by a read replica, see database.ini
+    def __init__(self, readOnly: bool = False):
+        bound = DBConnector.boundConnection()
+        self.bound = bound is not None
+        self.readOnly = readOnly
+        self.target = None
+        self.pool = None
+        # the semaphore of the pool this connection came from, released on close even after usePool replaced it
+        self.slots = None
+        self.connection = None
+        self.cursor = None
+        if self.bound:
+            self.connection = bound
+            self.cursor = bound.cursor()
+            return
+        for target in DBConnector.__route(readOnly):
+            try:
+                self.__connect(target)
+            except Exception:
+                if target in _replicas:
+                    # unavailable replica, fall through to the next candidate and finally the primary
+                    DBConnector.__markDown(target)
+                    continue
+                raise DatabaseException.ConnectionInvalid("Could not connect to database")
+            self.target = target
+            DBConnector.__track(target, 1)
+            break
+
+    def __connect(self, target: str):
+        pooled = _pools.get(target)
         try:
-            # Obtain the configuration parameters
-            params = DBConnector.__config()
-            self.connection = psycopg2.connect(**params)
+            if pooled is not None:
+                self.pool, self.slots = pooled
+                # wait for a free connection instead of failing when every one is checked out
+                self.slots.acquire()
+                try:
+                    self.connection = self.pool.getconn()
+                except Exception:
+                    self.slots.release()
+                    self.pool, self.slots = None, None
+                    raise
+            elif DBConnector.backend() == SQLITE:
+                self.connection = SQLiteBackend.connect(**DBConnector.connectParams(target))
+            else:
+                self.connection = psycopg2.connect(**DBConnector.connectParams(target))
             self.connection.autocommit = False
             self.cursor = self.connection.cursor()
-        except Exception as e:
+        except Exception:
+            if self.pool is not None and self.connection is not None:
+                self.pool.putconn(self.connection, close=True)
+                self.slots.release()
+            self.pool, self.slots = None, None
             self.connection = None
             self.cursor = None
-            raise DatabaseException.ConnectionInvalid("Could not connect to database")
+            raise
+
+    # connection parameters of a database.ini section, with the schema binding applied
+    @staticmethod
+    def connectParams(target: str = None) -> dict:
+        if DBConnector.backend() == SQLITE:
+            return dict(DBConnector.__loadConfig().get(SQLITE, {'database': SQLiteBackend.MEMORY}))
+        params = DBConnector.__config(target or PRIMARY)
+        # a section choosing its own search_path (a shard kept in a schema) keeps it
+        if _schema and 'search_path' not in params.get('options', ''):
+            params['options'] = (params.get('options', '') + ' -c search_path=' + _schema).strip()
+        return params
+
+    # share up to maxconn connections per database (the primary, each replica and shard) between the DBConnectors
+    # of all threads instead of connecting per DBConnector. a DBConnector waits for a free connection when
+    # all are in use and returns its connection to the pool on close. usePool(0) closes the pools.
+    # embedded connections cost next to nothing and are never pooled
+    @staticmethod
+    def usePool(maxconn: int, minconn: int = 1):
+        for target in list(_pools):
+            _pools.pop(target)[0].closeall()
+        if maxconn > 0 and DBConnector.backend() != SQLITE:
+            for target in [PRIMARY] + DBConnector.__routing()['replicas'] + DBConnector.shards():
+                # replicas and shards connect lazily, one that is down must not keep the pool from starting
+                warm = min(minconn, maxconn) if target == PRIMARY else 0
+                _pools[target] = (pool.ThreadedConnectionPool(warm, maxconn, **DBConnector.connectParams(target)),
+                                  threading.BoundedSemaphore(maxconn))
+
+    @staticmethod
+    def poolSize() -> int:
+        return _pools[PRIMARY][0].maxconn if PRIMARY in _pools else 0
+
+    # candidate databases for a new connection, best first. writes always go to the primary. reads go to the
+    # replicas that are not marked down, ordered by the routing strategy, with the primary as the last resort.
+    # with read_your_writes a thread that wrote recently reads from the primary, so it sees its own writes
+    @staticmethod
+    def __route(readOnly: bool) -> list:
+        shard = getattr(_binding, 'shard', None)
+        if shard is not None:
+            return [shard]
+        routing = DBConnector.__routing()
+        replicas = routing['replicas']
+        if not readOnly or not replicas:
+            return [PRIMARY]
+        last_write = getattr(_binding, 'last_write', None)
+        now = time.monotonic()
+        if last_write is not None and now - last_write < routing['read_your_writes']:
+            return [PRIMARY]
+        with _routing_lock:
+            alive = [replica for replica in replicas if _replicas[replica]['down_until'] <= now]
+            if alive:
+                start = next(_round_robin) % len(alive)
+                alive = alive[start:] + alive[:start]
+            if routing['strategy'] == 'least_loaded':
+                alive.sort(key=lambda replica: _replicas[replica]['in_flight'])
+        return alive + [PRIMARY]
+
+    @staticmethod
+    def __track(target: str, delta: int):
+        if target in _replicas:
+            with _routing_lock:
+                _replicas[target]['in_flight'] += delta
+
+    @staticmethod
+    def __markDown(target: str):
+        retry = DBConnector.__routing()['replica_retry']
+        with _routing_lock:
+            _replicas[target]['down_until'] = time.monotonic() + retry
+
+    # replica sections are the ones named replica*, the optional [routing] section holds
+    # strategy (round_robin or least_loaded), read_your_writes (seconds) and replica_retry (seconds)
+    @staticmethod
+    def __routing() -> dict:
+        sections = DBConnector.__loadConfig()
+        routing = sections.get('routing', {})
+        replicas = sorted(section for section in sections if section.startswith('replica'))
+        with _routing_lock:
+            for replica in replicas:
+                _replicas.setdefault(replica, {'in_flight': 0, 'down_until': 0.0})
+        return {'replicas': replicas,
+                'strategy': routing.get('strategy', 'round_robin'),
+                'read_your_writes': float(routing.get('read_your_writes', 0)),
+                'replica_retry': float(routing.get('replica_retry', 5))}
+
+    # shard sections are the ones named shard*, in the order of their numbers: shard0, shard1, ..., shard10
+    @staticmethod
+    def shards() -> list:
+        return sorted((section for section in DBConnector.__loadConfig() if section.startswith('shard')),
+                      key=lambda section: (len(section), section))
+
+    # every DBConnector created on this thread inside the block, reading or writing, connects to the database.ini
+    # section shard instead of the primary and its replicas. a shard has no fallback, when it is down the
+    # connection fails
+    @staticmethod
+    @contextlib.contextmanager
+    def onShard(shard: str):
+        previous = getattr(_binding, 'shard', None)
+        _binding.shard = shard
+        try:
+            yield
+        finally:
+            _binding.shard = previous
+
+    # the shard of the onShard block this thread is in, None outside of one
+    @staticmethod
+    def currentShard() -> Union[str, None]:
+        return getattr(_binding, 'shard', None)
+
+    # listener(query_text) is called with every query any DBConnector executes, e.g. to record the SQL
+    # a Solution function issues. listeners run on the executing thread before the query is sent
+    @staticmethod
+    def addQueryListener(listener):
+        _listeners.append(listener)
+
+    @staticmethod
+    def removeQueryListener(listener):
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+    # run every new connection against the embedded SQLite database ('sqlite') or the PostgreSQL server
+    # ('postgresql'). None goes back to database.ini, which picks sqlite when it only has a [sqlite] section
+    @staticmethod
+    def useBackend(backend: Union[str, None]):
+        global _backend
+        if backend not in (None, PRIMARY, SQLITE):
+            raise DatabaseException.database_ini_ERROR("Unknown backend " + backend)
+        _backend = backend
+
+    @staticmethod
+    def backend() -> str:
+        if _backend is not None:
+            return _backend
+        sections = DBConnector.__loadConfig()
+        return SQLITE if SQLITE in sections and PRIMARY not in sections else PRIMARY
+
+    # forget the cached database.ini and the state of its replicas, the next connection reads it again
+    @staticmethod
+    def reloadConfig():
+        global _config
+        _config = None
+        with _routing_lock:
+            _replicas.clear()
+
+    # add or replace a section of the cached database.ini in memory, until reloadConfig
+    @staticmethod
+    def configure(section: str, params: dict):
+        global _config
+        _config = DBConnector.__loadConfig()
+        _config[section] = dict(params)
+
+    # route every DBConnector created on this thread to connection until unbind. the owner of the connection
+    # controls its transaction: commit and rollback become no-ops and each execute runs inside a savepoint,
+    # so a failing statement is undone on its own just like a separately committed one
+    @staticmethod
+    def bind(connection):
+        _binding.connection = connection
+
+    @staticmethod
+    def unbind():
+        _binding.connection = None
+
+    @staticmethod
+    def boundConnection():
+        return getattr(_binding, 'connection', None)
+
+    # time.monotonic() of the last write committed by a DBConnector of this thread, None before the first
+    @staticmethod
+    def lastWrite() -> Union[float, None]:
+        return getattr(_binding, 'last_write', None)
+
+    # resolve unqualified names of every new connection in schema instead of the default search_path,
+    # so several processes can keep separate copies of the tables in one database. None restores the default.
+    # the embedded backend has no schemas, each process has an in-memory database of its own
+    @staticmethod
+    def useSchema(schema: Union[str, None]):
+        global _schema
+        if schema is not None and not schema.replace('_', '').isalnum():
+            raise DatabaseException.database_ini_ERROR("Invalid schema name " + schema)
+        _schema = schema
+
+    @staticmethod
+    def currentSchema() -> Union[str, None]:
+        return _schema
+
+    # every execute on this thread inside the block must finish within seconds (nested blocks keep the earlier
+    # deadline). the server aborts a statement running past it and a late one raises DatabaseException.QUERY_TIMEOUT
+    @staticmethod
+    @contextlib.contextmanager
+    def deadline(seconds: float):
+        previous = getattr(_binding, 'deadline', None)
+        _binding.deadline = time.monotonic() + seconds
+        if previous is not None:
+            _binding.deadline = min(previous, _binding.deadline)
+        try:
+            yield
+        finally:
+            _binding.deadline = previous
+
+    # seconds left until the deadline of this thread, None without one
+    @staticmethod
+    def remainingTime(timeout: float = None) -> Union[float, None]:
+        deadline = getattr(_binding, 'deadline', None)
+        if timeout is not None:
+            deadline = time.monotonic() + timeout if deadline is None else min(deadline, time.monotonic() + timeout)
+        return None if deadline is None else deadline - time.monotonic()
 
     # close connection
     def close(self):
         if self.cursor is not None:
             self.cursor.close()
-        if self.connection is not None:
+            self.cursor = None
+        if self.connection is None or self.bound:
+            return
+        DBConnector.__track(self.target, -1)
+        if self.pool is not None:
+            # back to the pool without a pending transaction, broken connections are discarded
+            try:
+                if not self.connection.closed:
+                    self.connection.rollback()
+            except Exception:
+                pass
+            try:
+                self.pool.putconn(self.connection, close=bool(self.connection.closed))
+            except Exception:
+                pass
+            self.slots.release()
+            self.pool, self.slots = None, None
+        else:
             self.connection.close()
+        self.connection = None
 
     # commit connection's changes
     def commit(self):
-        if self.connection is not None:
+        if self.connection is not None and not self.bound:
             try:
                 self.connection.commit()
             except Exception:
@@ -95,23 +432,78 @@ class DBConnector:
 
     # rollback connection's changes
     def rollback(self):
-        if self.connection is not None:
+        if self.connection is not None and not self.bound:
             try:
                 self.connection.rollback()
             except Exception:
                 raise DatabaseException.ConnectionInvalid("Could not rollback changes")
 
     # executes the query, if it is SELECT you may ask to print the results with printSchema
+    # timeout (seconds) bounds this call on top of any DBConnector.deadline block
     # returns the number of rows effected and a ResultSet (for SELECT)
-    def execute(self, query: Union[str, sql.Composed], printSchema=False) -> (int, ResultSet):
+    def execute(self, query: Union[str, sql.Composed], printSchema=False, timeout: float = None) -> (int, ResultSet):
+        row_effected = self.__run(query, timeout)
+
+        # get entries in case of SELECT
+        if self.cursor.description is not None:
+            entries = ResultSet(self.cursor.description, self.cursor.fetchall())
+        else:
+            entries = ResultSet()
+        self.__release()
+
+        # print SELECT entries
+        if printSchema:
+            print(entries)
+
+        return row_effected, entries
+
+    # executes a SELECT and builds one object per row with row_factory(*row) straight from the cursor tuples,
+    # without the ResultSet and its per-row dicts. the columns of the query must match the factory's arguments
+    # returns the number of rows and the list of objects
+    def executeObjects(self, query: Union[str, sql.Composed], row_factory, timeout: float = None) -> (int, list):
+        row_effected = self.__run(query, timeout)
+        if self.cursor.description is not None:
+            objects = list(itertools.starmap(row_factory, self.cursor.fetchall()))
+        else:
+            objects = []
+        self.__release()
+        return row_effected, objects
+
+    # runs the query and commits it, mapping constraint violations to DatabaseException
+    # returns the number of rows effected, the results are left on the cursor
+    def __run(self, query: Union[str, sql.Composed], timeout: float = None) -> int:
         if self.connection is None:
             raise DatabaseException.ConnectionInvalid("Connection Invalid")
+        remaining = DBConnector.remainingTime(timeout)
+        if remaining is not None and remaining <= 0:
+            raise DatabaseException.QUERY_TIMEOUT("QUERY_TIMEOUT")
+        if _listeners:
+            if isinstance(query, str):
+                text = query
+            elif isinstance(self.connection, SQLiteBackend.Connection):
+                text = SQLiteBackend.render(query)
+            else:
+                text = query.as_string(self.connection)
+            for listener in list(_listeners):
+                listener(text)
 
         # try execute the query
         try:
-            self.cursor.execute(query)
+            if self.bound:
+                self.cursor.execute("SAVEPOINT dbconnector")
+            try:
+                if remaining is None:
+                    self.cursor.execute(query)
+                else:
+                    self.__executeBefore(query, remaining)
+            except Exception:
+                if self.bound:
+                    self.cursor.execute("ROLLBACK TO SAVEPOINT dbconnector; RELEASE SAVEPOINT dbconnector")
+                raise
             row_effected = max(self.cursor.rowcount, 0)
             self.commit()
+            if not self.readOnly and not self.bound:
+                _binding.last_write = time.monotonic()
         except errors.lookup("23502"):
             raise DatabaseException.NOT_NULL_VIOLATION("NOT_NULL_VIOLATION")
         except errors.lookup("23503"):
@@ -120,38 +512,88 @@ class DBConnector:
             raise DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
         except errors.lookup("23514"):
             raise DatabaseException.CHECK_VIOLATION("CHECK_VIOLATION")
+        except (errors.QueryCanceled, errors.LockNotAvailable):
+            if remaining is None:
+                raise
+            raise DatabaseException.QUERY_TIMEOUT("QUERY_TIMEOUT")
+        except SQLiteBackend.IntegrityError as e:
+            raise SQLiteBackend.constraintViolation(e)
+        except SQLiteBackend.OperationalError as e:
+            if remaining is None or not SQLiteBackend.isTimeout(e):
+                raise
+            raise DatabaseException.QUERY_TIMEOUT("QUERY_TIMEOUT")
+        return row_effected
 
-        # get entries in case of SELECT
-        if self.cursor.description is not None:
-            entries = ResultSet(self.cursor.description, self.cursor.fetchall())
+    # executes the query with the server side statement and lock timeouts set to the time left, for this
+    # transaction only. should the client be held up past the deadline anyway (network, a stalled server)
+    # the running query is cancelled from a timer
+    def __executeBefore(self, query: Union[str, sql.Composed], remaining: float):
+        embedded = isinstance(self.connection, SQLiteBackend.Connection)
+        milliseconds = max(1, int(remaining * 1000))
+        timeouts = "SET LOCAL statement_timeout = %d; SET LOCAL lock_timeout = %d; " % (milliseconds, milliseconds)
+        if embedded:
+            # no server side timeouts, lock waits end with the busy timeout and the timer interrupts the rest
+            self.connection.busyTimeout(remaining)
+        elif isinstance(query, str):
+            query = timeouts + query
         else:
-            entries = ResultSet()
+            query = sql.Composed([sql.SQL(timeouts), query])
+        running = threading.Lock()
+        connection = self.connection
 
-        # print SELECT entries
-        if printSchema:
-            print(entries)
+        def cancel():
+            # only while the query still runs, a late cancel must not hit the connection's next query
+            if running.acquire(blocking=False):
+                try:
+                    connection.cancel()
+                finally:
+                    running.release()
 
-        return row_effected, entries
+        timer = threading.Timer(remaining + 0.05, cancel)
+        timer.daemon = True
+        timer.start()
+        try:
+            self.cursor.execute(query)
+        finally:
+            running.acquire()
+            timer.cancel()
+            if embedded:
+                self.connection.busyTimeout(None)
+        if self.bound and not embedded:
+            # SET LOCAL would outlive the released savepoint in the transaction of the bound connection.
+            # a cursor of its own keeps the results of the query
+            with self.connection.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout TO DEFAULT; SET LOCAL lock_timeout TO DEFAULT")
+
+    # ends the savepoint of a bound execute, once its results were fetched
+    def __release(self):
+        if self.bound:
+            self.cursor.execute("RELEASE SAVEPOINT dbconnector")
 
     # grant credentials
     @staticmethod
-    def __config(filename=os.path.join(os.path.join(os.getcwd(), "Utility"), 'database.ini'),
-                 section='postgresql'):
-        # create a parser
-        parser = ConfigParser()
-        # read config file
-        parser.read(filename)
-
-        # get section
-        db = {}
-        if parser.has_section(section):
-            params = parser.items(section)
-            for param in params:
-                db[param[0]] = param[1]
-        else:
-            # file not found
-            db = DBConnector.__config(
-                filename=os.path.join(os.path.join(os.path.dirname(os.getcwd()), 'Utility'), 'database.ini'))
-            if db is None:
-                raise DatabaseException.database_ini_ERROR("Please modify database.ini file under Utility")
-        return db
+    def __config(section=PRIMARY) -> dict:
+        sections = DBConnector.__loadConfig()
+        if section not in sections:
+            raise DatabaseException.database_ini_ERROR("Please modify database.ini file under Utility")
+        return dict(sections[section])
+
+    # all sections of the first database.ini found, under Utility of the working directory or of its parent.
+    # read once and cached, see reloadConfig. while there is none every call looks again
+    @staticmethod
+    def __loadConfig() -> dict:
+        global _config
+        if _config is None:
+            sections = {}
+            for directory in (os.getcwd(), os.path.dirname(os.getcwd())):
+                # create a parser
+                parser = ConfigParser()
+                # read config file
+                parser.read(os.path.join(os.path.join(directory, 'Utility'), 'database.ini'))
+                if parser.has_section(PRIMARY) or parser.has_section(SQLITE):
+                    sections = {section: dict(parser.items(section)) for section in parser.sections()}
+                    break
+            if not sections:
+                return sections
+            _config = sections
+        return _config
@@ -28,3 +28,7 @@ class DatabaseException(_Exceptions):
 
     class UNKNOWN_ERROR(_Exceptions):
         pass
+
+    # the query was cancelled because its deadline passed, see DBConnector.deadline
+    class QUERY_TIMEOUT(_Exceptions):
+        pass
@@ -0,0 +1,190 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from typing import Dict
+
+import Utility.DBConnector as Connector
+
+# SOLUTION_EXISTENCE_INDEX=1 gives Solution an ExistenceIndex at import,
+# SOLUTION_EXISTENCE_MAX_AGE=<seconds> rebuilds it from the database that often
+INDEX_ENV = 'SOLUTION_EXISTENCE_INDEX'
+MAX_AGE_ENV = 'SOLUTION_EXISTENCE_MAX_AGE'
+
+# the keys of each kind, read when the index is built. deleted movies and actors count as missing
+_KEY_QUERIES = {
+    'critic': "SELECT ID FROM Critic",
+    'actor': "SELECT ID FROM LiveActor",
+    'studio': "SELECT ID FROM Studio",
+    'movie': "SELECT Name, Year FROM LiveMovie",
+}
+# a filter has room for at least this many keys, and twice the keys it was built with
+MIN_CAPACITY = 1024
+# seconds before a build that failed (e.g. no tables yet) is tried again
+RETRY_AFTER = 1.0
+
+
+class BloomFilter:
+    """ a set of keys that may answer 'maybe' for a key it does not hold (with about error_rate chance while
+    it holds at most capacity keys) but never 'no' for one it does """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.count = 0
+        self.__bits = bytearray((self.size + 7) // 8)
+
+    def __positions(self, key):
+        # double hashing, k positions out of two 64 bit halves of one digest
+        digest = hashlib.blake2b(repr(key).encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + index * second) % self.size for index in range(self.hashes)]
+
+    def add(self, key) -> None:
+        for position in self.__positions(key):
+            self.__bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key) -> bool:
+        return all(self.__bits[position >> 3] & (1 << (position & 7)) for position in self.__positions(key))
+
+
+class ExistenceIndex:
+    """ Bloom filters of the critic, actor and studio ids and the movie keys in the database, so a relation
+    write naming a key that is definitely missing can answer NOT_EXISTS without a query.
+
+    built from the database on first use (and again every max_age seconds, or once the adds outgrow it).
+    the add functions register their key before they insert, so the index never misses a key that a
+    committed add put in. deleted keys stay in the filters until the next build, which only costs a query.
+    keys added by other processes, or loaded around Solution (COPY), are unknown until the next build:
+    use it where this process makes every add, or set max_age to how stale a NOT_EXISTS may be.
+
+        Solution.EXISTENCE_INDEX = ExistenceIndex()
+    """
+
+    def __init__(self, error_rate: float = 0.01, max_age: float = None):
+        self.error_rate = error_rate
+        self.max_age = max_age
+        self.__lock = threading.Lock()
+        self.__filters = None
+        self.__built_at = None
+        self.__outgrown = False
+        # keys added while a build reads the database, the new filters get them too
+        self.__pending = None
+        self.__retry_at = 0.0
+        self.__totals = {kind: {'checks': 0, 'missing': 0, 'added': 0} for kind in _KEY_QUERIES}
+
+    def build(self) -> 'ExistenceIndex':
+        """ reads every key from the database into new filters, raises when the database cannot be read """
+        with self.__lock:
+            if self.__pending is not None:
+                # another thread is building
+                return self
+            self.__pending = []
+        try:
+            keys = {}
+            # the primary, a lagging replica could miss keys that exist
+            conn = Connector.DBConnector()
+            try:
+                for kind, query in _KEY_QUERIES.items():
+                    _, result = conn.execute(Connector.tagQuery(query, 'existenceIndex'))
+                    keys[kind] = [row[0] if len(row) == 1 else tuple(row) for row in result.rows]
+            finally:
+                conn.close()
+            filters = {kind: BloomFilter(max(MIN_CAPACITY, 2 * len(values)), self.error_rate)
+                       for kind, values in keys.items()}
+            for kind, values in keys.items():
+                for key in values:
+                    filters[kind].add(key)
+        except Exception:
+            with self.__lock:
+                self.__pending = None
+                self.__retry_at = time.monotonic() + RETRY_AFTER
+            raise
+        with self.__lock:
+            for kind, key in self.__pending:
+                filters[kind].add(key)
+            self.__filters = filters
+            self.__built_at = time.monotonic()
+            self.__outgrown = False
+            self.__pending = None
+        return self
+
+    def addCritic(self, critic_id: int) -> None:
+        self.__add('critic', critic_id)
+
+    def addActor(self, actor_id: int) -> None:
+        self.__add('actor', actor_id)
+
+    def addStudio(self, studio_id: int) -> None:
+        self.__add('studio', studio_id)
+
+    def addMovie(self, movie_name: str, movie_year: int) -> None:
+        self.__add('movie', (movie_name, movie_year))
+
+    def lacksCritic(self, critic_id: int) -> bool:
+        """ True only when no critic with the id exists """
+        return _isId(critic_id) and self.__lacks('critic', critic_id)
+
+    def lacksActor(self, actor_id: int) -> bool:
+        return _isId(actor_id) and self.__lacks('actor', actor_id)
+
+    def lacksStudio(self, studio_id: int) -> bool:
+        return _isId(studio_id) and self.__lacks('studio', studio_id)
+
+    def lacksMovie(self, movie_name: str, movie_year: int) -> bool:
+        return isinstance(movie_name, str) and _isId(movie_year) and self.__lacks('movie', (movie_name, movie_year))
+
+    def __add(self, kind: str, key) -> None:
+        with self.__lock:
+            self.__totals[kind]['added'] += 1
+            if self.__filters is not None:
+                bloom = self.__filters[kind]
+                bloom.add(key)
+                self.__outgrown = self.__outgrown or bloom.count > bloom.capacity
+            if self.__pending is not None:
+                self.__pending.append((kind, key))
+
+    def __lacks(self, kind: str, key) -> bool:
+        self.__refresh()
+        with self.__lock:
+            totals = self.__totals[kind]
+            totals['checks'] += 1
+            if self.__filters is None or key in self.__filters[kind]:
+                return False
+            totals['missing'] += 1
+            return True
+
+    def __refresh(self) -> None:
+        now = time.monotonic()
+        with self.__lock:
+            due = self.__filters is None or self.__outgrown or \
+                (self.max_age is not None and now - self.__built_at >= self.max_age)
+            due = due and self.__pending is None and now >= self.__retry_at
+        # a transaction may still roll back what it sees, the build waits for a call outside of one
+        due = due and Connector.DBConnector.boundConnection() is None
+        if due:
+            try:
+                self.build()
+            except Exception:
+                # without filters every key may exist, the writes go to the database
+                pass
+
+    def summary(self) -> Dict[str, dict]:
+        """ per kind: the lookups, the ones answered missing (writes that never reached the database) and the adds """
+        with self.__lock:
+            return {kind: dict(totals) for kind, totals in self.__totals.items()}
+
+
+def _isId(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def fromEnvironment():
+    """ an ExistenceIndex when SOLUTION_EXISTENCE_INDEX is set, else None """
+    if os.environ.get(INDEX_ENV, '') in ('', '0'):
+        return None
+    max_age = os.environ.get(MAX_AGE_ENV)
+    return ExistenceIndex(max_age=float(max_age) if max_age else None)
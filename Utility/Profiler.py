@@ -0,0 +1,211 @@
+import atexit
+import contextlib
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Dict
+
+# SOLUTION_PROFILE=<path> profiles every Solution call of the process and writes the report when it exits.
+# {pid} in the path is replaced by the process id, for runs over several processes
+PROFILE_ENV = 'SOLUTION_PROFILE'
+# SOLUTION_PROFILE_SAMPLE=<n> traces the allocations of every n-th call, 0 turns allocation tracing off
+SAMPLE_ENV = 'SOLUTION_PROFILE_SAMPLE'
+
+# the helpers the Solution functions share, never wrapped: their time is part of the call that used them
+HELPER_FUNCTIONS = ['stringQouteMark', 'isInteger', 'missingParent', 'validateInteger', 'nullable', 'searchRanks',
+                    'searchQuery', 'execute_query_insert', 'execute_query_delete', 'execute_query_select',
+                    'execute_query_returning', 'execute_bulk_delete', 'execute_query_objects']
+
+
+class SolutionProfiler:
+    """ wraps the API functions of a module (Solution by default), its public functions but the HELPER_FUNCTIONS,
+    and aggregates per function:
+    calls, wall and CPU time, and for every sample_every-th call the allocations it left behind and its peak.
+    each function keeps cProfile data of its own, so the report shows where its time went
+    (connect, query building, ResultSet, Business objects ...).
+
+    only the outermost profiled call on a thread is measured, calls it makes to other wrapped functions
+    are part of its own profile. tracemalloc counts allocations of every thread, so allocation numbers
+    are only exact while one thread calls into the module. from Python 3.12 cProfile profiles one thread at a
+    time, the calls of the other threads meanwhile are only timed (counted as unprofiled).
+
+        with profiling('solution.prof') as profiler:
+            run_load()
+        # solution.prof (pstats) and solution.prof.txt (report)
+    """
+
+    def __init__(self, module=None, sample_every: int = 100):
+        if module is None:
+            import Solution as module
+        self.module = module
+        self.sample_every = sample_every
+        self.__originals = {}
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        # (function, thread id) -> cProfile.Profile, a profiler only records the thread that enabled it
+        self.__profiles = {}
+        self.__totals = {}
+        self.__started_tracing = False
+
+    def install(self) -> 'SolutionProfiler':
+        if self.sample_every and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.__started_tracing = True
+        for name, function in inspect.getmembers(self.module, inspect.isfunction):
+            if name.startswith('_') or name in HELPER_FUNCTIONS or function.__module__ != self.module.__name__:
+                continue
+            self.__originals[name] = function
+            setattr(self.module, name, self.__wrap(name, function))
+        return self
+
+    def uninstall(self) -> None:
+        for name, function in self.__originals.items():
+            setattr(self.module, name, function)
+        self.__originals.clear()
+        if self.__started_tracing:
+            tracemalloc.stop()
+            self.__started_tracing = False
+
+    def __wrap(self, name: str, function):
+        @functools.wraps(function)
+        def profiled(*args, **kwargs):
+            if getattr(self.__local, 'active', False):
+                return function(*args, **kwargs)
+            return self.__measure(name, function, args, kwargs)
+        return profiled
+
+    def __measure(self, name: str, function, args, kwargs):
+        key = (name, threading.get_ident())
+        profile = self.__profiles.get(key)
+        if profile is None:
+            with self.__lock:
+                profile = self.__profiles.setdefault(key, cProfile.Profile())
+        totals = self.__functionTotals(name)
+        with self.__lock:
+            totals['calls'] += 1
+            sampled = bool(self.sample_every) and tracemalloc.is_tracing() and \
+                totals['calls'] % self.sample_every == 1 % self.sample_every
+        before = None
+        if sampled:
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            start_memory = tracemalloc.get_traced_memory()[0]
+
+        try:
+            profile.enable()
+            profiled = True
+        except ValueError:
+            # from Python 3.12 one cProfile runs at a time in the process, while another thread's is enabled
+            # this call is only timed
+            profiled = False
+        self.__local.active = True
+        failed = False
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return function(*args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            if profiled:
+                profile.disable()
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            self.__local.active = False
+            if sampled:
+                peak = tracemalloc.get_traced_memory()[1] - start_memory
+                differences = tracemalloc.take_snapshot().compare_to(before, 'filename')
+            with self.__lock:
+                totals['wall_s'] += wall
+                totals['cpu_s'] += cpu
+                totals['errors'] += failed
+                totals['unprofiled'] += not profiled
+                if sampled:
+                    totals['sampled'] += 1
+                    totals['alloc_blocks'] += sum(max(0, stat.count_diff) for stat in differences)
+                    totals['alloc_bytes'] += sum(max(0, stat.size_diff) for stat in differences)
+                    totals['peak_bytes'] = max(totals['peak_bytes'], peak)
+
+    def __functionTotals(self, name: str) -> dict:
+        totals = self.__totals.get(name)
+        if totals is None:
+            with self.__lock:
+                totals = self.__totals.setdefault(name, {'calls': 0, 'errors': 0, 'unprofiled': 0, 'wall_s': 0.0,
+                                                         'cpu_s': 0.0, 'sampled': 0, 'alloc_blocks': 0,
+                                                         'alloc_bytes': 0, 'peak_bytes': 0})
+        return totals
+
+    def summary(self) -> Dict[str, dict]:
+        """ per function totals with per call means, times in milliseconds and allocations per sampled call """
+        result = {}
+        with self.__lock:
+            for name, totals in self.__totals.items():
+                calls, sampled = totals['calls'], totals['sampled']
+                result[name] = dict(totals,
+                                    mean_wall_ms=1000 * totals['wall_s'] / calls if calls else 0.0,
+                                    mean_cpu_ms=1000 * totals['cpu_s'] / calls if calls else 0.0,
+                                    blocks_per_call=totals['alloc_blocks'] / sampled if sampled else 0.0,
+                                    bytes_per_call=totals['alloc_bytes'] / sampled if sampled else 0.0)
+        return result
+
+    def stats(self, name: str = None) -> pstats.Stats:
+        """ the cProfile data of one function, or of all of them, merged over the threads """
+        with self.__lock:
+            profiles = [profile for (function, _), profile in self.__profiles.items() if name in (None, function)]
+        stats = pstats.Stats(profiles[0]) if profiles else None
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def report(self, top: int = 8) -> str:
+        stream = io.StringIO()
+        summary = sorted(self.summary().items(), key=lambda item: item[1]['cpu_s'], reverse=True)
+        stream.write('%-24s %8s %7s %11s %11s %12s %12s %12s\n' % (
+            'function', 'calls', 'errors', 'wall ms/c', 'cpu ms/c', 'blocks/c', 'bytes/c', 'peak bytes'))
+        for name, row in summary:
+            stream.write('%-24s %8d %7d %11.3f %11.3f %12.1f %12.1f %12d\n' % (
+                name, row['calls'], row['errors'], row['mean_wall_ms'], row['mean_cpu_ms'],
+                row['blocks_per_call'], row['bytes_per_call'], row['peak_bytes']))
+        for name, _ in summary:
+            stats = self.stats(name)
+            if stats is None:
+                continue
+            stream.write('\n==== ' + name + ' ====\n')
+            stats.stream = stream
+            stats.sort_stats('cumulative').print_stats(top)
+        return stream.getvalue()
+
+    def dump(self, path: str) -> None:
+        """ writes the merged pstats to path and the text report next to it """
+        stats = self.stats()
+        if stats is not None:
+            stats.dump_stats(path)
+        with open(path + '.txt', 'w') as file:
+            file.write(self.report())
+
+
+@contextlib.contextmanager
+def profiling(path: str = None, module=None, sample_every: int = 100):
+    """ profiles the module's calls inside the block and writes the pstats and report to path, if given """
+    profiler = SolutionProfiler(module, sample_every).install()
+    try:
+        yield profiler
+    finally:
+        profiler.uninstall()
+        if path:
+            profiler.dump(path)
+
+
+def profileFromEnvironment(module) -> SolutionProfiler:
+    """ installs a profiler over module when SOLUTION_PROFILE is set, the report is written at exit """
+    path = os.environ.get(PROFILE_ENV)
+    if not path:
+        return None
+    profiler = SolutionProfiler(module, int(os.environ.get(SAMPLE_ENV, 100))).install()
+    atexit.register(profiler.dump, path.replace('{pid}', str(os.getpid())))
+    return profiler
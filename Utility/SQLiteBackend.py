@@ -0,0 +1,424 @@
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections import namedtuple
+from typing import List, Union
+
+from psycopg2 import sql
+
+from Utility.Exceptions import DatabaseException
+
+'''
+    Embedded SQLite backend of DBConnector, selected with DB_BACKEND=sqlite or a [sqlite] section in database.ini
+    (database = :memory: or a file path). Connections look like psycopg2 connections to DBConnector and the
+    statements written for PostgreSQL are translated on the way in:
+        table constraints between column definitions, CREATE OR REPLACE VIEW, DROP ... CASCADE, TRUNCATE,
+        ADD COLUMN IF NOT EXISTS, casts (::INTEGER[], DECIMAL), unnest(arrays) AS alias(columns),
+        = ANY(array) and = ANY(ARRAY(subquery)), ctid, now(), COLLATE "C",
+        count(<table>), the column names PostgreSQL gives unaliased aggregates (avg, sum ...),
+        DELETE on single table views that keep the column names of their table, COPY ... FROM STDIN.
+    Functions, schemas and advisory locks have no SQLite counterpart and are skipped, as are
+    data modifying CTEs, which callers replace with one statement per row.
+'''
+
+MEMORY = ':memory:'
+# seconds a statement waits for the lock of another connection when no deadline applies
+BUSY_TIMEOUT = 5.0
+
+# one in-memory database per process, shared by all its connections and kept alive by _keeper
+_MEMORY_URI = 'file:/solution-%d?vfs=memdb'
+_keeper = None
+_keeper_lock = threading.Lock()
+
+Column = namedtuple('Column', ['name'])
+IntegrityError = sqlite3.IntegrityError
+OperationalError = sqlite3.OperationalError
+
+# string literals are masked while rewriting, comments are dropped
+_LITERAL = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_MASK = re.compile('\x00(\\d+)\x00')
+_KEYWORDS = {'where', 'on', 'join', 'inner', 'left', 'right', 'outer', 'cross', 'group', 'order', 'limit', 'union',
+             'returning', 'using', 'natural', 'full', 'having', 'set', 'values', 'select'}
+_UNALIASED_AGGREGATE = re.compile(r'(SELECT\s+(?:DISTINCT\s+)?|,\s*)(sum|avg|count|min|max)\s*\(([^()]*)\)'
+                                  r'(?=\s*(?:,|FROM\b))', re.IGNORECASE)
+_COPY = re.compile(r'^\s*COPY\s+(\w+)\s*(\([^)]*\))\s*FROM\s+STDIN\s*$', re.IGNORECASE)
+
+
+def connect(database: str = MEMORY, **_) -> 'Connection':
+    global _keeper
+    if database == MEMORY:
+        uri = _MEMORY_URI % os.getpid()
+        with _keeper_lock:
+            if _keeper is None or _keeper[0] != os.getpid():
+                # the memdb database is freed with its last connection, this one never closes
+                _keeper = (os.getpid(), sqlite3.connect(uri, uri=True, check_same_thread=False))
+        return Connection(uri, uri=True)
+    return Connection(database)
+
+
+class Connection:
+    """ the parts of a psycopg2 connection DBConnector uses, over a sqlite3 connection in autocommit mode
+    with explicit transactions """
+
+    def __init__(self, database: str, uri: bool = False):
+        self.database = sqlite3.connect(database, uri=uri, isolation_level=None, check_same_thread=False,
+                                        timeout=BUSY_TIMEOUT)
+        self.database.execute("PRAGMA foreign_keys = ON")
+        if not uri:
+            self.database.execute("PRAGMA journal_mode = WAL")
+        self.autocommit = False
+        self.closed = 0
+
+    def cursor(self) -> 'Cursor':
+        return Cursor(self)
+
+    def begin(self):
+        if not self.database.in_transaction:
+            self.database.execute("BEGIN")
+
+    def commit(self):
+        if self.database.in_transaction:
+            self.database.execute("COMMIT")
+
+    def rollback(self):
+        if self.database.in_transaction:
+            self.database.execute("ROLLBACK")
+
+    def close(self):
+        if not self.closed:
+            self.database.close()
+            self.closed = 1
+
+    # stops the running statement, it fails with OperationalError('interrupted')
+    def cancel(self):
+        self.database.interrupt()
+
+    # how long a statement waits for a locked database, None restores the default
+    def busyTimeout(self, seconds: Union[float, None]):
+        self.database.execute("PRAGMA busy_timeout = %d" % int(1000 * (BUSY_TIMEOUT if seconds is None else seconds)))
+
+
+class Cursor:
+    """ runs PostgreSQL flavoured queries, one or more statements, in the connection's transaction """
+
+    def __init__(self, connection: Connection):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.__rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def execute(self, query: Union[str, sql.Composable]):
+        text = query if isinstance(query, str) else render(query)
+        database = self.connection.database
+        self.connection.begin()
+        self.description, self.rowcount, self.__rows = None, -1, []
+        for statement in statements(text):
+            for translated in translate(statement, database):
+                cursor = database.execute(translated)
+                rows = cursor.fetchall()
+                if cursor.description is not None:
+                    # unquoted names are folded to lower case, like PostgreSQL does
+                    self.description = [Column(column[0].lower()) for column in cursor.description]
+                    self.rowcount, self.__rows = len(rows), rows
+                else:
+                    self.description, self.rowcount, self.__rows = None, cursor.rowcount, []
+
+    def copy_expert(self, query: str, file):
+        """ COPY table (columns) FROM STDIN in the text format, as loadDataset sends it """
+        match = _COPY.match(query)
+        if match is None:
+            raise OperationalError('only COPY table (columns) FROM STDIN is supported')
+        table, columns = match.group(1), match.group(2)
+        insert = 'INSERT INTO %s %s VALUES (%s)' % (table, columns, ', '.join('?' * len(columns.split(','))))
+        self.connection.begin()
+        self.rowcount = 0
+        pending = ''
+        while True:
+            chunk = file.read(1 << 16)
+            lines = (pending + chunk).split('\n')
+            pending = lines.pop() if chunk else ''
+            rows = [[None if value == '\\N' else value for value in line.split('\t')] for line in lines if line]
+            self.connection.database.executemany(insert, rows)
+            self.rowcount += len(rows)
+            if not chunk:
+                break
+
+    def fetchall(self) -> list:
+        rows, self.__rows = self.__rows, []
+        return rows
+
+    def close(self):
+        self.__rows = []
+
+
+def render(query: sql.Composable) -> str:
+    """ the text of a psycopg2 composed query with SQLite literals, arrays become JSON text """
+    if isinstance(query, sql.Composed):
+        return ''.join(render(part) for part in query.seq)
+    if isinstance(query, sql.SQL):
+        return query.string
+    if isinstance(query, sql.Identifier):
+        return '.'.join('"' + name.replace('"', '""') + '"' for name in query.strings)
+    if isinstance(query, sql.Literal):
+        return literal(query.wrapped)
+    raise TypeError('cannot render ' + type(query).__name__)
+
+
+def literal(value) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        value = json.dumps(list(value))
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def statements(text: str) -> List[str]:
+    """ the statements of a script, trigger bodies stay in one piece """
+    result, current = [], ''
+    for piece in _split(text):
+        current += piece + ';'
+        if sqlite3.complete_statement(current):
+            result.append(current[:-1].strip())
+            current = ''
+    if current.strip(' ;'):
+        result.append(current[:-1].strip())
+    return [statement for statement in result if _LITERAL.sub('', statement).strip()]
+
+
+def _split(text: str) -> List[str]:
+    pieces, start = [], 0
+    for match in re.finditer(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/|;", text, re.DOTALL):
+        if match.group() == ';':
+            pieces.append(text[start:match.start()])
+            start = match.end()
+    pieces.append(text[start:])
+    return pieces
+
+
+def translate(statement: str, database: sqlite3.Connection) -> List[str]:
+    """ the SQLite statements doing what the PostgreSQL statement does, none for statements without a meaning here """
+    masked, literals = _mask(statement)
+    masked = _rewrite(masked)
+    return [_unmask(translated, literals) for translated in _restructure(masked, database)]
+
+
+def _mask(statement: str):
+    literals = []
+
+    def replace(match):
+        if match.group().startswith("'"):
+            literals.append(match.group())
+            return '\x00%d\x00' % (len(literals) - 1)
+        return ' '
+    return _LITERAL.sub(replace, statement).strip(), literals
+
+
+def _unmask(statement: str, literals: list) -> str:
+    return _MASK.sub(lambda match: literals[int(match.group(1))], statement)
+
+
+@functools.lru_cache(maxsize=1024)
+def _rewrite(text: str) -> str:
+    text = re.sub(r'::\s*\w+(\s*\[\s*\])?', '', text)
+    text = re.sub(r'\bnow\(\)', 'CURRENT_TIMESTAMP', text, flags=re.IGNORECASE)
+    # DECIMAL has integer affinity in SQLite, the division would be truncated
+    text = re.sub(r'\bAS\s+DECIMAL\s*\)', 'AS REAL)', text, flags=re.IGNORECASE)
+    text = re.sub(r'\bctid\b', 'rowid', text, flags=re.IGNORECASE)
+    # the C collation orders by code point, as SQLite's default does
+    text = re.sub(r'\bCOLLATE\s+"C"', 'COLLATE BINARY', text, flags=re.IGNORECASE)
+    text = _rewriteUnnest(text)
+    text = _rewriteAny(text)
+    # count(<table>) counts the rows of the table, like count(*)
+    tables = {name.lower() for match in re.finditer(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', text,
+                                                    re.IGNORECASE) for name in match.groups() if name}
+    text = re.sub(r'\bcount\s*\(\s*(\w+)\s*\)',
+                  lambda match: 'count(*)' if match.group(1).lower() in tables else match.group(), text,
+                  flags=re.IGNORECASE)
+    return _UNALIASED_AGGREGATE.sub(lambda match: '%s%s(%s) AS %s' % (match.group(1), match.group(2), match.group(3),
+                                                                       match.group(2).lower()), text)
+
+
+def _rewriteUnnest(text: str) -> str:
+    while True:
+        match = re.search(r'\bunnest\s*\(', text, re.IGNORECASE)
+        if match is None:
+            return text
+        close = _closing(text, match.end() - 1)
+        arrays = _arguments(text[match.end():close])
+        alias = re.match(r'\s+(AS\s+)?(\w+)\s*\(([^()]*)\)', text[close + 1:], re.IGNORECASE)
+        if alias is not None and (alias.group(1) or alias.group(2).lower() not in _KEYWORDS):
+            name, columns = alias.group(2), [column.strip() for column in alias.group(3).split(',')]
+            end = close + 1 + alias.end()
+        else:
+            name, columns, end = None, ['c%d' % index for index in range(len(arrays))], close + 1
+        selected = ', '.join('j%d.value AS %s' % (index, column) for index, column in enumerate(columns))
+        joined = ' JOIN '.join('json_each(%s) AS j%d' % (array, index) + (' ON j%d.key = j0.key' % index if index else '')
+                               for index, array in enumerate(arrays))
+        subquery = '(SELECT %s FROM %s)' % (selected, joined) + (' AS ' + name if name else '')
+        text = text[:match.start()] + subquery + text[end:]
+
+
+def _rewriteAny(text: str) -> str:
+    while True:
+        match = re.search(r'=\s*ANY\s*\(', text, re.IGNORECASE)
+        if match is None:
+            return text
+        close = _closing(text, match.end() - 1)
+        inner = text[match.end():close].strip()
+        array = re.match(r'ARRAY\s*\(', inner, re.IGNORECASE)
+        if array is not None and _closing(inner, array.end() - 1) == len(inner) - 1:
+            replacement = 'IN (' + inner[array.end():-1] + ')'
+        else:
+            replacement = 'IN (SELECT value FROM json_each(' + inner + '))'
+        text = text[:match.start()] + replacement + text[close + 1:]
+
+
+def _closing(text: str, open_index: int) -> int:
+    depth = 0
+    for index in range(open_index, len(text)):
+        if text[index] == '(':
+            depth += 1
+        elif text[index] == ')':
+            depth -= 1
+            if depth == 0:
+                return index
+    raise OperationalError('unbalanced parentheses in ' + text)
+
+
+def _arguments(text: str) -> List[str]:
+    arguments, depth, current = [], 0, ''
+    for char in text:
+        depth += char == '('
+        depth -= char == ')'
+        if char == ',' and depth == 0:
+            arguments.append(current.strip())
+            current = ''
+        else:
+            current += char
+    return arguments + [current.strip()]
+
+
+def _restructure(text: str, database: sqlite3.Connection) -> List[str]:
+    if re.match(r'(CREATE\s+(OR\s+REPLACE\s+)?FUNCTION|DROP\s+FUNCTION|(CREATE|DROP)\s+SCHEMA|SELECT\s+pg_advisory)',
+                text, re.IGNORECASE):
+        return []
+    match = re.match(r'TRUNCATE\s+(?:TABLE\s+)?(.*?)(\s+CASCADE)?\s*$', text, re.IGNORECASE | re.DOTALL)
+    if match:
+        return ['DELETE FROM ' + table.strip() for table in match.group(1).split(',')]
+    match = re.match(r'CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?\w+\s*\(', text, re.IGNORECASE)
+    if match:
+        return [_columnsFirst(text, match.end() - 1)]
+    match = re.match(r'CREATE\s+OR\s+REPLACE\s+VIEW\s+(\w+)', text, re.IGNORECASE)
+    if match:
+        return ['DROP VIEW IF EXISTS ' + match.group(1), 'CREATE VIEW' + text[match.start(1) - 1:]]
+    match = re.match(r'DROP\s+(TABLE|VIEW)\s+IF\s+EXISTS\s+(\w+)\s+CASCADE\s*$', text, re.IGNORECASE)
+    if match:
+        tables = _referencingTables(match.group(2), database) if match.group(1).upper() == 'TABLE' else []
+        views = [view for name in [match.group(2)] + tables for view in _dependentViews(name, database)]
+        return ['DROP VIEW IF EXISTS ' + view for view in dict.fromkeys(views)] + \
+               ['DROP TABLE IF EXISTS ' + table for table in tables] + \
+               ['DROP %s IF EXISTS %s' % (match.group(1), match.group(2))]
+    match = re.match(r'ALTER\s+TABLE\s+(\w+)\s+ADD\s+COLUMN\s+IF\s+NOT\s+EXISTS\s+(\w+)', text, re.IGNORECASE)
+    if match:
+        existing = {row[1].lower() for row in database.execute('PRAGMA table_info(%s)' % match.group(1))}
+        if match.group(2).lower() in existing:
+            return []
+        return ['ALTER TABLE %s ADD COLUMN %s' % (match.group(1), text[match.start(2):])]
+    match = re.match(r'DELETE\s+FROM\s+("?)(\w+)\1(.*)$', text, re.IGNORECASE | re.DOTALL)
+    if match:
+        view = database.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = ? COLLATE NOCASE",
+                                (match.group(2),)).fetchone()
+        if view is not None:
+            return [_deleteThroughView(match.group(2), view[0], match.group(3), database)]
+    return [text]
+
+
+def _columnsFirst(text: str, open_index: int) -> str:
+    """ SQLite wants the column definitions of a table before its table constraints """
+    close = _closing(text, open_index)
+    definitions = _arguments(text[open_index + 1:close])
+    constraint = re.compile(r'(PRIMARY\s+KEY|FOREIGN\s+KEY|UNIQUE|CHECK|CONSTRAINT)\b', re.IGNORECASE)
+    # a PRIMARY KEY column may be NULL in SQLite and an INTEGER one is filled in with the rowid
+    definitions = [_primaryKeyColumn(definition) if re.search(r'\bPRIMARY\s+KEY\b', definition, re.IGNORECASE)
+                   and not constraint.match(definition) else definition for definition in definitions]
+    ordered = [definition for definition in definitions if not constraint.match(definition)] + \
+              [definition for definition in definitions if constraint.match(definition)]
+    return text[:open_index + 1] + ', '.join(ordered) + text[close:]
+
+
+def _primaryKeyColumn(definition: str) -> str:
+    definition = re.sub(r'^(\w+\s+)INTEGER\b', r'\1INT', definition, flags=re.IGNORECASE)
+    if not re.search(r'\bNOT\s+NULL\b', definition, re.IGNORECASE):
+        definition += ' NOT NULL'
+    return definition
+
+
+def _referencingTables(name: str, database: sqlite3.Connection) -> List[str]:
+    """ the tables with a foreign key to name, directly or through other tables, the farthest first.
+    SQLite cannot drop a foreign key on its own, so DROP TABLE ... CASCADE drops these tables as well """
+    tables = [row[0] for row in database.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    parents = {table: {row[2].lower() for row in database.execute('PRAGMA foreign_key_list(%s)' % table)}
+               for table in tables}
+    found, pending = [], [name.lower()]
+    while pending:
+        parent = pending.pop()
+        for table in tables:
+            if parent in parents[table] and table not in found and table.lower() != name.lower():
+                found.append(table)
+                pending.append(table.lower())
+    return found[::-1]
+
+
+def _dependentViews(name: str, database: sqlite3.Connection) -> List[str]:
+    """ the views reading name, directly or through other views """
+    views = database.execute("SELECT name, sql FROM sqlite_master WHERE type = 'view'").fetchall()
+    found, pending = [], [name]
+    while pending:
+        reference = re.compile(r'\b' + re.escape(pending.pop()) + r'\b', re.IGNORECASE)
+        for view, definition in views:
+            if view not in found and view.lower() != name.lower() and reference.search(definition):
+                found.append(view)
+                pending.append(view)
+    return found
+
+
+def _deleteThroughView(view: str, definition: str, rest: str, database: sqlite3.Connection) -> str:
+    """ a DELETE on a view removes the rows of its table the view shows """
+    table = re.search(r'\bFROM\s+(\w+)', definition, re.IGNORECASE).group(1)
+    columns = ', '.join(row[1] for row in database.execute('PRAGMA table_info(%s)' % view))
+    returning = re.search(r'\bRETURNING\b.*$', rest, re.IGNORECASE | re.DOTALL)
+    condition = rest[:returning.start()] if returning else rest
+    return 'DELETE FROM %s WHERE (%s) IN (SELECT %s FROM %s %s) %s' % (
+        table, columns, columns, view, condition, returning.group() if returning else '')
+
+
+def constraintViolation(error: sqlite3.IntegrityError) -> DatabaseException:
+    """ the DatabaseException PostgreSQL would have raised for the violated constraint """
+    name, message = getattr(error, 'sqlite_errorname', ''), str(error)
+    if 'NOTNULL' in name or message.startswith('NOT NULL'):
+        return DatabaseException.NOT_NULL_VIOLATION("NOT_NULL_VIOLATION")
+    if 'CHECK' in name or message.startswith('CHECK'):
+        return DatabaseException.CHECK_VIOLATION("CHECK_VIOLATION")
+    if 'UNIQUE' in name or 'PRIMARYKEY' in name or message.startswith('UNIQUE'):
+        return DatabaseException.UNIQUE_VIOLATION("UNIQUE_VIOLATION")
+    if 'FOREIGNKEY' in name or message.startswith('FOREIGN KEY'):
+        return DatabaseException.FOREIGN_KEY_VIOLATION("FOREIGN_KEY_VIOLATION")
+    return DatabaseException.UNKNOWN_ERROR(message)
+
+
+# a statement interrupted at its deadline or given up on waiting for a lock
+def isTimeout(error: sqlite3.OperationalError) -> bool:
+    return str(error) in ('interrupted', 'database is locked')
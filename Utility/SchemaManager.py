@@ -0,0 +1,62 @@
+import warnings
+from typing import Dict, List, Tuple, Union
+
+import Utility.DBConnector as Connector
+
+VERSION_TABLE = "SchemaVersion"
+# advisory lock serializing concurrent migrations of the same database. the lock is part of every migration
+# script, the SQLite translator drops it as SQLite serializes writers by itself
+_MIGRATION_LOCK = 7301
+
+CREATE_VERSION_TABLE = """
+                CREATE TABLE IF NOT EXISTS SchemaVersion(
+                Version INTEGER NOT NULL PRIMARY KEY,
+                AppliedAt TIMESTAMP NOT NULL DEFAULT now()
+                );
+                """
+
+
+def schemaVersion(conn: Connector.DBConnector) -> int:
+    """ the latest applied migration, 0 for a database that was never migrated """
+    try:
+        _, result = conn.execute("SELECT MAX(Version) AS version FROM " + VERSION_TABLE)
+    except Exception:
+        # no version table yet, clear the failed transaction
+        conn.rollback()
+        return 0
+    return result[0]['version'] or 0
+
+
+def migrate(migrations: List[Tuple[int, Union[str, Dict[str, str]]]], target: Union[int, None] = None) -> int:
+    """ applies every migration newer than the stored version (up to target) in a single transaction
+    and returns the resulting version. a current schema costs one query and no DDL.
+    a step written per backend is a dict of backend name ('postgresql', 'sqlite') to DDL.
+    a step that skips an optional part reports it with RAISE WARNING, it is passed on as a Python warning """
+    conn = Connector.DBConnector()
+    try:
+        current = schemaVersion(conn)
+        pending = [(version, ddl) for version, ddl in sorted(migrations)
+                   if version > current and (target is None or version <= target)]
+        if not pending:
+            return current
+
+        script = "SELECT pg_advisory_xact_lock(" + str(_MIGRATION_LOCK) + ");" + CREATE_VERSION_TABLE
+        for version, ddl in pending:
+            if isinstance(ddl, dict):
+                ddl = ddl[Connector.DBConnector.backend()]
+            script += ddl + "\nINSERT INTO " + VERSION_TABLE + " (Version) VALUES (" + str(version) + ");"
+        notices = getattr(conn.connection, 'notices', [])
+        seen = len(notices)
+        try:
+            conn.execute(script)
+            for notice in notices[seen:]:
+                if notice.startswith('WARNING:'):
+                    warnings.warn('schema migration: ' + notice[len('WARNING:'):].strip(), stacklevel=2)
+        except Exception:
+            conn.rollback()
+            # another process may have applied the same steps while we waited for the lock
+            if schemaVersion(conn) < pending[-1][0]:
+                raise
+        return pending[-1][0]
+    finally:
+        conn.close()
@@ -0,0 +1,175 @@
+import contextlib
+import copy
+import functools
+import io
+import os
+import threading
+import time
+from typing import Dict
+
+import Utility.DBConnector as Connector
+
+# SOLUTION_SINGLE_FLIGHT=1 coalesces the reads of every Solution call of the process
+COALESCE_ENV = 'SOLUTION_SINGLE_FLIGHT'
+
+# the Solution functions that only read, the ones whose identical concurrent calls can share a query
+READ_FUNCTIONS = ['getCriticProfile', 'getActorProfile', 'getMovieProfile', 'getStudioProfile', 'averageRating',
+                  'averageActorRating', 'bestPerformance', 'stageCrewBudget', 'overlyInvestedInMovie',
+                  'franchiseRevenue', 'studioRevenueByYear', 'getFanCritics', 'averageAgeByGenre',
+                  'getExclusiveActors']
+
+
+class _Flight:
+    # one call in progress, the calls with the same key wait for its outcome
+    __slots__ = ('started', 'done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """ wraps the read functions of a module (Solution by default) so that concurrent calls with the same
+    function and arguments share one execution: the first call runs the query, the calls arriving while it
+    runs wait for it and get a copy of its result (or its exception). nothing is cached, a call arriving
+    after the query finished runs a query of its own.
+
+    a call never joins a query that started before this thread's last write, so a thread still reads its
+    own writes. calls on a bound connection (a transaction of their own) or with arguments that cannot be
+    hashed always run alone, and a waiting call whose deadline passes runs on its own as well.
+
+        with coalescing() as flights:
+            run_load()
+        print(flights.report())
+    """
+
+    def __init__(self, module=None, functions=None):
+        if module is None:
+            import Solution as module
+        self.module = module
+        self.functions = list(functions if functions is not None else READ_FUNCTIONS)
+        self.__originals = {}
+        self.__lock = threading.Lock()
+        self.__flights = {}
+        self.__totals = {}
+
+    def install(self) -> 'SingleFlight':
+        for name in self.functions:
+            function = getattr(self.module, name)
+            self.__originals[name] = function
+            setattr(self.module, name, self.__wrap(name, function))
+        return self
+
+    def uninstall(self) -> None:
+        for name, function in self.__originals.items():
+            setattr(self.module, name, function)
+        self.__originals.clear()
+
+    def __wrap(self, name: str, function):
+        @functools.wraps(function)
+        def coalesced(*args, **kwargs):
+            return self.call(name, function, *args, **kwargs)
+        return coalesced
+
+    def call(self, name: str, function, *args, **kwargs):
+        """ function(*args, **kwargs), sharing the execution with identical calls already in flight """
+        key = (name, Connector.DBConnector.currentShard(), args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            key = None
+        totals = self.__functionTotals(name)
+        if key is None or Connector.DBConnector.boundConnection() is not None:
+            with self.__lock:
+                totals['calls'] += 1
+                totals['bypassed'] += 1
+            return function(*args, **kwargs)
+
+        last_write = Connector.DBConnector.lastWrite()
+        with self.__lock:
+            totals['calls'] += 1
+            flight = self.__flights.get(key)
+            if flight is not None and (last_write is None or flight.started > last_write):
+                flight.waiters += 1
+                totals['coalesced'] += 1
+                leader = False
+            else:
+                # a flight this thread must not join stays in place for its own waiters
+                flight = _Flight()
+                if key not in self.__flights:
+                    self.__flights[key] = flight
+                totals['executed'] += 1
+                leader = True
+
+        if not leader:
+            if not flight.done.wait(Connector.DBConnector.remainingTime()):
+                # runs alone after all, it is no longer served by the flight
+                with self.__lock:
+                    flight.waiters -= 1
+                    totals['coalesced'] -= 1
+                    totals['timed_out'] += 1
+                return function(*args, **kwargs)
+            if flight.error is not None:
+                raise flight.error
+            # every caller may change what it got, Business objects and lists are copied
+            return copy.copy(flight.result)
+
+        try:
+            flight.result = function(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.__lock:
+                if self.__flights.get(key) is flight:
+                    del self.__flights[key]
+                totals['max_waiters'] = max(totals['max_waiters'], flight.waiters)
+            flight.done.set()
+
+    def __functionTotals(self, name: str) -> dict:
+        totals = self.__totals.get(name)
+        if totals is None:
+            with self.__lock:
+                totals = self.__totals.setdefault(name, {'calls': 0, 'executed': 0, 'coalesced': 0, 'bypassed': 0,
+                                                         'timed_out': 0, 'max_waiters': 0})
+        return totals
+
+    def summary(self) -> Dict[str, dict]:
+        """ per function counts: calls, queries executed, calls served by another call's query, calls that
+        could not share (bypassed, timed_out) and the most calls that ever waited on one query until it finished.
+        every call is counted in exactly one of executed, coalesced, bypassed and timed_out """
+        with self.__lock:
+            return {name: dict(totals,
+                               coalesced_ratio=totals['coalesced'] / totals['calls'] if totals['calls'] else 0.0)
+                    for name, totals in self.__totals.items()}
+
+    def report(self) -> str:
+        stream = io.StringIO()
+        stream.write('%-24s %8s %9s %10s %9s %10s %12s %8s\n' % ('function', 'calls', 'executed', 'coalesced',
+                                                                  'bypassed', 'timed out', 'max waiters', 'saved %'))
+        for name, row in sorted(self.summary().items(), key=lambda item: item[1]['coalesced'], reverse=True):
+            stream.write('%-24s %8d %9d %10d %9d %10d %12d %8.1f\n' % (
+                name, row['calls'], row['executed'], row['coalesced'], row['bypassed'], row['timed_out'],
+                row['max_waiters'], 100 * row['coalesced_ratio']))
+        return stream.getvalue()
+
+
+@contextlib.contextmanager
+def coalescing(module=None, functions=None):
+    """ coalesces identical concurrent reads of the module inside the block """
+    flights = SingleFlight(module, functions).install()
+    try:
+        yield flights
+    finally:
+        flights.uninstall()
+
+
+def coalesceFromEnvironment(module) -> SingleFlight:
+    """ installs single flight over the reads of module when SOLUTION_SINGLE_FLIGHT is set """
+    if os.environ.get(COALESCE_ENV, '') in ('', '0'):
+        return None
+    return SingleFlight(module).install()